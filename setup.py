@@ -5,8 +5,8 @@ from setuptools import setup, find_packages
 # python_requires is supported by pip only from November 2016,
 # so let's check the Python version also the old way.
 import sys
-if sys.version_info < (3, 3):
-    raise SystemExit('Udapi requires Python 3.3 or higher.')
+if sys.version_info < (3, 7):
+    raise SystemExit('Udapi requires Python 3.7 or higher.')
 
 setup(
     name='udapi',
@@ -27,7 +27,7 @@ setup(
     scripts=['bin/udapy'],
     tests_require=['pytest'],
     install_requires=['colorama', 'termcolor'],
-    python_requires='>=3.3',
+    python_requires='>=3.7',
     license='GPL 2 or newer',
     platforms='any',
 )
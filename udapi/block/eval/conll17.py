@@ -157,6 +157,16 @@ class Conll17(BaseWriter):
             scores = [str(count[s]) for s in ('pred', 'gold', 'Words', 'LAS')]
             print(' '.join(scores))
 
+    def get_state(self):
+        return {'writer': super().get_state(), 'total_count': self.total_count}
+
+    def set_state(self, state):
+        super().set_state(state['writer'])
+        self.total_count = Counter(state['total_count'])
+
+    def merge_state(self, state):
+        self.total_count.update(state['total_count'])
+
     def process_end(self):
         if not self.print_results:
             return
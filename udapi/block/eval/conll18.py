@@ -45,7 +45,31 @@ stored in `systems/system_name/testset_name.conllu` you can use::
     done
     python3 `python3 -c 'import udapi.block.eval.conll18 as x; print(x.__file__)'` -r 100
 
-The last line executes this block as a script and computes bootstrap resampling with 100 resamples
+Alternatively, all systems can be evaluated in one pass, so the gold file is read
+(and the gold-side data are computed) only once for each testset.
+Each system is loaded into its own zone (the zone names must be lowercase, e.g. ``pred_01``,
+or contain a selector after an underscore, e.g. ``_Stanford``)
+and the raw counts of each zone are saved to a separate file::
+
+    for testset in `ls gold`; do
+        readers=''
+        for sys in $SYSTEMS; do
+            readers="$readers read.Conllu zone=_$sys files=systems/$sys/$testset ignore_sent_id=1"
+        done
+        udapy read.Conllu zone=gold files=gold/$testset $readers \
+              util.ResegmentGold \
+              eval.Conll18 print_results=0 print_raw=LAS \
+                           raw_file="results/{selector}/${testset%.conllu}"
+    done
+
+Without ``print_results=0``, a table for each zone is printed.
+The systems can be also split among parallel processes with the ``zones`` parameter,
+e.g. ``eval.Conll18 zones=_Stanford,_C2L2``.
+(Sharding with ``udapy --shard`` cannot be used before ``util.ResegmentGold``
+because the pred sentences are aligned to the gold ones by their order.)
+
+The last line of the bash script above executes this block as a script
+and computes bootstrap resampling with 100 resamples
 (default=1000, it is recommended to keep the default or higher value unless testing the interface).
 This prints the ranking and confidence intervals (95% by default) and also p-values for each
 pair of systems with neighboring ranks. If the difference in LAS is significant
@@ -108,35 +132,57 @@ class Conll18(BaseWriter):
     """Evaluate LAS, UAS, MLAS and BLEX."""
 
     def __init__(self, gold_zone='gold', print_raw=False, print_results=True, print_counts=False,
-                 **kwargs):
+                 raw_file=None, **kwargs):
         """Args:
-        gold_zone - Which zone contains the gold-standard trees (the other zone contains "pred")?
+        gold_zone - Which zone contains the gold-standard trees (the other zones contain "pred")?
         print_raw - Print raw counts (pred, gold, aligned, correct) for each sentence.
             This is useful for bootstrap resampling post-processing to get confidence intervals.
             The parameter print_raw specifies a given metric
             (UAS, LAS, MLAS, BLEX, UPOS, XPOS, Feats, Lemma) or is 0 (or False) by default.
         print_results - Print a table with overall results after all document are processed.
+            If there are more pred zones, a table for each of them is printed.
         print_counts - Print counts of correct/gold/system instead of prec/rec/f1 for all metrics.
+        raw_file - Save the raw counts (see print_raw) of each pred zone to a separate file
+            instead of printing them. The file name is created by substituting the zone for
+            "{zone}" and the selector (the part of the zone after "_") for "{selector}",
+            e.g. ``raw_file=results/{zone}/testset``.
         """
         super().__init__(**kwargs)
         self.gold_zone = gold_zone
         self.total_count = Counter()
+        self.zone_counts = {}
         self.print_raw = print_raw
         self.print_results = print_results
         self.print_counts = print_counts
+        self.raw_file = raw_file
+        self._raw_files = {}
+        self._gold_cache = None
 
     def _ufeats(self, feats):
         return '|'.join(sorted(x for x in feats.split('|') if x.split('=', 1)[0] in UNIV_FEATS))
 
+    def _gold_data(self, gold_tree):
+        """Return the gold-side data needed for evaluation, shared by all pred zones."""
+        if self._gold_cache is not None and self._gold_cache[0] is gold_tree:
+            return self._gold_cache[1]
+        gold_nodes = gold_tree.descendants
+        matcher = difflib.SequenceMatcher(None, autojunk=False)
+        matcher.set_seq2([n.form.lower() for n in gold_nodes])
+        ufeats = {n: self._ufeats(str(n.feats)) for n in gold_nodes}
+        content = {n for n in gold_nodes if n.udeprel in CONTENT}
+        func_children = {n: [c for c in n.children if c.udeprel in FUNCTIONAL] for n in content}
+        data = (gold_nodes, matcher, ufeats, content, func_children)
+        self._gold_cache = (gold_tree, data)
+        return data
+
     def process_tree(self, tree):
         gold_tree = tree.bundle.get_tree(self.gold_zone)
         if tree == gold_tree:
             return
+        gold_nodes, matcher, gold_ufeats, gold_content, gold_func_children = \
+            self._gold_data(gold_tree)
         pred_nodes = tree.descendants
-        gold_nodes = gold_tree.descendants
-        pred_forms = [n.form.lower() for n in pred_nodes]
-        gold_forms = [n.form.lower() for n in gold_nodes]
-        matcher = difflib.SequenceMatcher(None, pred_forms, gold_forms, autojunk=False)
+        matcher.set_seq1([n.form.lower() for n in pred_nodes])
         aligned = []
         for diff in matcher.get_opcodes():
             edit, pred_lo, pred_hi, gold_lo, gold_hi = diff
@@ -145,15 +191,15 @@ class Conll18(BaseWriter):
         align_map, feats_match = {tree: gold_tree}, {}
         for p_node, g_node in aligned:
             align_map[p_node] = g_node
-            feats_match[p_node] = self._ufeats(str(p_node.feats)) == self._ufeats(str(g_node.feats))
+            feats_match[p_node] = self._ufeats(str(p_node.feats)) == gold_ufeats[g_node]
 
         count = Counter()
         count['pred'] = len(pred_nodes)
         count['gold'] = len(gold_nodes)
         count['Words'] = len(aligned)
         count['pred_cont'] = len([n for n in pred_nodes if n.udeprel in CONTENT])
-        count['gold_cont'] = len([n for n in gold_nodes if n.udeprel in CONTENT])
-        count['alig_cont'] = len([n for _, n in aligned if n.udeprel in CONTENT])
+        count['gold_cont'] = len(gold_content)
+        count['alig_cont'] = len([n for _, n in aligned if n in gold_content])
 
         for p_node, g_node in aligned:
             count['UPOS'] += 1 if p_node.upos == g_node.upos else 0
@@ -166,14 +212,16 @@ class Conll18(BaseWriter):
                 count['UAS'] += 1
                 if p_node.udeprel == g_node.udeprel:
                     count['LAS'] += 1
-                    if g_node.udeprel in CONTENT:
+                    if g_node in gold_content:
                         count['CLAS'] += 1
                         if g_node.lemma == '_' or g_node.lemma == p_node.lemma:
                             count['BLEX'] += 1
-                        if self._morpho_match(p_node, g_node, align_map, feats_match):
+                        if self._morpho_match(p_node, g_node, align_map, feats_match,
+                                              gold_func_children[g_node]):
                             if not p_node.misc['FuncChildMissing']:
                                 count['MLAS'] += 1
         self.total_count.update(count)
+        self.zone_counts.setdefault(tree.zone, Counter()).update(count)
 
         if self.print_raw:
             if self.print_raw in {'CLAS', 'BLEX', 'MLAS'}:
@@ -181,13 +229,23 @@ class Conll18(BaseWriter):
                                                   self.print_raw)]
             else:
                 scores = [str(count[s]) for s in ('pred', 'gold', 'Words', self.print_raw)]
-            print(' '.join(scores))
-
-    def _morpho_match(self, p_node, g_node, align_map, feats_match):
+            print(' '.join(scores), file=self._raw_filehandle(tree.zone))
+
+    def _raw_filehandle(self, zone):
+        if self.raw_file is None:
+            return sys.stdout
+        if zone not in self._raw_files:
+            filename = self.raw_file.format(zone=zone, selector=zone.split('_', 1)[-1])
+            if os.path.dirname(filename):
+                os.makedirs(os.path.dirname(filename), exist_ok=True)
+            self._raw_files[zone] = open(filename, 'w', encoding=self.encoding)
+        return self._raw_files[zone]
+
+    @staticmethod
+    def _morpho_match(p_node, g_node, align_map, feats_match, g_children):
         if p_node.upos != g_node.upos or not feats_match[p_node]:
             return False
         p_children = [c for c in p_node.children if c.udeprel in FUNCTIONAL and not c.misc['Rehanged']]
-        g_children = [c for c in g_node.children if c.udeprel in FUNCTIONAL]
         if len(p_children) != len(g_children):
             return False
         for p_child, g_child in zip(p_children, g_children):
@@ -199,13 +257,41 @@ class Conll18(BaseWriter):
                 return False
         return True
 
+    def get_state(self):
+        return {'writer': super().get_state(), 'total_count': self.total_count,
+                'zone_counts': self.zone_counts}
+
+    def set_state(self, state):
+        super().set_state(state['writer'])
+        self.total_count = Counter(state['total_count'])
+        self.zone_counts = {zone: Counter(count) for zone, count in state['zone_counts'].items()}
+
+    def merge_state(self, state):
+        self.total_count.update(state['total_count'])
+        for zone, count in state['zone_counts'].items():
+            self.zone_counts.setdefault(zone, Counter()).update(count)
+
     def process_end(self):
+        for raw_filehandle in self._raw_files.values():
+            raw_filehandle.close()
+        self._raw_files = {}
         if not self.print_results:
             return
 
         # Redirect the default filehandle to the file specified by self.files
         self.before_process_document(None)
 
+        if len(self.zone_counts) < 2:
+            self.print_table(self.total_count)
+            return
+        for number, (zone, count) in enumerate(self.zone_counts.items()):
+            if number:
+                print()
+            print('System (zone=%s)' % zone)
+            self.print_table(count)
+
+    def print_table(self, count):
+        """Print the results table for the given counts."""
         metrics = ('Words', 'UPOS', 'XPOS', 'UFeats', 'AllTags',
                    'Lemmas', 'UAS', 'LAS', 'CLAS', 'MLAS', 'BLEX')
         if self.print_counts:
@@ -214,13 +300,11 @@ class Conll18(BaseWriter):
             print("Metric     | Precision |    Recall |  F1 Score | AligndAcc")
         print("-----------+-----------+-----------+-----------+-----------")
         for metric in metrics:
-            correct = self.total_count[metric]
+            correct = count[metric]
             if metric in {'CLAS', 'BLEX', 'MLAS'}:
-                pred, gold = self.total_count['pred_cont'], self.total_count['gold_cont']
-                alig = self.total_count['alig_cont']
+                pred, gold, alig = count['pred_cont'], count['gold_cont'], count['alig_cont']
             else:
-                pred, gold = self.total_count['pred'], self.total_count['gold']
-                alig = self.total_count['Words']
+                pred, gold, alig = count['pred'], count['gold'], count['Words']
             if self.print_counts:
                 print("{:11}|{:10} |{:10} |{:10} |{:10}".format(
                     metric, correct, gold, pred, alig))
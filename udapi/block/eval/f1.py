@@ -54,6 +54,7 @@ import logging
 import re
 
 from udapi.core.basewriter import BaseWriter
+from udapi.core.node import Node
 
 # pylint: disable=too-many-instance-attributes,invalid-name
 
@@ -62,13 +63,11 @@ class F1(BaseWriter):
     """Evaluate differences between sentences (in different zones) with P/R/F1.
 
     Args:
-    zones: Which zone contains the "predicted" trees?
-           Make sure that you specify just one zone.
-           If you leave the default value "all" and the document contains more zones,
-           the results will be mixed, which is most likely not what you wanted.
-           Exception: If the document conaints just two zones (predicted and gold trees),
-           you can keep the default value "all" because this block
-           will skip comparison of the gold zone with itself.
+    zones: Which zones contain the "predicted" trees?
+           The default value "all" means all zones except for the gold zone
+           (this block skips comparison of the gold zone with itself).
+           If there are more predicted zones (e.g. outputs of several systems),
+           the results are reported for each zone separately.
 
     gold_zone: Which zone contains the gold-standard trees?
 
@@ -92,46 +91,85 @@ class F1(BaseWriter):
         super().__init__(**kwargs)
         self.gold_zone = gold_zone
         self.attrs = attributes.split(',')
+        self._get_values = Node.compile_attrs(self.attrs)
         self.focus = None
         if focus is not None:
             self.focus = re.compile(focus)
         self.details = details
-        self.correct, self.pred, self.gold = 0, 0, 0
         self.visited_zones = Counter()
-        if details:
-            self._common = Counter()
-            self._pred = Counter()
-            self._gold = Counter()
-            self._total = Counter()
+        self.zone_counts = {}
+        self._gold_cache = None
+
+    def _new_counts(self):
+        counts = {'correct': 0, 'pred': 0, 'gold': 0}
+        if self.details:
+            counts.update(common=Counter(), pred_counts=Counter(), gold_counts=Counter(),
+                          total=Counter())
+        return counts
+
+    def _gold_tokens(self, gold_tree):
+        """Return the (focused) tokens of the gold tree, cached for all the pred zones."""
+        if self._gold_cache is not None and self._gold_cache[0] is gold_tree:
+            return self._gold_cache[1]
+        get_values = self._get_values
+        gold_tokens = ['_'.join(get_values(n)) for n in gold_tree.descendants]
+        focused = gold_tokens
+        if self.focus is not None:
+            focused = [x for x in gold_tokens if self.focus.fullmatch(x)]
+        self._gold_cache = (gold_tree, (gold_tokens, focused))
+        return gold_tokens, focused
 
     def process_tree(self, tree):
         gold_tree = tree.bundle.get_tree(self.gold_zone)
         if tree == gold_tree:
             return
         self.visited_zones[tree.zone] += 1
+        counts = self.zone_counts.get(tree.zone)
+        if counts is None:
+            counts = self.zone_counts[tree.zone] = self._new_counts()
 
-        pred_tokens = ['_'.join(n.get_attrs(self.attrs)) for n in tree.descendants]
-        gold_tokens = ['_'.join(n.get_attrs(self.attrs)) for n in gold_tree.descendants]
+        get_values = self._get_values
+        pred_tokens = ['_'.join(get_values(n)) for n in tree.descendants]
+        gold_tokens, focused_gold_tokens = self._gold_tokens(gold_tree)
         common = find_lcs(pred_tokens, gold_tokens)
 
         if self.focus is not None:
             common = [x for x in common if self.focus.fullmatch(x)]
             pred_tokens = [x for x in pred_tokens if self.focus.fullmatch(x)]
-            gold_tokens = [x for x in gold_tokens if self.focus.fullmatch(x)]
+        gold_tokens = focused_gold_tokens
 
-        self.correct += len(common)
-        self.pred += len(pred_tokens)
-        self.gold += len(gold_tokens)
+        counts['correct'] += len(common)
+        counts['pred'] += len(pred_tokens)
+        counts['gold'] += len(gold_tokens)
 
         if self.details:
-            for x in common:
-                self._common[x] += 1
-            for x in gold_tokens:
-                self._gold[x] += 1
-                self._total[x] += 1
-            for x in pred_tokens:
-                self._pred[x] += 1
-                self._total[x] += 1
+            counts['common'].update(common)
+            counts['gold_counts'].update(gold_tokens)
+            counts['total'].update(gold_tokens)
+            counts['pred_counts'].update(pred_tokens)
+            counts['total'].update(pred_tokens)
+
+    def get_state(self):
+        return {'writer': super().get_state(), 'visited_zones': self.visited_zones,
+                'zone_counts': self.zone_counts}
+
+    def set_state(self, state):
+        super().set_state(state['writer'])
+        self.visited_zones = Counter(state['visited_zones'])
+        self.zone_counts = {}
+        self.merge_state({'visited_zones': {}, 'zone_counts': state['zone_counts']})
+
+    def merge_state(self, state):
+        self.visited_zones.update(state['visited_zones'])
+        for zone, zone_state in state['zone_counts'].items():
+            counts = self.zone_counts.get(zone)
+            if counts is None:
+                counts = self.zone_counts[zone] = self._new_counts()
+            for name, value in zone_state.items():
+                if isinstance(counts[name], Counter):
+                    counts[name].update(value)
+                else:
+                    counts[name] += value
 
     def process_end(self):
         # Redirect the default filehandle to the file specified by self.files
@@ -140,32 +178,39 @@ class F1(BaseWriter):
         if not self.visited_zones:
             logging.warning('Block eval.F1 was not applied to any zone. '
                             'Check the parameter zones=%s', self.zones)
-        elif len(self.visited_zones) > 1:
-            logging.warning('Block eval.F1 was applied to more than one zone %s. '
-                            'The results are mixed together. Check the parameter zones=%s',
-                            list(self.visited_zones.elements()), self.zones)
-        print('Comparing predicted trees (zone=%s) with gold trees (zone=%s), sentences=%d'
-              % (next(self.visited_zones.elements()), self.gold_zone,
-                 self.visited_zones.most_common(1)[0][1]))
+            self.print_results(self._new_counts())
+            return
+        for number, (zone, sentences) in enumerate(self.visited_zones.items()):
+            if number:
+                print()
+            print('Comparing predicted trees (zone=%s) with gold trees (zone=%s), sentences=%d'
+                  % (zone, self.gold_zone, sentences))
+            self.print_results(self.zone_counts[zone])
+
+    def print_results(self, counts):
+        """Print the details (if required) and totals of precision, recall and F1."""
         if self.details:
             print('=== Details ===')
             print('%-10s %5s %5s %5s %6s  %6s  %6s'
                   % ('token', 'pred', 'gold', 'corr', 'prec', 'rec', 'F1'))
-            tokens = self._total.most_common(self.details)
+            common, pred_counts, gold_counts = (counts['common'], counts['pred_counts'],
+                                                counts['gold_counts'])
+            tokens = counts['total'].most_common(self.details)
             for token, _ in tokens:
-                _prec = self._common[token] / (self._pred[token] or 1)
-                _rec = self._common[token] / (self._gold[token] or 1)
+                _prec = common[token] / (pred_counts[token] or 1)
+                _rec = common[token] / (gold_counts[token] or 1)
                 _f1 = 2 * _prec * _rec / ((_prec + _rec) or 1)
                 print('%-10s %5d %5d %5d %6.2f%% %6.2f%% %6.2f%%'
-                      % (token, self._pred[token], self._gold[token], self._common[token],
+                      % (token, pred_counts[token], gold_counts[token], common[token],
                          100 * _prec, 100 * _rec, 100 * _f1))
             print('=== Totals ===')
 
+        correct = counts['correct']
         print("%-9s = %7d\n" * 3
-              % ('predicted', self.pred, 'gold', self.gold, 'correct', self.correct), end='')
-        pred, gold = self.pred or 1, self.gold or 1  # prevent division by zero
-        precision = self.correct / pred
-        recall = self.correct / gold
+              % ('predicted', counts['pred'], 'gold', counts['gold'], 'correct', correct), end='')
+        pred, gold = counts['pred'] or 1, counts['gold'] or 1  # prevent division by zero
+        precision = correct / pred
+        recall = correct / gold
         f1 = 2 * precision * recall / ((precision + recall) or 1)
         print("%-9s = %6.2f%%\n" * 3
               % ('precision', 100 * precision, 'recall', 100 * recall, 'F1', 100 * f1), end='')
@@ -1,4 +1,8 @@
-"""Block eval.Parsing for evaluating UAS and LAS - gold and pred must have the same tokens."""
+"""Block eval.Parsing for evaluating UAS and LAS - gold and pred must have the same tokens.
+
+If there are more pred zones (all zones except for `gold_zone`, unless `zones` is specified),
+each of them is evaluated separately and the gold-side data are computed just once per sentence.
+"""
 from udapi.core.basewriter import BaseWriter
 
 
@@ -10,31 +14,77 @@ class Parsing(BaseWriter):
         super().__init__(**kwargs)
         self.gold_zone = gold_zone
         self.correct_las, self.correct_ulas, self.correct_uas, self.total = 0, 0, 0, 0
+        self.zone_counts = {}
+        self._gold_cache = None
+
+    def _gold_data(self, gold_tree):
+        """Return parent ords, deprels and udeprels of the gold nodes (cached for all zones)."""
+        if self._gold_cache is not None and self._gold_cache[0] is gold_tree:
+            return self._gold_cache[1]
+        gold_nodes = gold_tree.descendants
+        data = ([n.parent.ord for n in gold_nodes], [n.deprel for n in gold_nodes],
+                [n.udeprel for n in gold_nodes])
+        self._gold_cache = (gold_tree, data)
+        return data
 
     def process_tree(self, tree):
         gold_tree = tree.bundle.get_tree(self.gold_zone)
         if tree == gold_tree:
             return
         pred_nodes = tree.descendants
-        gold_nodes = gold_tree.descendants
-        if len(pred_nodes) != len(gold_nodes):
+        gold_parents, gold_deprels, gold_udeprels = self._gold_data(gold_tree)
+        if len(pred_nodes) != len(gold_parents):
             raise ValueError('The sentences do not match (%d vs. %d nodes)'
-                             % (len(pred_nodes), len(gold_nodes)))
+                             % (len(pred_nodes), len(gold_parents)))
 
+        correct_las, correct_ulas, correct_uas = 0, 0, 0
+        for pred_node, gold_parent, gold_deprel, gold_udeprel in zip(
+                pred_nodes, gold_parents, gold_deprels, gold_udeprels):
+            if pred_node.parent.ord == gold_parent:
+                correct_uas += 1
+                if pred_node.deprel == gold_deprel:
+                    correct_las += 1
+                if pred_node.udeprel == gold_udeprel:
+                    correct_ulas += 1
+        self.correct_las += correct_las
+        self.correct_ulas += correct_ulas
+        self.correct_uas += correct_uas
         self.total += len(pred_nodes)
-        for pred_node, gold_node in zip(pred_nodes, gold_nodes):
-            if pred_node.parent.ord == gold_node.parent.ord:
-                self.correct_uas += 1
-                if pred_node.deprel == gold_node.deprel:
-                    self.correct_las += 1
-                if pred_node.udeprel == gold_node.udeprel:
-                    self.correct_ulas += 1
+        counts = [correct_las, correct_ulas, correct_uas, len(pred_nodes)]
+        zone_counts = self.zone_counts.get(tree.zone, [0, 0, 0, 0])
+        self.zone_counts[tree.zone] = [a + b for a, b in zip(zone_counts, counts)]
 
+    def get_state(self):
+        return {'writer': super().get_state(),
+                'counts': [self.correct_las, self.correct_ulas, self.correct_uas, self.total],
+                'zone_counts': self.zone_counts}
+
+    def set_state(self, state):
+        super().set_state(state['writer'])
+        self.correct_las, self.correct_ulas, self.correct_uas, self.total = state['counts']
+        self.zone_counts = {zone: list(counts) for zone, counts in state['zone_counts'].items()}
+
+    def merge_state(self, state):
+        self.correct_las, self.correct_ulas, self.correct_uas, self.total = [
+            a + b for a, b in zip(self.get_state()['counts'], state['counts'])]
+        for zone, counts in state['zone_counts'].items():
+            zone_counts = self.zone_counts.get(zone, [0, 0, 0, 0])
+            self.zone_counts[zone] = [a + b for a, b in zip(zone_counts, counts)]
 
     def process_end(self):
         # Redirect the default filehandle to the file specified by self.files
         self.before_process_document(None)
-        print('nodes = %d' % self.total)
-        print('UAS           = %6.2f' % (100 * self.correct_uas / self.total))
-        print('LAS (deprel)  = %6.2f' % (100 * self.correct_las / self.total))
-        print('LAS (udeprel) = %6.2f' % (100 * self.correct_ulas / self.total))
+        if len(self.zone_counts) < 2:
+            self.print_scores(self.correct_las, self.correct_ulas, self.correct_uas, self.total)
+            return
+        for zone, counts in self.zone_counts.items():
+            print('zone = %s' % zone)
+            self.print_scores(*counts)
+
+    @staticmethod
+    def print_scores(correct_las, correct_ulas, correct_uas, total):
+        """Print the number of nodes, UAS and LAS."""
+        print('nodes = %d' % total)
+        print('UAS           = %6.2f' % (100 * correct_uas / total))
+        print('LAS (deprel)  = %6.2f' % (100 * correct_las / total))
+        print('LAS (udeprel) = %6.2f' % (100 * correct_ulas / total))
@@ -90,6 +90,19 @@ class Conllu(BaseReader):
 
         root.comment += line[1:] + "\n"
 
+    def skip_tree(self):
+        """Skip one tree without building it (used when resuming from a checkpoint)."""
+        if self.filehandle is None:
+            return False
+        has_nodes = False
+        for line in self.filehandle:
+            line = line.rstrip()
+            if line == '':
+                break
+            if line[0] != '#':
+                has_nodes = True
+        return has_nodes
+
     # pylint: disable=too-many-locals,too-many-branches,too-many-statements
     # Maybe the code could be refactored, but it is speed-critical,
     # so benchmarking is needed because calling extra methods may result in slowdown.
@@ -168,22 +181,27 @@ class Conllu(BaseReader):
             nodes.pop()
 
         # Set dependency parents (now, all nodes of the tree are created).
-        # TODO: parent setter checks for cycles, but this is something like O(n*log n)
-        # if done for each node. It could be done faster if the whole tree is checked at once.
-        # Also parent setter removes the node from its old parent's list of children,
-        # this could be skipped here by not using `node = root.create_child()`.
+        # root.set_heads checks for cycles in the whole tree at once, which is much faster
+        # than the parent setter for each node. If there is a cycle and fix_cycles is set,
+        # the parent setter is used node by node, so the cycles are fixed in the word order.
+        heads = {}
         for node_ord, node in enumerate(nodes[1:], 1):
             try:
-                node.parent = nodes[parents[node_ord]]
-            # TODO add a special Exception class for cycles
-            except ValueError as e:
-                if self.fix_cycles:
-                    logging.warning("Ignoring a cycle (attaching to the root instead):\n%s", e)
-                    node.parent = root
-                else:
-                    raise
+                heads[node] = nodes[parents[node_ord]]
             except IndexError:
                 raise ValueError("Node %s HEAD is out of range (%d)" % (node, parents[node_ord]))
+        try:
+            root.set_heads(heads)
+        # TODO add a special Exception class for cycles
+        except ValueError:
+            if not self.fix_cycles:
+                raise
+            for node, parent in heads.items():
+                try:
+                    node.parent = parent
+                except ValueError as e:
+                    logging.warning("Ignoring a cycle (attaching to the root instead):\n%s", e)
+                    node.parent = root
 
         # Create multi-word tokens.
         for fields in mwts:
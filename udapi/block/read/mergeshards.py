@@ -0,0 +1,64 @@
+"""MergeShards is a reader which merges CoNLL-U outputs of sharded runs into the original order.
+
+Usage:
+for i in $(seq 16); do udapy --shard $i/16 read.Conllu files=in.conllu ud.FixPunct \
+  write.Conllu files=out.$i.conllu; done  # each command possibly on a different machine
+udapy read.MergeShards files='!out.*.conllu' write.Conllu > out.conllu
+
+`udapy --shard i/N` stores a sequence number of each tree in a comment `# shard_seq = <number>`.
+This reader reads all the given files in parallel and k-way merges their trees
+according to the sequence numbers (and deletes the `shard_seq` comments).
+"""
+import heapq
+import re
+
+from udapi.block.read.conllu import Conllu
+
+RE_SHARD_SEQ = re.compile(r'^ shard_seq = (\d+)\n', re.MULTILINE)
+
+
+class MergeShards(Conllu):
+    """A reader merging CoNLL-U files created by `udapy --shard i/N` into the original order."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._heap = None
+        self._shard_readers = []
+
+    def _read_shard_tree(self, number):
+        tree = self._shard_readers[number].read_tree()
+        if tree is None:
+            return
+        match = RE_SHARD_SEQ.search(tree.comment)
+        if match is None:
+            raise ValueError('Tree %s in %s has no shard_seq comment'
+                             % (tree.sent_id, self.files.filenames[number]))
+        tree.comment = tree.comment[:match.start()] + tree.comment[match.end():]
+        heapq.heappush(self._heap, (int(match.group(1)), number, tree))
+
+    def next_filehandle(self):
+        """Open all the files at once (they are merged) and return a list of their handles."""
+        if self._heap is not None:
+            self.files.filehandle = None
+            return None
+        self._heap = []
+        handles = []
+        while True:
+            filehandle = self.files.next_filehandle()
+            if filehandle is None:
+                break
+            handles.append(filehandle)
+            reader = Conllu(filehandle=filehandle, strict=self.strict, separator=self.separator,
+                            empty_parent=self.empty_parent, fix_cycles=self.fix_cycles,
+                            attributes=','.join(self.node_attributes))
+            self._shard_readers.append(reader)
+            self._read_shard_tree(len(self._shard_readers) - 1)
+        self.files.filehandle = handles
+        return handles
+
+    def read_tree(self):
+        if not self._heap:
+            return None
+        _, number, tree = heapq.heappop(self._heap)
+        self._read_shard_tree(number)
+        return tree
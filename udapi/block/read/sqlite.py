@@ -0,0 +1,128 @@
+"""Sqlite is a reader block for the SQLite corpus store created by write.Sqlite.
+
+Usage:
+udapy read.Sqlite files=corpus.db sent_id=s1,s5 write.TextModeTrees
+udapy read.Sqlite files=corpus.db where="lemma='být' AND deprel='cop'" \
+  ud.FixPunct write.Sqlite files=corpus.db
+
+Only the selected trees are loaded and write.Sqlite rewrites just those of them which changed
+(and deletes those of them which were deleted, e.g. by `util.Filter`).
+All the trees are read within one transaction, so concurrent writers do not affect the result
+(the reader sees a consistent snapshot of the database).
+"""
+import collections
+import json
+import os
+import sqlite3
+
+from udapi.block.read.conllu import Conllu
+
+
+class Sqlite(Conllu):
+    """A reader of trees stored in an SQLite database by write.Sqlite."""
+
+    def __init__(self, where=None, sent_id=None, document=None, split_docs=True, **kwargs):
+        """Create the Sqlite reader object.
+
+        Args:
+        files: the database file(s)
+        where: an SQL condition selecting the trees to be loaded.
+            Columns of the table `trees` (`sent_id`, `zone`, `text`), `documents.name` and
+            of the table `tokens` (`form`, `lemma`, `upos`, `xpos`, `feats`, `deprel`,
+            `misc`,...) can be used, ambiguous columns must be qualified (e.g. `tokens.ord`).
+            A tree is selected if any of its tokens matches.
+            For example, `where="upos='VERB' AND feats LIKE '%Mood=Imp%'"`.
+        sent_id: comma-separated list of sent_ids of the trees to be loaded
+        document: name of the database document to be loaded (default=all documents)
+        split_docs: load each database document into a separate Udapi document (default=True)
+        """
+        super().__init__(split_docs=split_docs, **kwargs)
+        self.where = where
+        # The scenario parser converts numeric parameters (e.g. sent_id=1) to numbers.
+        self.sent_ids = str(sent_id).split(',') if sent_id is not None else None
+        self.document = str(document) if document is not None else None
+        self.connection = None
+        # Database ids of the trees in the order of reading and of the trees already read.
+        self._pending_ids = collections.deque()
+        self._row_ids = {}
+        self._db_filename = None
+
+    def _query(self):
+        conditions, params = [], []
+        if self.where is not None:
+            conditions.append('t.id IN (SELECT tree_id FROM tokens'
+                              ' JOIN trees ON trees.id=tree_id'
+                              ' JOIN bundles ON bundles.id=trees.bundle_id'
+                              ' JOIN documents ON documents.id=bundles.document_id'
+                              ' WHERE %s)' % self.where)
+        if self.sent_ids is not None:
+            conditions.append('t.sent_id IN (%s)' % ','.join('?' * len(self.sent_ids)))
+            params.extend(self.sent_ids)
+        if self.document is not None:
+            conditions.append('d.name=?')
+            params.append(self.document)
+        query = ('SELECT t.id, d.name, d.newdoc, d.json, t.conllu FROM trees t'
+                 ' JOIN bundles b ON b.id=t.bundle_id JOIN documents d ON d.id=b.document_id')
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        return query + ' ORDER BY d.id, b.ord, t.ord', params
+
+    def _lines(self, filename):
+        """Yield CoNLL-U lines of the selected trees, with `# newdoc` for each document."""
+        self.connection = sqlite3.connect('file:%s?mode=ro' % filename, uri=True,
+                                          isolation_level=None)
+        self.connection.execute('BEGIN')
+        last_document = None
+        try:
+            for tree_id, document, newdoc, doc_json, conllu in self.connection.execute(
+                    *self._query()):
+                self._pending_ids.append(tree_id)
+                if document != last_document:
+                    # Documents are separated by newdoc, but the name of the first document
+                    # is not printed if it was not specified in the original data.
+                    if newdoc == 2:
+                        yield '# newdoc'
+                    elif newdoc or last_document is not None:
+                        yield '# newdoc id = %s' % document
+                    for key, value in sorted(json.loads(doc_json or '{}').items()):
+                        yield '# doc_json_%s = %s' % (key, json.dumps(value, ensure_ascii=False))
+                    last_document = document
+                yield from conllu.rstrip('\n').split('\n')
+                yield ''
+        finally:
+            self.connection.execute('COMMIT')
+            self.connection.close()
+            self.connection = None
+
+    def read_tree(self):
+        root = super().read_tree()
+        if root is not None:
+            self._row_ids[root] = self._pending_ids.popleft()
+        return root
+
+    def skip_tree(self):
+        if not super().skip_tree():
+            return False
+        self._pending_ids.popleft()
+        return True
+
+    def process_document(self, document):
+        super().process_document(document)
+        row_ids, self._row_ids = self._row_ids, {}
+        if self._buffer is not None:
+            self._row_ids[self._buffer] = row_ids[self._buffer]
+        # With a selection, write.Sqlite must know which trees were loaded (and deleted since),
+        # so the database file and ids (`trees.id`) of the loaded trees are stored.
+        if self.where is not None or self.sent_ids is not None:
+            document.meta['sqlite_loaded'] = (self._db_filename, {
+                row_ids[tree] for bundle in document.bundles for tree in bundle
+                if tree in row_ids})
+
+    def next_filehandle(self):
+        """Go to the next database and return an iterator over its CoNLL-U lines."""
+        filename = self.files.next_filename()
+        self._trees_in_file = 0
+        self._pending_ids.clear()
+        self._db_filename = None if filename is None else os.path.abspath(filename)
+        self.files.filehandle = None if filename is None else self._lines(filename)
+        return self.files.filehandle
@@ -52,11 +52,13 @@ class Vislcg(BaseReader):
         nodes = root.descendants(add_self=True)
         if len(nodes) == 1:
             return None
+        heads = {}
         for node_ord, node in enumerate(nodes[1:], 1):
             try:
-                node.parent = nodes[parents[node_ord]]
+                heads[node] = nodes[parents[node_ord]]
             except IndexError:
                 raise ValueError("Node %s HEAD is out of range (%d)" % (node, parents[node_ord]))
+        root.set_heads(heads)
 
         return root
 
@@ -81,10 +81,11 @@ class ComplyWithText(Block):
         # Normalize the stored text (double space -> single space)
         # and skip sentences which are already ok.
         text = ' '.join(text.split())
-        if text == root.compute_text():
+        index = root.text_index()
+        if text == index.text:
             return
 
-        tree_chars, char_nodes = _nodes_to_chars(root.token_descendants)
+        tree_chars, char_nodes = index.text, index.char_tokens()
 
         # Align. difflib may not give LCS, but usually it is good enough.
         matcher = difflib.SequenceMatcher(None, tree_chars, text, autojunk=False)
@@ -101,17 +102,18 @@ class ComplyWithText(Block):
         self.solve_diffs(diffs, tree_chars, char_nodes, text)
 
         # Fill SpaceAfter=No.
-        tmp_text = text
+        offset = 0
         for node in root.token_descendants:
-            if tmp_text.startswith(node.form):
-                tmp_text = tmp_text[len(node.form):]
-                if not tmp_text or tmp_text[0].isspace():
+            if text.startswith(node.form, offset):
+                offset += len(node.form)
+                if offset == len(text) or text[offset].isspace():
                     del node.misc['SpaceAfter']
-                    tmp_text = tmp_text.lstrip()
+                    if offset < len(text):
+                        offset += 1  # the text is normalized, so there is a single space
                 else:
                     node.misc['SpaceAfter'] = 'No'
             else:
-                logging.warning('Node %s does not match text "%s"', node, tmp_text[:20])
+                logging.warning('Node %s does not match text "%s"', node, text[offset:offset + 20])
                 return
 
         # Edit root.text if needed.
@@ -239,18 +241,6 @@ class ComplyWithText(Block):
             node.form = form
 
 
-def _nodes_to_chars(nodes):
-    chars, char_nodes = [], []
-    for node in nodes:
-        form = node.form
-        if node.misc['SpaceAfter'] != 'No' and node != nodes[-1]:
-            form += ' '
-        chars.extend(form)
-        char_nodes.append(node)
-        char_nodes.extend([None] * (len(form) - 1))
-    return ''.join(chars), char_nodes
-
-
 def _log_diffs(diffs, tree_chars, text, msg):
     if logging.getLogger().isEnabledFor(logging.DEBUG):
         logging.warning('=== After %s:', msg)
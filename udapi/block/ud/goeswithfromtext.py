@@ -49,7 +49,8 @@ class GoeswithFromText(Block):
     # pylint: disable=too-many-branches
     def process_tree(self, root):
         text = root.text
-        computed = root.compute_text()
+        index = root.text_index()
+        computed = index.text
         if text == computed:
             return
 
@@ -62,24 +63,27 @@ class GoeswithFromText(Block):
         # Normalize the stored text (double space -> single space)
         text = ' '.join(text.split())
 
-        for node in root.token_descendants:
+        # Offsets of the not-yet-processed part of text and nospace_text
+        offset, nospace_offset = 0, 0
+        for node in index.tokens:
             nospace_form = node.form.replace(' ', '')
-            if text.startswith(node.form):
-                text = text[len(node.form):]
-                nospace_text = nospace_text[len(nospace_form):]
-                if not text or text[0].isspace():
+            if text.startswith(node.form, offset):
+                offset += len(node.form)
+                nospace_offset += len(nospace_form)
+                if offset == len(text) or text[offset].isspace():
                     del node.misc['SpaceAfter']
-                    text = text.lstrip()
+                    if offset < len(text):
+                        offset += 1  # the text is normalized, so there is a single space
                 else:
                     node.misc['SpaceAfter'] = 'No'
-            elif nospace_text.startswith(nospace_form):
-                nospace_text = nospace_text[len(nospace_form):]
+            elif nospace_text.startswith(nospace_form, nospace_offset):
+                nospace_offset += len(nospace_form)
                 len_raw_form = len(nospace_form)
-                while text[:len_raw_form].replace(' ', '') != nospace_form:
+                while text[offset:offset + len_raw_form].replace(' ', '') != nospace_form:
                     len_raw_form += 1
-                    assert len_raw_form <= len(text)
-                raw_form = text[:len_raw_form]
-                text = text[len_raw_form:]
+                    assert len_raw_form <= len(text) - offset
+                raw_form = text[offset:offset + len_raw_form]
+                offset += len_raw_form
                 tokens = raw_form.split(' ')
                 node.form = tokens[0]
                 if not self.keep_lemma:
@@ -92,11 +96,12 @@ class GoeswithFromText(Block):
                                               xpos=node.xpos, deprel='goeswith')
                     child.shift_after_node(last_node)
                     last_node = child
-                if not text or text[0].isspace():
-                    text = text.lstrip()
+                if offset == len(text) or text[offset].isspace():
+                    if offset < len(text):
+                        offset += 1
                 else:
                     last_node.misc['SpaceAfter'] = 'No'
             else:
                 assert False  # we have checked the whole sentence already
-        if text:
-            logging.warning('Extra text "%s" in tree %s', text, root)
+        if offset < len(text):
+            logging.warning('Extra text "%s" in tree %s', text[offset:], root)
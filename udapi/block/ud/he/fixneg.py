@@ -10,6 +10,8 @@ from udapi.core.block import Block
 class FixNeg(Block):
     """Block for fixing the remaining cases (after ud.Convert1to2) of deprel=neg in UD_Hebrew."""
 
+    fusible = True
+
     def process_node(self, node):
         # אינם is a negative copula verb
         if node.deprel == 'neg':
@@ -187,6 +187,12 @@ class MarkBugs(Block):
             self.cop_nodes[lemma].append(node)
             self.cop_count[lemma] += 1
 
+    def get_state(self):
+        return {'stats': self.stats}
+
+    def set_state(self, state):
+        self.stats = collections.Counter(state['stats'])
+
     def after_process_document(self, document):
         for lemma, _count in self.cop_count.most_common()[self.max_cop_lemmas:]:
             for node in self.cop_nodes[lemma]:
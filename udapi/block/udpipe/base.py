@@ -71,16 +71,22 @@ KNOWN_MODELS = {
 
 
 class Base(Block):
-    """Base class for all UDPipe blocks."""
+    """Base class for all UDPipe blocks.
+
+    The trees are processed in batches of `batch_size` trees (or `batch_tokens` tokens
+    if this is set), so UDPipe is called on native sentence objects
+    and the results are mapped back to the Udapi trees in bulk.
+    """
 
     # pylint: disable=too-many-arguments
-    def __init__(self, model=None, model_alias=None,
-                 tokenize=True, tag=True, parse=True, **kwargs):
+    def __init__(self, model=None, model_alias=None, tokenize=True, tag=True, parse=True,
+                 batch_size=1000, batch_tokens=0, **kwargs):
         """Create the udpipe.En block object."""
         super().__init__(**kwargs)
         self.model, self.model_alias = model, model_alias
         self._tool = None
         self.tokenize, self.tag, self.parse = tokenize, tag, parse
+        self.batch_size, self.batch_tokens = batch_size, batch_tokens
 
     @property
     def tool(self):
@@ -94,19 +100,39 @@ class Base(Block):
         self._tool = UDPipe(model=self.model)
         return self._tool
 
+    def process_start(self):
+        """Load the model now, so it is shared copy-on-write by forked worker processes."""
+        super().process_start()
+        _ = self.tool
+
+    def process_document(self, document):
+        trees, tokens = [], 0
+        for bundle in document.bundles:
+            for tree in bundle:
+                if not self._should_process_tree(tree):
+                    continue
+                trees.append(tree)
+                if self.batch_tokens:
+                    # Before tokenization, the number of tokens is estimated from the text.
+                    tokens += len(tree.descendants) if not self.tokenize \
+                        else len((tree.text or '').split())
+                if len(trees) >= self.batch_size or \
+                        (self.batch_tokens and tokens >= self.batch_tokens):
+                    self.process_trees(trees)
+                    trees, tokens = [], 0
+        if trees:
+            self.process_trees(trees)
+
     def process_tree(self, root):
+        self.process_trees([root])
+
+    def process_trees(self, roots):
+        """Process a batch of trees with a single call of the tool."""
         tok, tag, par = self.tokenize, self.tag, self.parse
-        if tok and tag and par:
-            return self.tool.tokenize_tag_parse_tree(root)
-        if not tok and tag and par:
-            return self.tool.tag_parse_tree(root)
-        # TODO
-        # return $self->tool->tokenize_tag_parse_tree($root) if  $tok &&  $tag &&  $par;
-        # return $self->tool->tokenize_tag_tree($root)       if  $tok &&  $tag && !$par;
-        # return $self->tool->tokenize_tree($root)           if  $tok && !$tag && !$par;
-        # return $self->tool->tag_parse_tree($root)          if !$tok &&  $tag &&  $par;
-        # return $self->tool->tag_tree($root)                if !$tok &&  $tag && !$par;
-        # return $self->tool->parse_tree($root)              if !$tok && !$tag &&  $par;
+        if tok:
+            return self.tool.tokenize_tag_parse_trees(roots, tag=tag, parse=par)
+        if tag or par:
+            return self.tool.tag_parse_trees(roots, tag=tag, parse=par)
         raise ValueError("Unimplemented tokenize=%s tag=%s parse=%s" % (tok, tag, par))
 
 '''
@@ -0,0 +1,57 @@
+"""Dedup is a block for deleting duplicate trees, e.g. in large web crawls."""
+import collections
+import logging
+
+from udapi.core.block import Block
+
+
+class Dedup(Block):
+    """Delete trees identical to some previous tree (in the given attributes and topology).
+
+    The trees are compared by their fingerprints (see `Node.fingerprint`),
+    so only the fingerprints need to be kept in memory and the input is processed
+    in one streaming pass (e.g. `udapy read.Conllu bundles_per_doc=1000 ...`).
+
+    Example usage from command line:
+    # delete exact duplicates
+    udapy -s util.Dedup < in.conllu > deduplicated.conllu
+
+    # delete trees with the same sentence (word forms), keeping at most 10M fingerprints
+    udapy -s util.Dedup attrs=form max_fingerprints=10000000 < in.conllu > out.conllu
+    """
+
+    def __init__(self, attrs='form,lemma,upos,xpos,feats,deprel,raw_deps,misc',
+                 max_fingerprints=0, **kwargs):
+        """Create the Dedup block object.
+
+        Args:
+        `attrs`: comma-separated list of (pseudo-)attributes used for comparing the trees
+            (in addition to the topology). The default means exact duplicates (all CoNLL-U
+            columns), `attrs=form` means the same word forms (i.e. the same sentence).
+        `max_fingerprints`: bound the memory by keeping only this number of the most recently
+            seen fingerprints. Duplicates farther apart may be missed. Default=0 means no limit.
+        """
+        super().__init__(**kwargs)
+        self.attrs = attrs.split(',')
+        self.max_fingerprints = max_fingerprints
+        self.seen = collections.OrderedDict()
+        self.trees, self.deleted = 0, 0
+
+    def process_tree(self, tree):
+        self.trees += 1
+        fingerprint = tree.fingerprint(self.attrs)
+        if fingerprint in self.seen:
+            self.seen.move_to_end(fingerprint)
+            self.deleted += 1
+            bundle = tree.bundle
+            tree.remove()
+            if not bundle.trees:
+                bundle.remove()
+            return
+        self.seen[fingerprint] = None
+        if self.max_fingerprints and len(self.seen) > self.max_fingerprints:
+            self.seen.popitem(last=False)
+
+    def process_end(self):
+        logging.info('util.Dedup: %d duplicate trees deleted out of %d',
+                     self.deleted, self.trees)
@@ -0,0 +1,169 @@
+"""util.Diff is a block for saving differences between two versions of trees as a compact patch.
+
+Example usage from command line::
+
+  # differences between two versions of a treebank
+  udapy read.Conllu zone=old files=v1.conllu \\
+        read.Conllu zone=new files=v2.conllu \\
+        util.Diff base_zone=old > v1-v2.patch
+
+  # re-create the second version from the first one (see `util.Patch`)
+  udapy -s util.Patch patch=v1-v2.patch < v1.conllu > v2.conllu
+
+The base trees and the new trees (within each document) are aligned by their sentences
+(computed from the word forms), similarly to aligning lines by the ``diff`` utility.
+Within each block of differing sentences, the trees are aligned again by their sent_ids
+(if known) and then nearby trees with similar word forms are aligned (in linear time),
+so e.g. inserting a word into each sentence does not result in deleting and inserting
+all the trees. Only the trees without any counterpart are deleted or inserted.
+The patch contains only the changed trees. Each changed tree is described by a header line,
+an edit script (see `udapi.core.treediff`) and an empty line. The header line is
+``@N<TAB>sent_id`` for changing the N-th base tree (counted from 1), ``@N-<TAB>sent_id``
+for deleting it and ``@N+`` for inserting a new tree after the N-th base tree
+(the edit script then describes the whole new tree). For example::
+
+  @2	s2
+  ~3	upos=NOUN	feats=Number=Sing
+  ~5	head=3
+
+  @7-	s7
+
+If the second version is loaded with ``ignore_sent_id=1`` (so its trees are just added
+to the existing bundles without warnings about different sent_ids),
+its sent_ids are not known, so changes of sent_id are not included in the patch.
+"""
+import difflib
+
+from udapi.core.basewriter import BaseWriter
+from udapi.core.root import Root
+from udapi.core.treediff import has_own_sent_id, tree_attr, tree_edits
+
+# Minimal similarity (`difflib.SequenceMatcher.ratio` of the word forms) of aligned trees.
+MIN_SIMILARITY = 0.5
+
+# How many following trees (in each version) are considered when looking for a similar tree.
+WINDOW = 10
+# Offsets of the candidate pairs of trees, ordered by the number of trees skipped.
+_OFFSETS = sorted(((i, j) for i in range(WINDOW) for j in range(WINDOW)), key=sum)
+
+
+def _align_by_forms(base_trees, new_trees):
+    """Yield pairs (base_tree, new_tree) aligning similar trees (by their word forms).
+
+    Unaligned trees are paired with None. The trees are aligned greedily from left to right:
+    if the next base tree and the next new tree are not similar enough, the nearest similar pair
+    within the next `WINDOW` trees of each version is aligned and the trees skipped before it
+    are deleted and inserted. So the time is linear in the number of trees.
+    """
+    base_forms = [[node.form for node in tree.descendants] for tree in base_trees]
+    new_forms = [[node.form for node in tree.descendants] for tree in new_trees]
+    matcher = difflib.SequenceMatcher(None, autojunk=False)
+
+    def similar(i, j):
+        matcher.set_seqs(base_forms[i], new_forms[j])
+        return matcher.real_quick_ratio() >= MIN_SIMILARITY \
+            and matcher.quick_ratio() >= MIN_SIMILARITY and matcher.ratio() >= MIN_SIMILARITY
+
+    base_i, new_j = 0, 0
+    while base_i < len(base_trees) and new_j < len(new_trees):
+        pair = next(((base_i + i, new_j + j) for i, j in _OFFSETS
+                     if base_i + i < len(base_trees) and new_j + j < len(new_trees)
+                     and similar(base_i + i, new_j + j)), None)
+        if pair is None:
+            yield base_trees[base_i], None
+            yield None, new_trees[new_j]
+            base_i, new_j = base_i + 1, new_j + 1
+            continue
+        for base_tree in base_trees[base_i:pair[0]]:
+            yield base_tree, None
+        for new_tree in new_trees[new_j:pair[1]]:
+            yield None, new_tree
+        yield base_trees[pair[0]], new_trees[pair[1]]
+        base_i, new_j = pair[0] + 1, pair[1] + 1
+    for base_tree in base_trees[base_i:]:
+        yield base_tree, None
+    for new_tree in new_trees[new_j:]:
+        yield None, new_tree
+
+
+def _align_changed(base_trees, new_trees):
+    """Yield pairs (base_tree, new_tree) aligning the trees by sent_id and then by forms."""
+    # Trees without their own sent_id (e.g. loaded with ignore_sent_id=1) are never aligned.
+    base_ids = [tree_attr(tree, 'sent_id') if has_own_sent_id(tree) else object()
+                for tree in base_trees]
+    new_ids = [tree_attr(tree, 'sent_id') if has_own_sent_id(tree) else object()
+               for tree in new_trees]
+    matcher = difflib.SequenceMatcher(None, base_ids, new_ids, autojunk=False)
+    for tag, base_lo, base_hi, new_lo, new_hi in matcher.get_opcodes():
+        if tag == 'equal':
+            yield from zip(base_trees[base_lo:base_hi], new_trees[new_lo:new_hi])
+        else:
+            yield from _align_by_forms(base_trees[base_lo:base_hi], new_trees[new_lo:new_hi])
+
+
+def align_trees(base_trees, new_trees):
+    """Yield pairs (base_tree, new_tree) of aligned trees, with None for unaligned trees."""
+    matcher = difflib.SequenceMatcher(None, [tree.compute_text() for tree in base_trees],
+                                      [tree.compute_text() for tree in new_trees],
+                                      autojunk=False)
+    for tag, base_lo, base_hi, new_lo, new_hi in matcher.get_opcodes():
+        if tag == 'equal':
+            yield from zip(base_trees[base_lo:base_hi], new_trees[new_lo:new_hi])
+        else:
+            yield from _align_changed(base_trees[base_lo:base_hi], new_trees[new_lo:new_hi])
+
+
+class Diff(BaseWriter):
+    """Print an edit script transforming the trees in `base_zone` into the trees in other zones."""
+
+    def __init__(self, base_zone='old', **kwargs):
+        """Create the Diff block object.
+
+        Args:
+        base_zone: Which zone contains the base (original) trees?
+            Trees in the other zones (which should be just one, see the parameter `zones`)
+            are aligned to the base trees and compared with them.
+        """
+        super().__init__(**kwargs)
+        self.base_zone = base_zone
+        self.trees, self.changed = 0, 0
+
+    def process_document(self, document):
+        base_trees, new_trees = [], []
+        for bundle in document.bundles:
+            for tree in bundle.trees:
+                if tree.zone == self.base_zone:
+                    base_trees.append(tree)
+                elif self._should_process_tree(tree):
+                    new_trees.append(tree)
+        if len({tree.zone for tree in new_trees}) > 1:
+            raise ValueError('More zones to be compared with base_zone=%s: %s, '
+                             'specify the parameter zones'
+                             % (self.base_zone, sorted({tree.zone for tree in new_trees})))
+
+        for base_tree, new_tree in align_trees(base_trees, new_trees):
+            if base_tree is None:
+                self.print_hunk('@%d+' % self.trees, tree_edits(Root(), new_tree))
+                continue
+            self.trees += 1
+            if new_tree is None:
+                self.print_hunk('@%d-\t%s' % (self.trees, tree_attr(base_tree, 'sent_id')), [])
+                continue
+            edits = tree_edits(base_tree, new_tree)
+            if edits:
+                self.print_hunk('@%d\t%s' % (self.trees, tree_attr(base_tree, 'sent_id')), edits)
+
+    def print_hunk(self, header, edits):
+        """Print one hunk of the patch."""
+        self.changed += 1
+        print(header)
+        for line in edits:
+            print(line)
+        print('')
+
+    def get_state(self):
+        return {'writer': super().get_state(), 'trees': self.trees, 'changed': self.changed}
+
+    def set_state(self, state):
+        super().set_state(state['writer'])
+        self.trees, self.changed = state['trees'], state['changed']
@@ -125,9 +125,9 @@ class Filter(Block):
                 tree.remove()
                 return
             else:
-                for node in kept_subtrees:
-                    node.parent = root
-                for orig_subroot in [n for n in root.children if n not in kept_subtrees]:
+                heads = {node: root for node in kept_subtrees}
+                root.set_heads(heads)
+                for orig_subroot in [n for n in root.children if n not in heads]:
                     orig_subroot.remove()
 
         if self.keep_node is not None:
@@ -9,7 +9,6 @@ udapy first.Block util.FindBug block=second.Block > bug.conllu
 
 This will create the file bug.conllu with the bundle, which caused the bug.
 """
-import copy
 import logging
 
 from udapi.core.basewriter import BaseWriter
@@ -41,7 +40,7 @@ class FindBug(BaseWriter):
         logging.debug("Trying to evaluate this: %s", command)
         new_block = eval(command)  # pylint: disable=eval-used
 
-        doc_copy = copy.deepcopy(document)
+        doc_copy = document.clone()
         writer = Conllu(files=self.orig_files)
 
         for bundle_no, bundle in enumerate(doc_copy.bundles, 1):
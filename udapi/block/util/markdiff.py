@@ -1,6 +1,7 @@
 """util.MarkDiff is a special block for marking differences between parallel trees."""
 import difflib
 from udapi.core.block import Block
+from udapi.core.node import Node
 
 
 class MarkDiff(Block):
@@ -12,6 +13,7 @@ class MarkDiff(Block):
         super().__init__(**kwargs)
         self.gold_zone = gold_zone
         self.attrs = attributes.split(',')
+        self._get_values = Node.compile_attrs(self.attrs)
         self.mark = mark
         self.add = add
 
@@ -30,8 +32,9 @@ class MarkDiff(Block):
         if len(pred_nodes) != len(gold_nodes):
             tree.add_comment('Mark = %s' % self.mark)
             gold_tree.add_comment('Mark = %s' % self.mark)
-        pred_tokens = ['_'.join(n.get_attrs(self.attrs)) for n in pred_nodes]
-        gold_tokens = ['_'.join(n.get_attrs(self.attrs)) for n in gold_nodes]
+        get_values = self._get_values
+        pred_tokens = ['_'.join(get_values(n)) for n in pred_nodes]
+        gold_tokens = ['_'.join(get_values(n)) for n in gold_nodes]
         matcher = difflib.SequenceMatcher(None, pred_tokens, gold_tokens, autojunk=False)
         diffs = list(matcher.get_opcodes())
 
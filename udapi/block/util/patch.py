@@ -0,0 +1,125 @@
+"""util.Patch is a block for applying a patch created by `util.Diff`.
+
+Example usage from command line::
+
+  udapy -s util.Patch patch=v1-v2.patch < v1.conllu > v2.conllu
+
+The patch is read in one streaming pass together with the input,
+so the memory needed does not depend on the size of the treebank or the patch.
+The trees are counted in the order of processing (in all the zones specified by the parameter
+`zones`), so the input must contain the same trees as the base zone used for `util.Diff`.
+"""
+import logging
+
+from udapi.core.block import Block
+from udapi.core.bundle import Bundle
+from udapi.core.files import Files
+from udapi.core.root import Root
+from udapi.core.treediff import apply_edits, tree_attr
+
+
+class Patch(Block):
+    """Apply a patch (edit scripts of trees) created by `util.Diff`."""
+
+    def __init__(self, patch, **kwargs):
+        """Create the Patch block object.
+
+        Args:
+        patch: the file with the patch (it can be compressed, e.g. `v1-v2.patch.gz`)
+        """
+        super().__init__(**kwargs)
+        self.patch = patch
+        self.trees = 0
+        self._hunks = None
+        self._next_hunk = None
+
+    def _read_hunks(self):
+        """Yield the hunks of the patch as tuples (tree number, operation, sent_id, lines)."""
+        header, lines = None, []
+        for line in Files(filenames=self.patch).next_filehandle():
+            line = line.rstrip('\n')
+            if header is None:
+                if line:
+                    header = line
+            elif line:
+                lines.append(line)
+            else:
+                yield self._parse_header(header) + (lines,)
+                header, lines = None, []
+        if header is not None:
+            yield self._parse_header(header) + (lines,)
+
+    @staticmethod
+    def _parse_header(header):
+        if header[0] != '@':
+            raise ValueError('Wrong header of a patch hunk: %r' % header)
+        number, sent_id = (header[1:].split('\t', 1) + [None])[:2]
+        operation = number[-1] if number[-1] in '+-' else '~'
+        return int(number.rstrip('+-')), operation, sent_id
+
+    def _advance(self):
+        self._next_hunk = next(self._hunks, None)
+
+    def _inserted_bundles(self, document, zone):
+        """Yield new bundles with the trees inserted after the current tree."""
+        while self._next_hunk is not None and self._next_hunk[:2] == (self.trees, '+'):
+            bundle = Bundle(document=document)
+            root = Root(zone=zone)
+            bundle.add_tree(root)
+            apply_edits(root, self._next_hunk[3])
+            self._advance()
+            yield bundle
+
+    def process_document(self, document):
+        if self._hunks is None:
+            self._hunks = self._read_hunks()
+            self._advance()
+            # Skip the hunks applied before the checkpoint (see set_state).
+            while self.trees and self._next_hunk is not None \
+                    and self._next_hunk[0] <= self.trees:
+                self._advance()
+
+        bundles, emptied, inserted = [], set(), False
+        if self.trees == 0:
+            for new_bundle in self._inserted_bundles(document, ''):
+                bundles.append(new_bundle)
+                inserted = True
+        for bundle in document.bundles:
+            bundles.append(bundle)
+            for tree in list(bundle.trees):
+                if not self._should_process_tree(tree):
+                    continue
+                self.trees += 1
+                if self._next_hunk is not None and self._next_hunk[0] <= self.trees \
+                        and self._next_hunk[1] != '+':
+                    number, operation, sent_id, lines = self._next_hunk
+                    if number != self.trees or sent_id != tree_attr(tree, 'sent_id'):
+                        raise ValueError('Patch hunk @%d (sent_id=%s) does not match tree #%d %s'
+                                         % (number, sent_id, self.trees, tree.address()))
+                    if operation == '-':
+                        tree.remove()
+                        if not bundle.trees:
+                            emptied.add(bundle)
+                    else:
+                        apply_edits(tree, lines)
+                    self._advance()
+                for new_bundle in self._inserted_bundles(document, tree.zone):
+                    bundles.append(new_bundle)
+                    inserted = True
+        if inserted or emptied:
+            document.bundles = [bundle for bundle in bundles if bundle not in emptied]
+            for number, bundle in enumerate(document.bundles, 1):
+                bundle.number = number
+
+    def process_end(self):
+        if self._next_hunk is not None:
+            remaining = 1 + sum(1 for _ in self._hunks)
+            logging.warning('util.Patch: %d hunks (from @%d) were not applied, '
+                            'the input has only %d trees',
+                            remaining, self._next_hunk[0], self.trees)
+
+    def get_state(self):
+        return {'trees': self.trees}
+
+    def set_state(self, state):
+        self.trees = state['trees']
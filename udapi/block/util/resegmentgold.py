@@ -7,10 +7,16 @@ from udapi.core.root import Root
 
 FUNCTIONAL = {'aux', 'cop', 'mark', 'det', 'clf', 'case', 'cc'}
 
+# str.translate table deleting all space separators (Unicode category Zs, all are <= U+3000).
+ZS_TABLE = {code: None for code in range(0x3001) if unicodedata.category(chr(code)) == 'Zs'}
+
+
 class ResegmentGold(Block):
     """Sentence-align two zones (gold and pred) and resegment the pred zone.
 
     The two zones must contain the same sequence of characters.
+    If there are more pred zones (e.g. outputs of several systems to be evaluated
+    with `eval.Conll18`), each of them is aligned to the gold zone independently.
     """
 
     def __init__(self, gold_zone='gold', **kwargs):
@@ -22,37 +28,53 @@ class ResegmentGold(Block):
 
     @staticmethod
     def _strip_spaces(string):
-        return ''.join(filter(lambda c: unicodedata.category(c) != "Zs", string))
+        return string.translate(ZS_TABLE)
+
+    def _tree_chars(self, tree):
+        return self._strip_spaces(tree.text_index().text)
 
     def process_document(self, document):
         if not document.bundles:
             return
-        pred_trees = self.extract_pred_trees(document)
+        pred_zones = []
+        for bundle in document.bundles:
+            for tree in bundle.trees:
+                if tree.zone != self.gold_zone and tree.zone not in pred_zones:
+                    pred_zones.append(tree.zone)
+        # Extract all the pred zones first, so that only the gold trees are left in the bundles.
+        zones_pred_trees = [self.extract_pred_trees(document, zone) for zone in pred_zones]
+        for pred_trees in zones_pred_trees:
+            self.resegment_zone(document, pred_trees)
+
+    def resegment_zone(self, document, pred_trees):
+        """Resegment the pred trees (of one zone, in reversed order) and add them to the bundles."""
         was_subroot = set()
         for pred_tree in pred_trees:
             for n in pred_tree.children:
                 was_subroot.add(n)
 
         for bundle_no, bundle in enumerate(document.bundles):
-            g_tree = bundle.trees[0]
+            g_tree = bundle.get_tree(self.gold_zone)
             p_tree = pred_trees.pop()
-            g_chars = self._strip_spaces(''.join(t.form for t in g_tree.token_descendants))
-            p_chars = self._strip_spaces(''.join(t.form for t in p_tree.token_descendants))
-            g_chars = ''.join(filter(lambda c: unicodedata.category(c) != "Zs", g_chars))
-            p_chars = ''.join(filter(lambda c: unicodedata.category(c) != "Zs", p_chars))
+            g_chars = self._tree_chars(g_tree)
+            p_chars = self._tree_chars(p_tree)
             if g_chars == p_chars:
                 bundle.add_tree(p_tree)
                 continue
 
             # Make sure that p_tree contains enough nodes.
             moved_roots = []
-            while len(p_chars) < len(g_chars):
+            p_chars_list = [p_chars]
+            p_len = len(p_chars)
+            while p_len < len(g_chars):
                 if not pred_trees:
-                    raise ValueError('no pred_trees:\n%s\n%s' % (p_chars, g_chars))
+                    raise ValueError('no pred_trees:\n%s\n%s' % (''.join(p_chars_list), g_chars))
                 new_p_tree = pred_trees.pop()
-                p_chars += self._strip_spaces(''.join(t.form for t in new_p_tree.token_descendants))
+                p_chars_list.append(self._tree_chars(new_p_tree))
+                p_len += len(p_chars_list[-1])
                 moved_roots.extend(new_p_tree.children)
                 p_tree.steal_nodes(new_p_tree.descendants)
+            p_chars = ''.join(p_chars_list)
             self.choose_root(p_tree, was_subroot, g_tree)
 
             if not p_chars.startswith(g_chars):
@@ -63,11 +85,14 @@ class ResegmentGold(Block):
                 continue
 
             # Now p_tree contains more nodes than it should.
-            p_chars = ''
+            # p_len is the number of (non-space) characters of the tokens processed so far.
+            p_len = 0
             tokens = p_tree.token_descendants
             for index, token in enumerate(tokens):
-                p_chars += self._strip_spaces(token.form)
-                if len(p_chars) > len(g_chars):
+                token_chars = self._strip_spaces(token.form)
+                p_len += len(token_chars)
+                if p_len > len(g_chars):
+                    overflow = token_chars[len(g_chars) - p_len:]
                     logging.warning('Pred token crossing gold sentences: %s', g_tree.sent_id)
                     # E.g. gold cs ln95048-151-p2s8 contains SpaceAfter=No on the last word
                     # of the sentence, resulting in "uklidnila.Komentář" in the raw text.
@@ -76,15 +101,15 @@ class ResegmentGold(Block):
                     if index + 1 == len(tokens):
                         next_p_tree = Root(zone=p_tree.zone)
                         pred_trees.append(next_p_tree)
-                        next_p_tree.create_child(deprel='wrong', form=p_chars[len(g_chars):],
+                        next_p_tree.create_child(deprel='wrong', form=overflow,
                                                  misc='Rehanged=Yes')
                         bundle.add_tree(p_tree)
                         break
                     else:
                         next_tok = tokens[index + 1]
-                        next_tok.form = p_chars[len(g_chars):] + next_tok.form
-                        p_chars = g_chars
-                if len(p_chars) == len(g_chars):
+                        next_tok.form = overflow + next_tok.form
+                        p_len = len(g_chars)
+                if p_len == len(g_chars):
                     next_p_tree = Root(zone=p_tree.zone)
                     words = []
                     for token in tokens[index + 1:]:
@@ -103,21 +128,22 @@ class ResegmentGold(Block):
                                 word.misc['FuncChildMissing'] = 'Yes'
                     next_p_tree.steal_nodes(words)
                     self.choose_root(p_tree, was_subroot, g_tree)
-                    self.choose_root(next_p_tree, was_subroot, document.bundles[bundle_no + 1].trees[0])
+                    next_g_tree = document.bundles[bundle_no + 1].get_tree(self.gold_zone)
+                    self.choose_root(next_p_tree, was_subroot, next_g_tree)
                     pred_trees.append(next_p_tree)
                     bundle.add_tree(p_tree)
                     break
 
-    def extract_pred_trees(self, document):
-        """Delete all trees with zone!=gold_zone from the document and return them."""
+    def extract_pred_trees(self, document, zone=None):
+        """Delete all trees with zone!=gold_zone from the document and return them.
+
+        If `zone` is specified, only the trees in this zone are deleted and returned.
+        The trees are returned in reversed order.
+        """
         pred_trees = []
         for bundle in reversed(document.bundles):
-            zones = [t.zone for t in bundle.trees]
-            if len(zones) > 2 or (len(zones) == 2 and self.gold_zone not in zones):
-                raise ValueError('Expected two zones including gold_zone=%s, but found: %s'
-                                 % (self.gold_zone, zones))
             for tree in bundle.trees:
-                if tree.zone != self.gold_zone:
+                if tree.zone != self.gold_zone and zone in (None, tree.zone):
                     pred_trees.append(tree)
                     tree.remove()
         for bundle in document.bundles:
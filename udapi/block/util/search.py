@@ -0,0 +1,298 @@
+"""util.Search is a block for searching tree patterns specified in a small query language.
+
+Example usage from command line::
+# verbs with an object child whose lemma starts with "book", the verb left of its parent
+udapy -TM util.Search query='[upos=VERB dir=left] > [deprel=obj lemma~^book]' < in | less -R
+
+# the same, but only trees which may match according to an index are searched
+udapy util.SearchIndex index=corpus.idx.json < corpus.conllu
+udapy -TM util.Search query='...' index=corpus.idx.json < corpus.conllu
+
+The index must be rebuilt whenever the input changes. Trees missing in the index (by sent_id)
+are always searched and a warning about the stale index is logged if the input trees differ
+from the indexed ones, but changed attributes of the indexed trees cannot be detected.
+
+Query syntax: a sequence of node specifications connected with relations.
+A node specification is a list of constraints in square brackets (separated by spaces or commas).
+A constraint is `attr=value`, `attr!=value`, `attr~regex` or `attr!~regex`,
+where `attr` is any (pseudo-)attribute supported by `node.get_attrs`,
+e.g. `form`, `lemma`, `upos`, `deprel`, `feats[Case]`, `misc[SpaceAfter]`, `dir`, `p_upos`.
+Values with spaces, commas or brackets can be quoted with double quotes.
+Relations between the two neighboring node specifications A and B are:
+`A > B` (B is a child of A), `A >> B` (B is a descendant of A),
+`A < B` (B is the parent of A) and `A << B` (B is an ancestor of A).
+
+All nodes of each match are marked with `Mark=<mark>` in MISC (as `util.Mark` does),
+so the matches can be highlighted with `udapy -TM`.
+"""
+import json
+import logging
+import re
+
+from udapi.core.block import Block
+from udapi.core.node import Node
+
+# Attributes stored in the index built by util.SearchIndex (plus all the features).
+INDEXED_ATTRS = ('form', 'lemma', 'upos', 'xpos', 'deprel')
+
+RELATIONS = ('>>', '<<', '>', '<')
+INVERSE_RELATIONS = {'>': '<', '<': '>', '>>': '<<', '<<': '>>'}
+
+# Heuristic selectivity of equality constraints used if no index is available (lower=better).
+ATTR_SELECTIVITY = {'form': 1, 'lemma': 1, 'xpos': 3, 'deprel': 4, 'upos': 5}
+
+RE_TOKEN = re.compile(r'\s*(\w+\[[^\]]*\][^\s\[\],"]*|\[|\]|>>|<<|>|<|,|"(?:[^"\\]|\\.)*"'
+                      r'|[^\s\[\],"]+)')
+RE_CONSTRAINT = re.compile(r'^([^=!~]+)(!=|!~|=|~)(.*)$')
+
+
+def _tokenize(query):
+    tokens, pos = [], 0
+    query = query.strip()
+    while pos < len(query):
+        match = RE_TOKEN.match(query, pos)
+        if not match:
+            raise ValueError('Cannot parse query %r at position %d' % (query, pos))
+        tokens.append(match.group(1))
+        pos = match.end()
+    return tokens
+
+
+def _unquote(value):
+    if len(value) > 1 and value[0] == '"' and value[-1] == '"':
+        return re.sub(r'\\(.)', r'\1', value[1:-1])
+    return value
+
+
+def _getter(attr):
+    """Return a function returning the (pseudo-)attribute `attr` of a node as a string."""
+    if attr in ('form', 'lemma', 'upos', 'xpos', 'deprel'):
+        return lambda node: getattr(node, attr) or ''
+    if attr.startswith('feats[') and attr.endswith(']'):
+        name = attr[6:-1]
+        return lambda node: node.feats[name]
+    if attr.startswith('misc[') and attr.endswith(']'):
+        name = attr[5:-1]
+        return lambda node: node.misc[name]
+    get_values = Node.compile_attrs([attr], undefs='')
+    return lambda node: ' '.join(get_values(node))
+
+
+class Constraint(object):
+    """One compiled constraint, e.g. `lemma=dog` or `deprel~^nmod`."""
+
+    def __init__(self, attr, operator, value):
+        self.attr, self.operator, self.value = attr, operator, value
+        self.get = _getter(attr)
+        self.regex = re.compile(value) if '~' in operator else None
+        self.negated = operator.startswith('!')
+
+    @property
+    def index_key(self):
+        """The key in the inverted index if this constraint is a positive indexable equality."""
+        if self.operator != '=':
+            return None
+        if self.attr in INDEXED_ATTRS or self.attr.startswith('feats['):
+            return '%s=%s' % (self.attr, self.value)
+        return None
+
+    def cost(self):
+        """Heuristic selectivity (lower is more selective) used if no index is available."""
+        if self.operator == '=':
+            if self.attr.startswith('feats['):
+                return 2
+            return ATTR_SELECTIVITY.get(self.attr, 6)
+        return 8 if self.operator == '~' else 10
+
+    def __call__(self, node):
+        value = self.get(node)
+        if self.regex is not None:
+            result = self.regex.search(value) is not None
+        else:
+            result = value == self.value
+        return result != self.negated
+
+    def __str__(self):
+        return '%s%s%s' % (self.attr, self.operator, self.value)
+
+
+class NodeSpec(object):
+    """A compiled node specification: a list of constraints, the most selective first."""
+
+    def __init__(self, constraints):
+        self.constraints = constraints
+
+    def sort(self, selectivity):
+        """Order the constraints by the given selectivity function (lower=checked first)."""
+        self.constraints.sort(key=selectivity)
+
+    def __call__(self, node):
+        for constraint in self.constraints:
+            if not constraint(node):
+                return False
+        return True
+
+
+def compile_query(query):
+    """Compile a query string into a tuple (list of NodeSpecs, list of relations)."""
+    tokens = _tokenize(query)
+    specs, relations = [], []
+    i = 0
+    while True:
+        if i >= len(tokens) or tokens[i] != '[':
+            raise ValueError('Expected "[" in query %r' % query)
+        i += 1
+        constraints = []
+        while i < len(tokens) and tokens[i] != ']':
+            token = tokens[i]
+            i += 1
+            if token == ',':
+                continue
+            match = RE_CONSTRAINT.match(token)
+            if not match:
+                raise ValueError('Cannot parse constraint %r in query %r' % (token, query))
+            attr, operator, value = match.groups()
+            if value == '' and i < len(tokens) and tokens[i].startswith('"'):
+                value = tokens[i]
+                i += 1
+            constraints.append(Constraint(attr, operator, _unquote(value)))
+        if i >= len(tokens):
+            raise ValueError('Missing "]" in query %r' % query)
+        i += 1
+        specs.append(NodeSpec(constraints))
+        if i == len(tokens):
+            return specs, relations
+        if tokens[i] not in RELATIONS:
+            raise ValueError('Expected a relation (%s) instead of %r in query %r'
+                             % (' '.join(RELATIONS), tokens[i], query))
+        relations.append(tokens[i])
+        i += 1
+
+
+def _related(node, relation):
+    """Return nodes which are in the given relation to the node."""
+    if relation == '>':
+        return node.children
+    if relation == '>>':
+        return node.descendants
+    if relation == '<':
+        return [] if node.parent is None or node.parent.is_root() else [node.parent]
+    ancestors = []
+    node = node.parent
+    while node is not None and not node.is_root():
+        ancestors.append(node)
+        node = node.parent
+    return ancestors
+
+
+def load_index(filename):
+    """Load an index stored by util.SearchIndex and return a tuple (sent_ids, postings)."""
+    with open(filename, encoding='utf-8') as index_file:
+        data = json.load(index_file)
+    return data['sent_ids'], data['postings']
+
+
+class Search(Block):
+    """Search tree patterns specified in a query language and mark the matching nodes."""
+
+    def __init__(self, query, mark=1, index=None, **kwargs):
+        """Create the Search block object.
+
+        Args:
+        `query`: the tree pattern (see the module documentation for the syntax).
+        `mark`: the matched nodes will be marked with `Mark=<mark>` in `node.misc`. Default=1.
+        `index`: a file with an inverted index created by util.SearchIndex.
+            Trees which cannot match according to the index are skipped.
+        """
+        super().__init__(**kwargs)
+        self.query = query
+        self.mark = mark
+        self.specs, self.relations = compile_query(query)
+        self.index = index
+        self.candidate_trees = None
+        self.indexed_trees = None
+        self.matches, self.matched_trees = 0, 0
+        self.seen_indexed, self.unknown_trees = 0, 0
+
+        selectivity = lambda constraint: (constraint.cost(),)
+        if index is not None:
+            sent_ids, postings = load_index(index)
+            counts = {key: len(postings.get(key, ())) for key in
+                      (c.index_key for s in self.specs for c in s.constraints) if key}
+            # Constraints with fewer matching trees in the index are more selective.
+            selectivity = lambda constraint: (counts.get(constraint.index_key, len(sent_ids) + 1),
+                                              constraint.cost())
+            for key in counts:
+                tree_numbers = set(postings.get(key, ()))
+                if self.candidate_trees is None:
+                    self.candidate_trees = tree_numbers
+                else:
+                    self.candidate_trees &= tree_numbers
+            if self.candidate_trees is not None:
+                self.indexed_trees = set(sent_ids)
+                self.candidate_trees = {sent_ids[i] for i in self.candidate_trees}
+                logging.info('util.Search: %d candidate trees out of %d according to the index',
+                             len(self.candidate_trees), len(sent_ids))
+
+        for spec in self.specs:
+            spec.sort(selectivity)
+        # Start matching from the most selective node specification.
+        spec_costs = [min([selectivity(c) for c in s.constraints] or [(float('inf'),)])
+                      for s in self.specs]
+        self.anchor = spec_costs.index(min(spec_costs))
+
+    def _extend(self, match, index, step):
+        """Yield complete matches extending the partial `match` from spec number `index`."""
+        next_index = index + step
+        if next_index < 0 or next_index >= len(self.specs):
+            yield match
+            return
+        if step == 1:
+            relation = self.relations[index]
+        else:
+            relation = INVERSE_RELATIONS[self.relations[next_index]]
+        spec = self.specs[next_index]
+        for node in _related(match[index], relation):
+            if node not in match.values() and spec(node):
+                match[next_index] = node
+                yield from self._extend(match, next_index, step)
+                del match[next_index]
+
+    def find(self, tree):
+        """Yield all matches in the tree, each match is a list of nodes (one for each spec)."""
+        anchor_spec = self.specs[self.anchor]
+        for node in tree.descendants:
+            if not anchor_spec(node):
+                continue
+            match = {self.anchor: node}
+            for right_match in self._extend(match, self.anchor, 1):
+                for full_match in self._extend(right_match, self.anchor, -1):
+                    yield [full_match[i] for i in range(len(self.specs))]
+
+    def process_tree(self, tree):
+        if self.candidate_trees is not None:
+            address = tree.address()
+            if address not in self.indexed_trees:
+                self.unknown_trees += 1
+            else:
+                self.seen_indexed += 1
+                if address not in self.candidate_trees:
+                    return
+        found = False
+        for match in self.find(tree):
+            found = True
+            self.matches += 1
+            for node in match:
+                node.misc['Mark'] = self.mark
+        if found:
+            self.matched_trees += 1
+
+    def process_end(self):
+        if self.indexed_trees is not None and (
+                self.unknown_trees or self.seen_indexed != len(self.indexed_trees)):
+            logging.warning('util.Search: the index %s is stale (%d trees not in the index, '
+                            '%d indexed trees not seen), rebuild it with util.SearchIndex',
+                            self.index, self.unknown_trees,
+                            len(self.indexed_trees) - self.seen_indexed)
+        logging.info('util.Search: %d matches in %d trees for query %s',
+                     self.matches, self.matched_trees, self.query)
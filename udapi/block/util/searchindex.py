@@ -0,0 +1,51 @@
+"""util.SearchIndex is a block for building an inverted index used by util.Search.
+
+Example usage from command line::
+udapy util.SearchIndex index=corpus.idx.json < corpus.conllu
+udapy -TM util.Search query='[lemma=book] > [upos=DET]' index=corpus.idx.json < corpus.conllu
+
+The index maps `attr=value` keys (for form, lemma, upos, xpos, deprel and all features,
+e.g. `feats[Case]=Nom`) to the list of trees (sent_ids) where the value occurs.
+It is stored as a JSON file when all the input is processed.
+"""
+import json
+import logging
+
+from udapi.core.block import Block
+from udapi.block.util.search import INDEXED_ATTRS, _getter
+
+
+class SearchIndex(Block):
+    """Build an inverted index (attribute value -> trees) for util.Search."""
+
+    def __init__(self, index, **kwargs):
+        """Create the SearchIndex block object.
+
+        Args:
+        `index`: the file where the index will be stored.
+        """
+        super().__init__(**kwargs)
+        self.index = index
+        self.sent_ids = []
+        self.postings = {}
+        # The same getters as in util.Search, so that e.g. a missing lemma is indexed as `lemma=`.
+        self._getters = [(attr, _getter(attr)) for attr in INDEXED_ATTRS]
+
+    def process_tree(self, tree):
+        tree_number = len(self.sent_ids)
+        self.sent_ids.append(tree.address())
+        keys = set()
+        for node in tree.descendants:
+            for attr, getter in self._getters:
+                keys.add('%s=%s' % (attr, getter(node)))
+            for name, value in node.feats.items():
+                keys.add('feats[%s]=%s' % (name, value))
+        for key in keys:
+            self.postings.setdefault(key, []).append(tree_number)
+
+    def process_end(self):
+        logging.info('util.SearchIndex: storing %d keys for %d trees to %s',
+                     len(self.postings), len(self.sent_ids), self.index)
+        with open(self.index, 'w', encoding='utf-8') as index_file:
+            json.dump({'sent_ids': self.sent_ids, 'postings': self.postings},
+                      index_file, ensure_ascii=False)
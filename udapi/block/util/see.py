@@ -41,6 +41,7 @@ from collections import Counter
 import re  # may be useful in eval, thus pylint: disable=unused-import
 
 from udapi.core.block import Block
+from udapi.core.columns import ColumnStats
 
 STATS = 'dir,edge,depth,children,siblings,p_upos,p_lemma,c_upos,form,lemma,upos,deprel,feats_split'
 
@@ -65,37 +66,41 @@ class See(Block):
         """
         super().__init__(**kwargs)
         self.node = node
+        self._node_code = compile(node, '<node>', 'eval')
         self.n_limit = n
         self.stats = stats.split(',')
-        self.match = dict()
-        self.every = dict()
-        for stat in self.stats:
-            self.match[stat] = Counter()
-            self.every[stat] = Counter()
+        # The statistics are computed column by column for whole trees, see udapi.core.columns.
+        self._column_stats = ColumnStats(self.stats)
+        self.match = self._column_stats.match
+        self.every = self._column_stats.every
         self.overall = Counter()
 
     def process_tree(self, root):
         self.overall['trees'] += 1
-        tree_match = False
+        code, matching = self._node_code, []
         for node in root.descendants:
-            matching = self.process_node(node)
-            self.overall['nodes'] += 1
-            if matching:
-                self.overall['matching_nodes'] += 1
-                if not tree_match:
-                    self.overall['matching_trees'] += 1
-                    tree_match = True
-
-    def process_node(self, node):
-        matching = eval(self.node)
+            matching.append(bool(eval(code)))
+        self._column_stats.add_tree(root, matching)
+        matching_nodes = sum(matching)
+        self.overall['nodes'] += len(matching)
+        if matching_nodes:
+            self.overall['matching_nodes'] += matching_nodes
+            self.overall['matching_trees'] += 1
+
+    def get_state(self):
+        return {'match': self.match, 'every': self.every, 'overall': self.overall}
+
+    def set_state(self, state):
+        self.match = {stat: Counter(counts) for stat, counts in state['match'].items()}
+        self.every = {stat: Counter(counts) for stat, counts in state['every'].items()}
+        self._column_stats.match, self._column_stats.every = self.match, self.every
+        self.overall = Counter(state['overall'])
+
+    def merge_state(self, state):
         for stat in self.stats:
-            for value in node.get_attrs([stat], undefs=''):
-                self.every[stat][value] += 1
-                self.every[stat]['T O T A L'] += 1
-                if matching:
-                    self.match[stat][value] += 1
-                    self.match[stat]['T O T A L'] += 1
-        return matching
+            self.match[stat].update(state['match'][stat])
+            self.every[stat].update(state['every'][stat])
+        self.overall.update(state['overall'])
 
     def process_end(self):
         print(self.node)
@@ -5,6 +5,8 @@ from udapi.core.block import Block
 class Wc(Block):
     """Special block for printing statistics (word count etc)."""
 
+    read_only = True
+
     def __init__(self, **kwargs):
         """Create the Wc block object."""
         super().__init__(**kwargs)
@@ -12,12 +14,22 @@ class Wc(Block):
 
     def process_tree(self, tree):
         self.trees += 1
-        self.words += len(tree.descendants)
-        mwtoks = len(tree.multiword_tokens)
-        self.mwts += mwtoks
-        self.tokens += len(tree.token_descendants) if mwtoks else len(tree.descendants)
+        words, mwts = len(tree.descendants), tree.multiword_tokens
+        self.words += words
+        self.mwts += len(mwts)
+        # Each multi-word token replaces its words, no need to build tree.token_descendants.
+        self.tokens += words - sum(len(mwt.words) - 1 for mwt in mwts)
         self.empty += len(tree.empty_nodes)
 
+    def get_state(self):
+        return [self.trees, self.words, self.mwts, self.tokens, self.empty]
+
+    def set_state(self, state):
+        self.trees, self.words, self.mwts, self.tokens, self.empty = state
+
+    def merge_state(self, state):
+        self.set_state([a + b for a, b in zip(self.get_state(), state)])
+
     def process_end(self):
         print('%8d trees\n%8d words' % (self.trees, self.words))
         if self.mwts:
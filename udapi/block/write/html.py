@@ -1,5 +1,13 @@
 """Html class is a writer for HTML+JavaScript+SVG visualization of dependency trees."""
+import json
+import os
+import sys
+
 from udapi.core.basewriter import BaseWriter
+from udapi.core.node import Node
+
+_NODE_VALUES = Node.compile_attrs(
+    ['ord', 'misc', 'form', 'lemma', 'upos', 'xpos', 'feats', 'deprel'], undefs='')
 
 
 class Html(BaseWriter):
@@ -45,9 +53,19 @@ class Html(BaseWriter):
 
     When viewing the html file, the JavaScript library `js-treex-view`
     generates an svg on the fly from the json.
+
+    For large documents (which would freeze the browser), use `bundles_per_chunk`::
+
+      udapy write.Html bundles_per_chunk=100 files=big.html < big.conllu
+      firefox big.html
+
+    This stores the json in files `big_chunks/doc001_chunk0001.js` etc. (100 bundles per file,
+    numbered by the document and the chunk, so documents written into the same output
+    or chunks_dir do not overwrite each other's chunks)
+    and `big.html` is just a small index page, which loads the chunks as the user pages.
     """
 
-    def __init__(self, path_to_js='web', **kwargs):
+    def __init__(self, path_to_js='web', bundles_per_chunk=0, chunks_dir=None, **kwargs):
         """Create the writer.
 
         Arguments:
@@ -58,11 +76,22 @@ class Html(BaseWriter):
           https://code.jquery.com/jquery-2.1.4.min.js
           will be linked.
           `path_to_js=.` means the libraries will be searched in the current directory.
+        * `bundles_per_chunk` if non-zero, the json data are not included in the html file,
+          but stored in separate files (chunks) with this number of bundles each,
+          which are loaded only when the user goes to the given page.
+          This way even documents with many thousands of sentences can be viewed.
+        * `chunks_dir` directory for the chunks (it is also used as a relative path
+          from the html file). The default is the html filename with suffix `_chunks`
+          instead of `.html`, so when writing to stdout, `chunks_dir` must be specified.
         """
         super().__init__(**kwargs)
         self.path_to_js = path_to_js
+        self.bundles_per_chunk = bundles_per_chunk
+        self.chunks_dir = chunks_dir
+        self.documents = 0
 
-    def process_document(self, doc):
+    def print_head(self):
+        """Print the html header with the JavaScript libraries and the Save button."""
         if self.path_to_js == 'web':
             jquery = 'https://code.jquery.com/jquery-2.1.4.min.js'
             fsaver = 'https://cdn.rawgit.com/eligrey/FileSaver.js/1.3.4/FileSaver.min.js'
@@ -78,72 +107,174 @@ class Html(BaseWriter):
             print('<script src="%s"></script>' % js_file)
         print('</head>\n<body>')
         print('<button style="float:right" type="submit" onclick="saveTree()">'
-              '<span>Save as SVG</span></button><div id="treex-view"></div><script>')
+              '<span>Save as SVG</span></button>', end='')
+
+    def process_document(self, doc):
+        if self.bundles_per_chunk:
+            self.process_document_chunked(doc)
+            return
+        self.print_head()
+        print('<div id="treex-view"></div><script>')
         print('data=[')
         for (bundle_number, bundle) in enumerate(doc, 1):
             # TODO: if not self._should_process_bundle(bundle): continue
             if bundle_number != 1:
                 print(',', end='')
-            print('{"zones":{', end='')
-            first_zone = True
-            desc = ''
-            for tree in bundle.trees:
-                # TODO: if not self._should_process_tree(tree): continue
-                zone = tree.zone
-                if first_zone:
-                    first_zone = False
-                else:
-                    print(',', end='')
-                print('"%s":{"sentence":"%s",' % (zone, _esc(tree.text)), end='')
-                print('"trees":{"a":{"language":"%s","nodes":[' % zone)
-                print('{"id":%s,"parent":null,' % _id(tree), end='')
-                print('"firstson":' + _id(tree.children[0] if tree.children else None), end=',')
-                print('"labels":["zone=%s","id=%s"]}' % (zone, tree.address()))
-                desc += ',["[%s]","label"],[" ","space"]' % zone
-                for node in tree.descendants:
-                    desc += self.print_node(node)
-                desc += r',["\n","newline"]'
-                print(']}}}')
-            # print desc without the extra starting comma
-            print('},"desc":[%s]}' % desc[1:])
+            print(self.bundle_json(bundle), end='')
         print('];')
         print("$('#treex-view').treexView(data);")
-        print('''function saveTree() {
-         var svg_el = jQuery('svg');
-         if (svg_el.length) {
-            var svg = new Blob([svg_el.parent().html()], {type: "image/svg+xml"});
-            saveAs(svg, 'tree.svg');
-         }
-        }''')
+        print(SAVE_TREE_JS)
         print('</script></body></html>')
 
+    def process_document_chunked(self, doc):
+        """Write the json data into chunk files and print an index page which loads them."""
+        chunks_dir = self.chunks_dir
+        if chunks_dir is None:
+            html_filename = getattr(sys.stdout, 'name', None)
+            if not isinstance(html_filename, str) or html_filename.startswith('<'):
+                raise ValueError('write.Html bundles_per_chunk=N needs chunks_dir=DIR'
+                                 ' when writing to stdout')
+            chunks_dir = os.path.splitext(html_filename)[0] + '_chunks'
+            chunks_src = os.path.relpath(chunks_dir, os.path.dirname(html_filename) or '.')
+        else:
+            chunks_src = chunks_dir
+        os.makedirs(chunks_dir, exist_ok=True)
+        self.documents += 1
+
+        # Each chunk is a JavaScript file calling udapiChunk(number, data), so that it can be
+        # loaded with a script tag also from the local filesystem (unlike json via Ajax).
+        chunks, bundles = [], doc.bundles
+        for start in range(0, len(bundles), self.bundles_per_chunk):
+            part = bundles[start:start + self.bundles_per_chunk]
+            name = 'doc%03d_chunk%04d.js' % (self.documents, len(chunks) + 1)
+            with open(os.path.join(chunks_dir, name), 'w', encoding=self.encoding) as chunk:
+                chunk.write('udapiChunk(%d,[' % len(chunks))
+                chunk.write(','.join([self.bundle_json(bundle) for bundle in part]))
+                chunk.write(']);\n')
+            chunks.append([name, part[0].address(), part[-1].address(), len(part)])
+
+        self.print_head()
+        print('<div><button onclick="showChunk(chunk-1)">&lt;</button>'
+              ' <select id="chunk" onchange="showChunk(+this.value)"></select>'
+              ' <button onclick="showChunk(chunk+1)">&gt;</button></div>')
+        print('<div id="treex-view"></div><script>')
+        print('chunksDir=%s;' % json.dumps(chunks_src.replace(os.sep, '/')))
+        print('chunks=%s;' % json.dumps(chunks))
+        print(CHUNKS_JS)
+        print(SAVE_TREE_JS)
+        print('</script></body></html>')
+
+    def get_state(self):
+        return {'writer': super().get_state(), 'documents': self.documents}
+
+    def set_state(self, state):
+        super().set_state(state['writer'])
+        self.documents = state['documents']
+
+    def bundle_json(self, bundle):
+        """Return the JSON representation of a given bundle (as expected by js-treex-view)."""
+        parts, desc = ['{"zones":{'], []
+        for tree_number, tree in enumerate(bundle.trees):
+            # TODO: if not self._should_process_tree(tree): continue
+            zone = tree.zone
+            if tree_number:
+                parts.append(',')
+            parts.append('"%s":{"sentence":"%s",' % (zone, _esc(tree.text)))
+            parts.append('"trees":{"a":{"language":"%s","nodes":[\n' % zone)
+            parts.append('{"id":%s,"parent":null,' % _id(tree))
+            parts.append('"firstson":' + _id(tree.children[0] if tree.children else None) + ',')
+            parts.append('"labels":["zone=%s","id=%s"]}\n' % (zone, tree.address()))
+            desc.append(',["[%s]","label"],[" ","space"]' % zone)
+
+            # Precompute the ids and right siblings (instead of searching parent's children).
+            tree_address = tree.address()
+            id_prefix = '"n%s-' % tree_address.replace('#', '-').replace('/', '-')
+            rbrothers = {}
+            for node in tree.descendants(add_self=1):
+                children = node.children
+                for child, rbrother in zip(children, children[1:]):
+                    rbrothers[child] = rbrother
+            for node in tree.descendants:
+                node_json, node_desc = self.node_json(node, id_prefix, tree_address,
+                                                      rbrothers.get(node))
+                parts.append(node_json)
+                desc.append(node_desc)
+            desc.append(r',["\n","newline"]')
+            parts.append(']}}}\n')
+        # desc without the extra starting comma
+        parts.append('},"desc":[%s]}\n' % ''.join(desc)[1:])
+        return ''.join(parts)
+
     @staticmethod
-    def print_node(node):
-        """JSON representation of a given node."""
+    def node_json(node, id_prefix, tree_address, rbrother):
+        """Return JSON representation of a given node and its part of the sentence description.
+
+        `id_prefix` is the node id (see `_id`) without the ord and the closing quote.
+        """
         # pylint does not understand `.format(**locals())` and falsely alarms for unused vars
         # pylint: disable=too-many-locals,unused-variable
-        names = ['ord', 'misc', 'form', 'lemma', 'upos', 'xpos', 'feats', 'deprel']
-        values = node.get_attrs(names, undefs='')
+        values = _NODE_VALUES(node)
         order, misc, form, lemma, upos, xpos, feats, deprel = [_esc(x) for x in values]
-        address = node.address()
-        id_node, id_parent = _id(node), _id(node.parent)
+        address = '%s#%s' % (tree_address, node.ord)
+        id_node = '%s%s"' % (id_prefix, node.ord)
+        id_parent = _id(node.parent) if node.parent.is_root() else '%s%s"' % (id_prefix,
+                                                                                node.parent.ord)
         firstson = node.children[0] if node.children else None
-        rbrother = next((n for n in node.parent.children if node.precedes(n)), None)
-        firstson_str = '"firstson":%s,' % _id(firstson) if firstson else ''
-        rbrother_str = '"rbrother":%s,' % _id(rbrother) if rbrother else ''
+        firstson_str = '"firstson":%s%s",' % (id_prefix, firstson.ord) if firstson else ''
+        rbrother_str = '"rbrother":%s%s",' % (id_prefix, rbrother.ord) if rbrother else ''
         multiline_feats = feats.replace('|', r'\n')
-        print(',{{"id":{id_node},"parent":{id_parent},"order":{order},{firstson_str}{rbrother_str}'
-              '"data":{{"ord":{order},"form":"{form}","lemma":"{lemma}","upos":"{upos}",'
-              '"xpos":"{xpos}","feats":"{feats}","deprel":"{deprel}",'  # TODO: deps
-              '"misc":"{misc}","id":"{address}"}},'
-              '"labels":["{form}","#{{#bb0000}}{upos}","#{{#0000bb}}{deprel}"],'
-              '"hint":"lemma={lemma}\\n{multiline_feats}"}}'.format(**locals()))
+        node_json = (
+            ',{{"id":{id_node},"parent":{id_parent},"order":{order},{firstson_str}{rbrother_str}'
+            '"data":{{"ord":{order},"form":"{form}","lemma":"{lemma}","upos":"{upos}",'
+            '"xpos":"{xpos}","feats":"{feats}","deprel":"{deprel}",'  # TODO: deps
+            '"misc":"{misc}","id":"{address}"}},'
+            '"labels":["{form}","#{{#bb0000}}{upos}","#{{#0000bb}}{deprel}"],'
+            '"hint":"lemma={lemma}\\n{multiline_feats}"}}\n'.format(**locals()))
         desc = ',["{form}",{id_node}]'.format(**locals())
         desc += ',[" ","space"]' if 'SpaceAfter=No' not in misc else ''
         # pylint: enable=too-many-locals,unused-variable
+        return node_json, desc
+
+    @staticmethod
+    def print_node(node):
+        """Print JSON representation of a given node and return its sentence description."""
+        tree_address = node.root.address()
+        id_prefix = '"n%s-' % tree_address.replace('#', '-').replace('/', '-')
+        rbrother = next((n for n in node.parent.children if node.precedes(n)), None)
+        node_json, desc = Html.node_json(node, id_prefix, tree_address, rbrother)
+        print(node_json, end='')
         return desc
 
 
+SAVE_TREE_JS = '''function saveTree() {
+         var svg_el = jQuery('svg');
+         if (svg_el.length) {
+            var svg = new Blob([svg_el.parent().html()], {type: "image/svg+xml"});
+            saveAs(svg, 'tree.svg');
+         }
+        }'''
+
+CHUNKS_JS = '''var chunk = -1;
+function udapiChunk(number, data) {
+  if (number != chunk) return;
+  $('#treex-view').replaceWith('<div id="treex-view"></div>');
+  $('#treex-view').treexView(data);
+}
+function showChunk(number) {
+  if (number < 0 || number >= chunks.length) return;
+  chunk = number;
+  $('#chunk').val(number);
+  var script = document.createElement('script');
+  script.src = chunksDir + '/' + chunks[number][0];
+  script.onload = function() { script.remove(); };
+  document.head.appendChild(script);
+}
+$.each(chunks, function(i, c) {
+  $('#chunk').append($('<option>', {value: i, text: c[1] + ' - ' + c[2] + ' (' + c[3] + ')'}));
+});
+showChunk(0);'''
+
+
 # id needs to be a valid DOM querySelector
 # so it cannot contain # nor / and it cannot start with a digit
 def _id(node):
@@ -0,0 +1,249 @@
+"""Sqlite class is a writer of trees into an SQLite database (a corpus store).
+
+Usage:
+udapy read.Conllu files=corpus.conllu write.Sqlite files=corpus.db
+udapy read.Sqlite files=corpus.db where="lemma='být'" ud.FixPunct write.Sqlite files=corpus.db
+
+The database contains tables `documents`, `bundles`, `trees` and `tokens`
+(see `SCHEMA`) with indexes on `sent_id`, `lemma`, `upos` and `deprel`.
+Each tree is stored as its CoNLL-U serialization (without `# newdoc`, which is stored as
+a row in `documents`) together with a checksum. Trees are identified by the document name
+and their `sent_id` (i.e. bundle id and zone). When writing, trees with an unchanged checksum
+are skipped, so after loading just a few selected trees with `read.Sqlite`,
+only those trees which were modified are rewritten. Trees not loaded are kept untouched,
+but loaded trees which were deleted (e.g. by `util.Filter`) are deleted from the database.
+When writing whole documents (e.g. from read.Conllu), all the stored trees of each written
+document which were not written (in the whole run) are deleted at the end.
+Bundles without any trees are deleted as well.
+The database uses the write-ahead log, so concurrent readers see consistent snapshots.
+"""
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import sqlite3
+
+from udapi.core.basewriter import BaseWriter
+from udapi.block.write.conllu import Conllu as ConlluWriter
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    newdoc INTEGER NOT NULL DEFAULT 0,
+    json TEXT
+);
+CREATE TABLE IF NOT EXISTS bundles (
+    id INTEGER PRIMARY KEY,
+    document_id INTEGER NOT NULL REFERENCES documents(id),
+    ord INTEGER NOT NULL,
+    bundle_id TEXT NOT NULL,
+    UNIQUE (document_id, bundle_id)
+);
+CREATE TABLE IF NOT EXISTS trees (
+    id INTEGER PRIMARY KEY,
+    bundle_id INTEGER NOT NULL REFERENCES bundles(id),
+    zone TEXT NOT NULL,
+    ord INTEGER NOT NULL,
+    sent_id TEXT NOT NULL,
+    text TEXT,
+    conllu TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    UNIQUE (bundle_id, zone)
+);
+CREATE TABLE IF NOT EXISTS tokens (
+    tree_id INTEGER NOT NULL REFERENCES trees(id),
+    ord INTEGER NOT NULL,
+    form TEXT, lemma TEXT, upos TEXT, xpos TEXT, feats TEXT,
+    head INTEGER, deprel TEXT, deps TEXT, misc TEXT,
+    PRIMARY KEY (tree_id, ord)
+);
+CREATE INDEX IF NOT EXISTS trees_sent_id ON trees(sent_id);
+CREATE INDEX IF NOT EXISTS tokens_lemma ON tokens(lemma);
+CREATE INDEX IF NOT EXISTS tokens_upos ON tokens(upos);
+CREATE INDEX IF NOT EXISTS tokens_deprel ON tokens(deprel);
+"""
+
+
+def connect(filename):
+    """Open (and create if needed) the database, return an `sqlite3.Connection`."""
+    connection = sqlite3.connect(filename, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class Sqlite(BaseWriter):
+    """A writer of trees into an SQLite database, rewriting only the changed trees."""
+
+    def __init__(self, document='default', **kwargs):
+        """Create the Sqlite writer block.
+
+        Args:
+        files: the database file (default='-' is not allowed)
+        document: name of the database document used for trees before the first `# newdoc`
+            if the Udapi document has no `docname` (default="default").
+            Each tree with `newdoc` starts a new database document (named by the newdoc id).
+        """
+        super().__init__(**kwargs)
+        if self.orig_files in ('-', '<filehandle>') or self.files.number_of_files != 1:
+            raise ValueError('write.Sqlite needs files=<one database file>')
+        self.document = document
+        self.connection = None
+        self._conllu_writer = ConlluWriter()
+        self.stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+        # Ids of the written trees for each written (whole) document and ids of the trees
+        # loaded by read.Sqlite (partial documents) and of those of them which were written.
+        self._written = {}
+        self._loaded, self._loaded_written = set(), set()
+
+    def process_start(self):
+        self.connection = connect(self.files.filenames[0])
+        super().process_start()
+
+    def before_process_document(self, document):
+        # Nothing is printed, so (unlike in other writers) sys.stdout is not redirected.
+        pass
+
+    def after_process_document(self, document):
+        pass
+
+    def tree_to_conllu(self, tree):
+        """Return the CoNLL-U serialization of the tree without the `# newdoc` line."""
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self._conllu_writer.process_tree(tree)
+        lines = output.getvalue().split('\n')
+        if lines[0].startswith('# newdoc'):
+            del lines[0]
+        return '\n'.join(lines)
+
+    def _document_id(self, name, newdoc=0):
+        cursor = self.connection.execute(
+            'INSERT OR IGNORE INTO documents(name, newdoc) VALUES (?, ?)', (name, newdoc))
+        if cursor.rowcount:
+            return cursor.lastrowid
+        return self.connection.execute('SELECT id FROM documents WHERE name=?',
+                                       (name,)).fetchone()[0]
+
+    def _bundle_id(self, document_id, bundle_id):
+        row = self.connection.execute('SELECT id FROM bundles WHERE document_id=? AND bundle_id=?',
+                                      (document_id, bundle_id)).fetchone()
+        if row is not None:
+            return row[0]
+        max_ord = self.connection.execute('SELECT MAX(ord) FROM bundles WHERE document_id=?',
+                                          (document_id,)).fetchone()[0]
+        return self.connection.execute(
+            'INSERT INTO bundles(document_id, ord, bundle_id) VALUES (?, ?, ?)',
+            (document_id, (max_ord or 0) + 1, bundle_id)).lastrowid
+
+    def _write_tree(self, bundle_row, tree, position):
+        """Store the tree (the `position`-th tree in its bundle) and return its id.
+
+        If `position` is None (the bundle was loaded only partially), the stored position
+        is kept and new trees are appended after the last tree of the bundle.
+        """
+        conllu = self.tree_to_conllu(tree)
+        checksum = hashlib.sha1(conllu.encode('utf-8')).hexdigest()
+        zone = tree.zone or ''
+        row = self.connection.execute(
+            'SELECT id, checksum, ord FROM trees WHERE bundle_id=? AND zone=?',
+            (bundle_row, zone)).fetchone()
+        if position is None:
+            if row is not None:
+                position = row[2]
+            else:
+                position = (self.connection.execute('SELECT MAX(ord) FROM trees WHERE bundle_id=?',
+                                                    (bundle_row,)).fetchone()[0] or 0) + 1
+        values = (position, tree.address(), tree.text, conllu, checksum)
+        if row is None:
+            tree_id = self.connection.execute(
+                'INSERT INTO trees(bundle_id, zone, ord, sent_id, text, conllu, checksum)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)', (bundle_row, zone) + values).lastrowid
+            self.stats['inserted'] += 1
+        elif row[1] == checksum:
+            if row[2] != position:
+                self.connection.execute('UPDATE trees SET ord=? WHERE id=?', (position, row[0]))
+            self.stats['unchanged'] += 1
+            return row[0]
+        else:
+            tree_id = row[0]
+            self.connection.execute('UPDATE trees SET ord=?, sent_id=?, text=?, conllu=?,'
+                                    ' checksum=? WHERE id=?', values + (tree_id,))
+            self.connection.execute('DELETE FROM tokens WHERE tree_id=?', (tree_id,))
+            self.stats['updated'] += 1
+        self.connection.executemany(
+            'INSERT INTO tokens VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(tree_id, node.ord, node.form, node.lemma, node.upos, node.xpos, str(node.feats),
+              node.parent.ord, node.deprel, node.raw_deps, str(node.misc))
+             for node in tree.descendants])
+        return tree_id
+
+    def process_document(self, document):
+        name = document.meta.get('docname') or self.document
+        loaded = document.meta.get('sqlite_loaded')
+        if loaded is not None:
+            # Trees loaded from another database are not deleted from this one.
+            loaded_filename, loaded_ids = loaded
+            filename = self.files.filenames[0]
+            if os.path.exists(filename) and os.path.exists(loaded_filename) \
+                    and os.path.samefile(loaded_filename, filename):
+                self._loaded.update(loaded_ids)
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            first_document_id = document_id = None
+            for bundle in document.bundles:
+                bundle_row = None
+                for position, tree in enumerate(bundle, 1):
+                    # Column `newdoc`: 0=no newdoc, 1=newdoc with id, 2=newdoc without id.
+                    if tree.newdoc:
+                        if tree.newdoc is True:
+                            name, newdoc = bundle.bundle_id, 2
+                        else:
+                            name, newdoc = tree.newdoc, 1
+                        document_id = self._document_id(name, newdoc)
+                        bundle_row = None
+                    elif document_id is None:
+                        document_id = self._document_id(name)
+                    if first_document_id is None:
+                        first_document_id = document_id
+                    if bundle_row is None:
+                        bundle_row = self._bundle_id(document_id, bundle.bundle_id)
+                    tree_id = self._write_tree(bundle_row, tree,
+                                               position if loaded is None else None)
+                    if loaded is not None:
+                        self._loaded_written.add(tree_id)
+                    else:
+                        self._written.setdefault(document_id, set()).add(tree_id)
+            if document.json and first_document_id is not None:
+                self.connection.execute(
+                    'UPDATE documents SET json=? WHERE id=?',
+                    (json.dumps(document.json, ensure_ascii=False), first_document_id))
+
+    def _delete_removed(self):
+        """Delete the trees removed from the written documents and the empty bundles."""
+        removed = []
+        with self.connection:
+            self.connection.execute('BEGIN IMMEDIATE')
+            for document_id, written in self._written.items():
+                removed.extend(row[0] for row in self.connection.execute(
+                    'SELECT t.id FROM trees t JOIN bundles b ON b.id=t.bundle_id'
+                    ' WHERE b.document_id=?', (document_id,)) if row[0] not in written)
+            removed.extend(self._loaded - self._loaded_written)
+            self.connection.executemany('DELETE FROM tokens WHERE tree_id=?',
+                                        [(tree_id,) for tree_id in removed])
+            self.connection.executemany('DELETE FROM trees WHERE id=?',
+                                        [(tree_id,) for tree_id in removed])
+            self.connection.execute('DELETE FROM bundles WHERE id NOT IN'
+                                    ' (SELECT bundle_id FROM trees)')
+        self.stats['deleted'] += len(removed)
+
+    def process_end(self):
+        self._delete_removed()
+        logging.info('write.Sqlite: %d trees inserted, %d updated, %d unchanged, %d deleted',
+                     self.stats['inserted'], self.stats['updated'], self.stats['unchanged'],
+                     self.stats['deleted'])
+        self.connection.close()
+        super().process_end()
@@ -1,4 +1,5 @@
 """An ASCII pretty printer of dependency trees."""
+import heapq
 import re
 import sys
 
@@ -14,6 +15,9 @@ COLOR_OF = {
     'ord': 'green',
 }
 
+# The ANSI escape sequences (before and after the value) for (attr, marked), see colorize_attr.
+_COLOR_ESCAPES = {}
+
 # Too many instance variables, arguments, branches...
 # I don't see how to fix this while not making the code less readable or more difficult to use.
 # pylint: disable=R0902,R0912,R0913,R0914
@@ -197,6 +201,7 @@ class TextModeTrees(BaseWriter):
         self._vert = [space + '│', line + '╪']
 
         self.attrs = attributes.split(',')
+        self._get_values = None
         self.mark_re, self.comment_mark_re = None, None
         if mark is not None and mark != '':
             self.mark_re = re.compile(mark + '=')
@@ -213,89 +218,113 @@ class TextModeTrees(BaseWriter):
     # which is its index within the printed subtree.
     # gaps[node.ord] = number of nodes within node's span, which are not its descendants.
     def _compute_gaps(self, node):
-        lmost, rmost, descs = self._index_of[node.ord], self._index_of[node.ord], 0
-        for child in node.children:
-            _lm, _rm, _de = self._compute_gaps(child)
-            lmost = min(_lm, lmost)
-            rmost = max(_rm, rmost)
-            descs += _de
-        self._gaps[node.ord] = rmost - lmost - descs
-        return lmost, rmost, descs + 1
+        """Compute gaps of the node and all its descendants (bottom-up, without recursion)."""
+        nodes, stack = [], [node]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(node._children)  # pylint: disable=protected-access
+        spans = {}
+        for node in reversed(nodes):
+            lmost = rmost = self._index_of[node.ord]
+            descs = 0
+            for child in node._children:  # pylint: disable=protected-access
+                _lm, _rm, _de = spans.pop(child)
+                lmost = min(_lm, lmost)
+                rmost = max(_rm, rmost)
+                descs += _de
+            self._gaps[node.ord] = rmost - lmost - descs
+            spans[node] = (lmost, rmost, descs + 1)
 
     def should_print_tree(self, root):
         """Should this tree be printed?"""
         if not self.marked_only:
             return True
-        if any(self.is_marked(n) for n in root.descendants(add_self=1)):
-            return True
+        if self.mark_re is not None:
+            nodes = root.descendants(add_self=1) if not root.is_root() \
+                else [root] + root._descendants  # pylint: disable=protected-access
+            # MISC of each node is searched separately, so that anchored regexes work.
+            search = self.mark_re.search
+            if any(search(str(node.misc)) for node in nodes):
+                return True
         if not self.print_comments or root.comment is None or self.mark_re is None:
             return False
         return self.comment_mark_re.search(root.comment)
 
     def process_tree(self, root):
         """Print the tree to (possibly redirected) sys.stdout."""
-        allnodes = root.descendants(add_self=1)
+        # pylint: disable=protected-access
         if not self.should_print_tree(root):
             return
-        self._index_of = {allnodes[i].ord: i for i in range(len(allnodes))}
-        self.lines = [''] * len(allnodes)
-        self.lengths = [0] * len(allnodes)
+        self._use_attrs(root, self.attrs)
+        allnodes = root.descendants(add_self=1)
+        index_of = self._index_of = {node.ord: i for i, node in enumerate(allnodes)}
+        lines = self.lines = [[] for _ in allnodes]
+        lengths = self.lengths = [0] * len(allnodes)
+        edge_ends = '─╭╰╪┡┢'
+        classic = self.layout == 'classic'
 
         # Precompute the number of non-projective gaps for each subtree
         if self.minimize_cross:
             self._gaps = [0, ] * (1 + len(root.root.descendants))
             self._compute_gaps(root)
 
-        # Precompute lines for printing
-        stack = [root, ]
+        # Precompute lines for printing.
+        # With minimize_cross, the subtree with the fewest gaps is processed first
+        # (the most recently added one if there are more such subtrees).
+        stack, pushed = [(0, 0, root)], 0
         while stack:
-            node = stack.pop()
-            children = node.children(add_self=1)
-            min_idx, max_idx = self._index_of[children[0].ord], self._index_of[children[-1].ord]
-            max_length = max([self.lengths[i] for i in range(min_idx, max_idx + 1)])
+            if self.minimize_cross:
+                node = heapq.heappop(stack)[2]
+            else:
+                node = stack.pop()[2]
+            min_idx = max_idx = index_of[node.ord]
+            if node._children:
+                min_idx = min(min_idx, index_of[node._children[0].ord])
+                max_idx = max(max_idx, index_of[node._children[-1].ord])
+            max_length = max(lengths[min_idx:max_idx + 1])
             for idx in range(min_idx, max_idx + 1):
                 idx_node = allnodes[idx]
-                filler = '─' if self._ends(idx, '─╭╰╪┡┢') else ' '
-                self._add(idx, filler * (max_length - self.lengths[idx]))
+                parts = lines[idx]
+                ends_with_edge = bool(parts) and parts[-1][-1] in edge_ends
+                if max_length > lengths[idx]:
+                    self._add(idx, ('─' if ends_with_edge else ' ') * (max_length - lengths[idx]))
 
                 topmost = idx == min_idx
                 botmost = idx == max_idx
                 if idx_node is node:
                     self._add(idx, self._draw[botmost][topmost])
-                    if self.layout == 'classic':
+                    if classic:
                         self.add_node(idx, node)
+                elif idx_node._parent is not node:
+                    self._add(idx, self._vert[ends_with_edge])
                 else:
-                    if idx_node.parent is not node:
-                        self._add(idx, self._vert[self._ends(idx, '─╭╰╪┡┢')])
+                    precedes_parent = idx < index_of[node.ord]
+                    self._add(idx, self._space[precedes_parent][topmost or botmost])
+                    if not idx_node._children:
+                        self._add(idx, self._horiz)
+                        if classic:
+                            self.add_node(idx, idx_node)
+                    elif self.minimize_cross:
+                        pushed += 1
+                        heapq.heappush(stack, (self._gaps[idx_node.ord], -pushed, idx_node))
                     else:
-                        precedes_parent = idx < self._index_of[node.ord]
-                        self._add(idx, self._space[precedes_parent][topmost or botmost])
-                        if idx_node.is_leaf():
-                            self._add(idx, self._horiz)
-                            if self.layout == 'classic':
-                                self.add_node(idx, idx_node)
-                        else:
-                            stack.append(idx_node)
-
-            # sorting the stack to minimize crossings of edges
-            if self.minimize_cross:
-                stack = sorted(stack, key=lambda x: -self._gaps[x.ord])
+                        stack.append((0, 0, idx_node))
 
-        if self.layout != 'classic':
+        if not classic:
             columns_attrs = [[a] for a in self.attrs] if self.layout == 'align' else [self.attrs]
             for col_attrs in columns_attrs:
-                self.attrs = col_attrs
-                max_length = max(self.lengths)
+                self._use_attrs(root, col_attrs)
+                max_length = max(lengths)
                 for idx, node in enumerate(allnodes):
-                    if self.layout.startswith('align'):
-                        self._add(idx, ' ' * (max_length - self.lengths[idx]))
+                    if self.layout.startswith('align') and max_length > lengths[idx]:
+                        self._add(idx, ' ' * (max_length - lengths[idx]))
                     self.add_node(idx, node)
-            self.attrs = [a for sublist in columns_attrs for a in sublist]
+            self._use_attrs(root, [a for sublist in columns_attrs for a in sublist])
 
         # Print headers (if required) and the tree itself
         self.print_headers(root)
-        for line in self.lines:
-            print(line)
+        print('\n'.join(''.join(parts) for parts in lines))
 
         if self.add_empty_line:
             print('')
@@ -310,7 +339,7 @@ class TextModeTrees(BaseWriter):
             print('#' + self.colorize_comment(root.comment.rstrip().replace('\n', '\n#')))
 
     def _ends(self, idx, chars):
-        return bool(self.lines[idx] and self.lines[idx][-1] in chars)
+        return bool(self.lines[idx]) and self.lines[idx][-1][-1] in chars
 
     def before_process_document(self, document):
         """Initialize ANSI colors if color is True or 'auto'.
@@ -328,19 +357,26 @@ class TextModeTrees(BaseWriter):
                 print('%s = %s' % (key, value))
 
     def _add(self, idx, text):
-        self.lines[idx] += text
+        """Append a (non-empty) text to the line (a list of parts) of the idx-th node."""
+        self.lines[idx].append(text)
         self.lengths[idx] += len(text)
 
+    def _use_attrs(self, node, attrs):
+        """Set the attributes to be printed and compile a function returning their values."""
+        # udapi.core.node imports this module, so Node.compile_attrs is accessed via a node.
+        self.attrs = attrs
+        self._get_values = node.compile_attrs(attrs, self.print_undef_as)
+
     def add_node(self, idx, node):
         """Render a node with its attributes."""
         if not node.is_root():
-            values = node.get_attrs(self.attrs, undefs=self.print_undef_as)
-            self.lengths[idx] += 1 + len(' '.join(values))
+            values = self._get_values(node)
+            self.lengths[idx] += len(values) + sum(len(value) for value in values)
             if self.color:
-                marked = self.is_marked(node)
-                for i, attr in enumerate(self.attrs):
-                    values[i] = self.colorize_attr(attr, values[i], marked)
-            self.lines[idx] += ' ' + ' '.join(values)
+                marked = bool(self.is_marked(node))
+                values = [self.colorize_attr(attr, value, marked)
+                          for attr, value in zip(self.attrs, values)]
+            self.lines[idx].append(' ' + ' '.join(values))
 
     def is_marked(self, node):
         """Should a given node be highlighted?"""
@@ -355,5 +391,9 @@ class TextModeTrees(BaseWriter):
     @staticmethod
     def colorize_attr(attr, value, marked):
         """Return a string with color markup for a given attr and its value."""
-        color = COLOR_OF.get(attr, None)
-        return colored(value, color, None, ['reverse', 'bold'] if marked else None)
+        escapes = _COLOR_ESCAPES.get((attr, marked))
+        if escapes is None:
+            color = COLOR_OF.get(attr, None)
+            escapes = colored('\0', color, None, ['reverse', 'bold'] if marked else None)
+            escapes = _COLOR_ESCAPES[(attr, marked)] = escapes.split('\0')
+        return escapes[0] + value + escapes[1]
@@ -59,9 +59,11 @@ class TextModeTreesHtml(TextModeTrees):
     def add_node(self, idx, node):
         if not node.is_root():
             marked = self.is_marked(node)
-            self.lines[idx] += '<mark>' if marked else ''
+            if marked:
+                self.lines[idx].append('<mark>')
             super().add_node(idx, node)
-            self.lines[idx] += '</mark>' if marked else ''
+            if marked:
+                self.lines[idx].append('</mark>')
 
     def colorize_comment(self, comment):
         """Return a string with color markup for a given comment."""
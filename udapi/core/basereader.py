@@ -1,19 +1,50 @@
 """BaseReader is the base class for all reader blocks."""
 import re
 import logging
+import zlib
 
 from udapi.core.block import Block
 from udapi.core.files import Files
 
 # pylint: disable=too-many-instance-attributes
 
+# Estimated memory footprint (in bytes) of a loaded tree (without nodes) and of a node,
+# measured on UD treebanks (incl. the strings of a typical node, ca. 60 characters).
+TREE_BYTES = 1300
+NODE_BYTES = 900
+
+
+def parse_shard(shard):
+    """Parse a shard specification "i/N" (1 <= i <= N) and return a tuple (i, N)."""
+    try:
+        number, total = (int(x) for x in str(shard).split('/'))
+    except ValueError:
+        raise ValueError('Cannot parse shard %r, expected e.g. 3/16' % shard)
+    if not 1 <= number <= total:
+        raise ValueError('Shard %r out of range, expected 1 <= i <= N' % shard)
+    return number, total
+
+
+def shard_of(bundle_id, total):
+    """Return the (1-based) shard of the bundle, using a stable hash of its ID."""
+    return zlib.crc32(bundle_id.encode('utf-8')) % total + 1
+
 
 class BaseReader(Block):
-    """Base class for all reader blocks."""
+    """Base class for all reader blocks.
+
+    The input is split into documents by `# newdoc` (if `split_docs` is set) and by the limits
+    `bundles_per_doc`, `tokens_per_doc` (words and empty nodes) and `max_doc_mb`
+    (the estimated memory footprint of the loaded trees). A document is closed
+    at the end of the bundle which reaches the limit, so the zones of a bundle are never split.
+    A reader adding trees (e.g. of another zone) to a document with bundles
+    fills just the existing bundles if `tokens_per_doc` or `max_doc_mb` is set.
+    """
 
     # pylint: disable=too-many-arguments
     def __init__(self, files='-', filehandle=None, zone='keep', bundles_per_doc=0, encoding='utf-8-sig',
-                 sent_id_filter=None, split_docs=False, ignore_sent_id=False, **kwargs):
+                 sent_id_filter=None, split_docs=False, ignore_sent_id=False, shard=None,
+                 tokens_per_doc=0, max_doc_mb=0, **kwargs):
         super().__init__(**kwargs)
         if filehandle is not None:
             files = None
@@ -28,6 +59,11 @@ class BaseReader(Block):
             logging.debug('Using sent_id_filter=%s', sent_id_filter)
         self.split_docs = split_docs
         self.ignore_sent_id = ignore_sent_id
+        self._trees_in_file = 0
+        self._trees_read = 0
+        self.shard = None if shard is None else parse_shard(shard)
+        self.tokens_per_doc = tokens_per_doc
+        self.max_doc_mb = max_doc_mb
 
     @staticmethod
     def is_multizone_reader():
@@ -58,6 +94,7 @@ class BaseReader(Block):
 
     def next_filehandle(self):
         """Go to the next file and retrun its filehandle."""
+        self._trees_in_file = 0
         return self.files.next_filehandle()
 
     def read_tree(self):
@@ -69,23 +106,86 @@ class BaseReader(Block):
         """
         raise NotImplementedError("Class %s doesn't implement read_tree" % self.__class__.__name__)
 
+    def skip_tree(self):
+        """Skip one tree in the current file, return False if there was no tree.
+
+        This is used when resuming from a checkpoint. This implementation uses `read_tree()`,
+        subclasses may override it with a faster version which does not build the tree.
+        """
+        return self.read_tree() is not None
+
     def filtered_read_tree(self):
         """Load and return one more tree matching the `sent_id_filter`.
 
         This method uses `read_tree()` internally.
         This is the method called by `process_document`.
         """
-        tree = self.read_tree()
-        if self.sent_id_filter is None:
-            return tree
         while True:
+            tree = self.read_tree()
             if tree is None:
                 return None
-            if self.sent_id_filter.match(tree.sent_id) is not None:
-                return tree
-            logging.debug('Skipping sentence %s as it does not match the sent_id_filter %s.',
-                          tree.sent_id, self.sent_id_filter)
-            tree = self.read_tree()
+            self._trees_in_file += 1
+            self._trees_read += 1
+            if self.sent_id_filter is not None \
+                    and self.sent_id_filter.match(tree.sent_id) is None:
+                logging.debug('Skipping sentence %s as it does not match the sent_id_filter %s.',
+                              tree.sent_id, self.sent_id_filter)
+                continue
+            if self.shard is not None and not self._in_shard(tree):
+                continue
+            return tree
+
+    def budget_reached(self, trees, tokens):
+        """Do the trees with the given number of tokens reach `tokens_per_doc` or `max_doc_mb`?"""
+        if self.tokens_per_doc and tokens >= self.tokens_per_doc:
+            return True
+        return bool(self.max_doc_mb) \
+            and trees * TREE_BYTES + tokens * NODE_BYTES >= self.max_doc_mb * 1024 * 1024
+
+    def _in_shard(self, tree):
+        """Is the tree in `self.shard`? If so, store its sequence number in its comment.
+
+        Trees are assigned to shards by a hash of their bundle ID (so all zones of a bundle
+        are in the same shard), trees without sent_id by their sequence number.
+        The sequence number (the number of trees read so far) is used by `read.MergeShards`
+        to merge the outputs of all shards back into the original order.
+        Trees without sent_id get the sequence number as their sent_id,
+        so their IDs are unique in the merged output (as in an unsharded run).
+        """
+        number, total = self.shard
+        if tree._sent_id is not None and not self.ignore_sent_id:
+            in_shard = shard_of(tree._sent_id.split('/', 1)[0], total) == number
+        else:
+            in_shard = self._trees_read % total + 1 == number
+            if in_shard and not self.ignore_sent_id:
+                tree._sent_id = str(self._trees_read)
+        if in_shard:
+            tree.comment += ' shard_seq = %d\n' % self._trees_read
+        return in_shard
+
+    def get_state(self):
+        """Return the current position in the input: file number and number of trees read.
+
+        A tree read ahead (buffered for the next document) is not counted,
+        so it will be read again after resuming.
+        """
+        buffered = 1 if self._buffer else 0
+        return {'file_number': self.files.file_number, 'trees': self._trees_in_file - buffered,
+                'trees_read': self._trees_read - buffered, 'finished': self.finished}
+
+    def set_state(self, state):
+        """Open the file and skip the trees already processed according to the state."""
+        self.finished = state['finished']
+        self._trees_read = state['trees_read']
+        if not state['file_number']:
+            return
+        self.files.file_number = state['file_number'] - 1
+        if self.next_filehandle() is None:
+            raise ValueError('Cannot resume reading from file number %d' % state['file_number'])
+        for _ in range(state['trees']):
+            if not self.skip_tree():
+                raise ValueError('Cannot skip %d trees in %s' % (state['trees'], self.filename))
+            self._trees_in_file += 1
 
     # pylint: disable=too-many-branches,too-many-statements
     # Maybe the code could be refactored, but it is speed-critical,
@@ -94,6 +194,9 @@ class BaseReader(Block):
         orig_bundles = document.bundles[:]
         last_bundle_id = ''
         bundle = None
+        budget = self.tokens_per_doc or self.max_doc_mb
+        fill_only = bool(budget and orig_bundles)
+        doc_trees, tokens = 0, 0
 
         # There may be a tree left in the buffer when reading the last doc.
         if self._buffer:
@@ -107,6 +210,7 @@ class BaseReader(Block):
                 if root._sent_id is not None:
                     bundle.bundle_id = root._sent_id.split('/', 1)[0]
             bundle.add_tree(root)
+            doc_trees, tokens = 1, len(root._descendants) + len(root.empty_nodes)
             if root.newdoc and root.newdoc is not True:
                 document.meta["docname"] = root.newdoc
 
@@ -163,6 +267,11 @@ class BaseReader(Block):
                                         self.bundles_per_doc, len(orig_bundles))
                     return
 
+                if budget and bundle and (not orig_bundles if fill_only
+                                          else self.budget_reached(doc_trees, tokens)):
+                    self._buffer = root
+                    return
+
                 if orig_bundles:
                     # TODO list.pop(0) is inefficient, use collections.deque.popleft()
                     bundle = orig_bundles.pop(0)
@@ -175,6 +284,9 @@ class BaseReader(Block):
                         bundle.bundle_id = last_bundle_id
 
             bundle.add_tree(root)
+            if budget:
+                doc_trees += 1
+                tokens += len(root._descendants) + len(root.empty_nodes)
 
             # If bundles_per_doc is set and we have read the specified number of bundles,
             # we should end the current document and return.
@@ -185,3 +297,6 @@ class BaseReader(Block):
             if self.bundles_per_doc and self.bundles_per_doc == bundle.number \
                and not self.is_multizone_reader():
                 return
+            if budget and not fill_only and not self.is_multizone_reader() \
+                    and self.budget_reached(doc_trees, tokens):
+                return
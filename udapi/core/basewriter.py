@@ -1,4 +1,6 @@
 """BaseWriter is the base class for all writer blocks."""
+import os
+import stat
 import sys
 import logging
 
@@ -7,7 +9,13 @@ from udapi.core.files import Files
 
 
 class BaseWriter(Block):
-    """Base class for all reader blocks."""
+    """Base class for all reader blocks.
+
+    Writers do not change the documents, so they are `read_only`.
+    Subclasses which do change them must set `read_only = False`.
+    """
+
+    read_only = True
 
     def __init__(self, files='-', filehandle=None, docname_as_file=False, encoding='utf-8',
                  newline='\n', **kwargs):
@@ -20,6 +28,7 @@ class BaseWriter(Block):
         self.encoding = encoding
         self.newline = newline
         self.docname_as_file = docname_as_file
+        self._filehandle = None
         if docname_as_file and files != '-':
             raise ValueError("docname_as_file=1 is not compatible with files=" + files)
 
@@ -40,7 +49,7 @@ class BaseWriter(Block):
     def before_process_document(self, document):
         if self.orig_files == '<filehandle>':
             logging.info('Writing to filehandle.')
-            sys.stdout = self.files.filehandle
+            sys.stdout = self._filehandle = self.files.filehandle
             return
         if self.orig_files == '-':
             if self.docname_as_file:
@@ -52,6 +61,7 @@ class BaseWriter(Block):
                     logging.warning('docname_as_file=1 but the document contains no docname')
             else:
                 sys.stdout = sys.__stdout__
+            self._filehandle = sys.stdout
             return
 
         old_filehandle = sys.stdout
@@ -68,7 +78,48 @@ class BaseWriter(Block):
         else:
             logging.info('Writing to file %s.', filename)
             sys.stdout = open(filename, 'wt', encoding=self.encoding, newline=self.newline)
+        self._filehandle = sys.stdout
 
     def after_process_document(self, document):
         if self.orig_files == '<filehandle>':
             sys.stdout = sys.__stdout__
+
+    def get_state(self):
+        """Flush the output and return the current file number and output size in bytes.
+
+        The size is None if the output is not a regular file (e.g. a pipe).
+        """
+        size = None
+        if self._filehandle is not None:
+            self._filehandle.flush()
+            try:
+                file_stat = os.fstat(self._filehandle.fileno())
+            except (AttributeError, OSError, ValueError):
+                file_stat = None
+            if file_stat is not None and stat.S_ISREG(file_stat.st_mode):
+                size = file_stat.st_size
+        return {'file_number': self.files.file_number, 'size': size}
+
+    def set_state(self, state):
+        """Continue writing after the output saved in the checkpoint.
+
+        Each document written to files given by `files` or `docname_as_file` goes to a new file,
+        but documents written to stdout are appended. So when resuming, stdout should be
+        redirected (with `>>`) to the same file, which is truncated to the checkpointed size,
+        i.e. the output of documents processed after the checkpoint is deleted.
+        """
+        self.files.file_number = state['file_number']
+        if self.orig_files != '-' or self.docname_as_file or state['size'] is None:
+            return
+        stdout = sys.__stdout__
+        file_stat = os.fstat(stdout.fileno())
+        if not stat.S_ISREG(file_stat.st_mode):
+            logging.warning('Cannot truncate stdout to the checkpointed size, it is not a file')
+            return
+        if file_stat.st_size < state['size']:
+            raise RuntimeError('The output has only %d bytes, but %d bytes were checkpointed.'
+                               ' Use "udapy --resume ... >> output" to append to the output.'
+                               % (file_stat.st_size, state['size']))
+        stdout.flush()
+        os.ftruncate(stdout.fileno(), state['size'])
+        os.lseek(stdout.fileno(), state['size'], os.SEEK_SET)
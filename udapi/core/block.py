@@ -9,8 +9,28 @@ class Block(object):
     zones: which zone to process (default="all")
     if_empty_tree: what to do when encountering a tree with no nodes.
         Possible values are: process (default), skip, skip_warn, fail, delete.
+
+    Blocks which implement just `process_node` can declare `fusible = True`
+    if the `process_node` method does not change the topology nor word order,
+    it modifies only the processed node and it does not read nor write any attribute
+    of other nodes which another fusible block can change (incl. MISC, deprel or upos
+    of the parent or children), so it does not matter whether the other nodes were already
+    processed by the preceding blocks. Blocks evaluating arbitrary user code
+    (e.g. `util.Mark`) cannot guarantee this, so they are not fusible.
+    `Run` executes consecutive fusible blocks in a single traversal of each tree.
+
+    Blocks which never change the processed documents (e.g. writers) can declare
+    `read_only = True`. A branch of a scenario ``{ ... }`` consisting only of read-only blocks
+    is applied on the original document instead of its copy.
+
+    Blocks which accumulate information across documents (e.g. statistics printed
+    in `process_end`) should implement `get_state` and `set_state`,
+    so that `udapy --resume` can continue an interrupted run with identical results.
     """
 
+    fusible = False
+    read_only = False
+
     def __init__(self, zones='all', if_empty_tree='process'):
         self.zones = zones
         self.if_empty_tree = if_empty_tree
@@ -23,6 +43,27 @@ class Block(object):
         """A hook method that is executed after processing all UD data"""
         pass
 
+    def get_state(self):
+        """Return the state of the block (a JSON-serializable object) for a checkpoint.
+
+        This is called at document boundaries, the default implementation returns None
+        (meaning no state to be saved).
+        """
+        return None
+
+    def set_state(self, state):
+        """Restore the state returned by `get_state` (after `process_start`)."""
+        pass
+
+    def merge_state(self, state):
+        """Add the state of another instance of this block (e.g. a partial result of a shard).
+
+        Blocks with statistics (which can be summed) implement this method,
+        so `udapy --merge_states` can print the statistics of a sharded run.
+        The default implementation raises `NotImplementedError`.
+        """
+        raise NotImplementedError('Block %s cannot merge states' % self.__class__.__name__)
+
     def process_node(self, _):
         """Process a UD node"""
         raise Exception("No processing activity defined in block " + str(self))
@@ -16,13 +16,82 @@ class Bundle(object):
     Trees in one bundle are distinguished by a zone label.
     """
 
-    __slots__ = ["trees", "number", "_bundle_id", "_document"]
+    __slots__ = ["_trees", "_removed_trees", "number", "_bundle_id", "_document"]
 
     def __init__(self, bundle_id=None, document=None):
-        self.trees = []
+        self._trees = []
+        self._removed_trees = set()
         self._bundle_id = bundle_id
         self._document = document
 
+    def __getstate__(self):
+        """Return the state for pickling (without the document, see `Document.__getstate__`)."""
+        return self._bundle_id, getattr(self, 'number', None), self.trees
+
+    def _flat_state(self, shared):
+        """Return the state with the trees as flat arrays (see `Document.__getstate__`)."""
+        # pylint: disable=protected-access
+        return (self._bundle_id, getattr(self, 'number', None),
+                [tree._flat_state(shared) for tree in self.trees])
+
+    @classmethod
+    def _from_flat_state(cls, state):
+        """Create a bundle from the state returned by `_flat_state`."""
+        bundle_id, number, tree_states = state
+        trees = []
+        for tree_state in tree_states:
+            tree = Root.__new__(Root)
+            tree.__setstate__(tree_state)
+            trees.append(tree)
+        bundle = cls.__new__(cls)
+        bundle.__setstate__((bundle_id, number, trees))
+        return bundle
+
+    def __setstate__(self, state):
+        self._bundle_id, number, self._trees = state
+        if number is not None:
+            self.number = number
+        self._removed_trees = set()
+        self._document = None
+        for tree in self._trees:
+            tree._bundle = self  # pylint: disable=protected-access
+
+    def clone(self):
+        """Return a copy of this bundle (with copies of all its trees), not added to any document.
+
+        See `udapi.core.root.Root.clone`.
+        """
+        bundle = Bundle(bundle_id=self._bundle_id)
+        if hasattr(self, 'number'):
+            bundle.number = self.number
+        for tree in self.trees:
+            tree_copy = tree.clone()
+            tree_copy._bundle = bundle  # pylint: disable=protected-access
+            bundle._trees.append(tree_copy)
+        return bundle
+
+    @property
+    def trees(self):
+        """List of the trees (roots) in this bundle.
+
+        Removed trees are deleted from the list lazily (all at once) on the next access,
+        so removing many trees is not quadratic.
+        """
+        if self._removed_trees:
+            removed = self._removed_trees
+            self._trees = [root for root in self._trees if root not in removed]
+            self._removed_trees = set()
+        return self._trees
+
+    @trees.setter
+    def trees(self, trees):
+        self._trees = trees
+        self._removed_trees = set()
+
+    def _remove_tree(self, root):
+        """Mark the tree as removed, it will be deleted from `trees` on the next access."""
+        self._removed_trees.add(root)
+
     @property
     def bundle_id(self):
         """ID of this bundle."""
@@ -96,7 +165,7 @@ class Bundle(object):
 
     def remove(self):
         """Remove a bundle from the document."""
-        self._document.bundles = [bundle for bundle in self._document.bundles if bundle != self]
+        self._document._remove_bundle(self)  # pylint: disable=protected-access
 
     def address(self):
         """Return bundle_id or '?' if missing."""
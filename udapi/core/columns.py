@@ -0,0 +1,131 @@
+"""Columnar computation of (pseudo-)attributes of all nodes in a tree and statistics over them.
+
+`root.get_columns(attrs)` returns the same values as calling `node.get_attrs([attr])`
+for each node and attribute, but each (pseudo-)attribute is computed for the whole tree at once
+(e.g. `depth` is computed top-down, `p_*` and `c_*` reuse the column of the base attribute),
+so it is much faster for statistics over whole treebanks (see `ColumnStats` and `util.See`).
+"""
+from collections import Counter
+from itertools import compress
+
+from udapi.core.node import _compile_base_attr
+
+# Root and Node are "friend" classes of this module, so accessing their underlined attributes is OK.
+# pylint: disable=protected-access
+
+PREFIXES = ('p_', 'c_', 'l_', 'r_')
+TOTAL = 'T O T A L'
+
+
+def _base_column(name, nodes, parents):
+    """Return a list of values of (pseudo-)attribute `name` for each of `nodes`."""
+    # pylint: disable=too-many-return-statements
+    if name == 'dir':
+        return ['root' if parent == 0 else 'left' if node.ord < parent else 'right'
+                for node, parent in zip(nodes, parents)]
+    if name == 'edge':
+        return [0 if parent == 0 else node.ord - parent for node, parent in zip(nodes, parents)]
+    if name == 'children':
+        return [len(node._children) for node in nodes]
+    if name == 'siblings':
+        return [len(node._parent._children) - 1 for node in nodes]
+    if name == 'depth':
+        # depths[ord] of the nodes, the parents are filled before their children
+        depths = [0] + [None] * len(nodes)
+        for start in range(1, len(nodes) + 1):
+            path, ord_ = [], start
+            while depths[ord_] is None:
+                path.append(ord_)
+                ord_ = parents[ord_ - 1]
+            depth = depths[ord_]
+            for ord_ in reversed(path):
+                depth += 1
+                depths[ord_] = depth
+        return depths[1:]
+    return list(map(_compile_base_attr(name)[0], nodes))
+
+
+def get_columns(root, attrs, undefs=None, stringify=True):
+    """Return values of the given (pseudo-)attributes of all nodes of a tree, column by column.
+
+    Args:
+    root: the (technical) root of the tree
+    attrs: A list of attribute names, e.g. ``['form', 'p_upos', 'c_deprel']``,
+        see `udapi.core.node.Node.get_attrs` for the list of pseudo-attributes.
+    undefs: A value to be used instead of None for empty (undefined) values.
+    stringify: Apply `str()` on each value (except for None)
+
+    Returns a list with a pair `(values, owners)` for each attribute.
+    `owners` is a list of the same length as `values` with indices into `root.descendants`
+    of the nodes to which the values belong, or None if there is exactly one value per node.
+    So `[v for v, o in zip(values, owners) if o == i] == nodes[i].get_attrs([attr], ...)`.
+    """
+    nodes = root._descendants
+    if not nodes:
+        return [([], None) for _ in attrs]
+    parents = [node._parent.ord for node in nodes]
+    base_columns, result = {}, []
+    for attr in attrs:
+        prefix, name = (attr[:2], attr[2:]) if attr.startswith(PREFIXES) else ('', attr)
+        if name not in base_columns:
+            base_columns[name] = _base_column(name, nodes, parents)
+        column, owners = base_columns[name], None
+        if prefix == 'p_':
+            column = [root._get_attr(name)] + column
+            column = [column[parent] for parent in parents]
+        elif prefix == 'l_':
+            column = [root._get_attr(name)] + column[:-1]
+        elif prefix == 'r_':
+            column = column[1:]
+            owners = list(range(len(column)))
+        elif prefix == 'c_':
+            owners = [i for i, node in enumerate(nodes) for _ in node._children]
+            column = [column[child.ord - 1] for node in nodes for child in node._children]
+
+        if name == 'feats_split':
+            if owners is None:
+                owners = range(len(column))
+            owners = [owner for owner, values in zip(owners, column) for _ in values]
+            column = [value for values in column for value in values]
+        if undefs is not None:
+            column = [undefs if value is None else value for value in column]
+        if stringify:
+            column = [None if value is None else str(value) for value in column]
+        result.append((column, owners))
+    return result
+
+
+class ColumnStats(object):
+    """Counts of values of (pseudo-)attributes over all nodes and over the matching nodes.
+
+    `every[stat]` and `match[stat]` are Counters of the values of `stat` (as strings,
+    undefined values are counted as empty strings) over all nodes and the matching nodes,
+    respectively. The key 'T O T A L' holds the total number of the counted values.
+    """
+
+    def __init__(self, stats):
+        self.stats = list(stats)
+        self.every = {stat: Counter() for stat in self.stats}
+        self.match = {stat: Counter() for stat in self.stats}
+
+    def add_tree(self, root, matching=None):
+        """Count the values of all stats in the given tree.
+
+        Args:
+        root: the (technical) root of the tree
+        matching: a list of booleans (for each node in `root.descendants`)
+            specifying which nodes are matching, None means no node is matching.
+        """
+        if matching is not None and not any(matching):
+            matching = None
+        for stat, (values, owners) in zip(self.stats, get_columns(root, self.stats, undefs='')):
+            if not values:
+                continue
+            self.every[stat].update(values)
+            self.every[stat][TOTAL] += len(values)
+            if matching is not None:
+                mask = matching if owners is None else [matching[owner] for owner in owners]
+                matched = list(compress(values, mask))
+                if matched:
+                    self.match[stat].update(matched)
+                    self.match[stat][TOTAL] += len(matched)
@@ -1,5 +1,6 @@
 """Document class is a container for UD trees."""
 
+import copy
 import io
 from udapi.core.bundle import Bundle
 from udapi.block.read.conllu import Conllu as ConlluReader
@@ -10,11 +11,73 @@ class Document(object):
     """Document is a container for Universal Dependency trees."""
 
     def __init__(self):
-        self.bundles = []
+        self._bundles = []
+        self._removed_bundles = set()
         self._highest_bundle_id = 0
         self.meta = {}
         self.json = {}
 
+    def __getstate__(self):
+        """Return the state for pickling (and copying).
+
+        Bundles, trees and nodes implement their own compact non-recursive pickling
+        (see `udapi.core.node.Node.__reduce__`), so documents with deep trees can be pickled,
+        e.g. for sending them to other processes with `multiprocessing`.
+        The trees are stored directly in the state of the document, so that the values
+        of the closed-class columns (upos, xpos, feats, deprel) can be shared by all its trees
+        and pickle stores each of them just once per document.
+        """
+        # pylint: disable=protected-access
+        bundles = self.bundles
+        state, shared = dict(self.__dict__), {}
+        state['_bundles'] = [bundle._flat_state(shared) for bundle in bundles]
+        return state
+
+    def __setstate__(self, state):
+        # pylint: disable=protected-access
+        self.__dict__.update(state)
+        self._bundles = [Bundle._from_flat_state(bundle_state) for bundle_state in self._bundles]
+        for bundle in self._bundles:
+            bundle._document = self
+
+    def clone(self):
+        """Return a copy of this document (with copies of all its bundles and trees).
+
+        The trees are copied in one linear pass each (see `udapi.core.root.Root.clone`),
+        which is much faster than `copy.deepcopy(document)`.
+        """
+        doc = Document()
+        doc._highest_bundle_id = self._highest_bundle_id
+        doc.meta = copy.deepcopy(self.meta)
+        doc.json = copy.deepcopy(self.json)
+        for bundle in self.bundles:
+            bundle_copy = bundle.clone()
+            bundle_copy._document = doc  # pylint: disable=protected-access
+            doc._bundles.append(bundle_copy)
+        return doc
+
+    @property
+    def bundles(self):
+        """List of the bundles in this document.
+
+        Removed bundles are deleted from the list lazily (all at once) on the next access,
+        so removing many bundles (e.g. with `util.Filter`) is not quadratic.
+        """
+        if self._removed_bundles:
+            removed = self._removed_bundles
+            self._bundles = [bundle for bundle in self._bundles if bundle not in removed]
+            self._removed_bundles = set()
+        return self._bundles
+
+    @bundles.setter
+    def bundles(self, bundles):
+        self._bundles = bundles
+        self._removed_bundles = set()
+
+    def _remove_bundle(self, bundle):
+        """Mark the bundle as removed, it will be deleted from `bundles` on the next access."""
+        self._removed_bundles.add(bundle)
+
     def __iter__(self):
         return iter(self.bundles)
 
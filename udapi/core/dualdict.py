@@ -1,6 +1,5 @@
 """DualDict is a dict with lazily synchronized string representation."""
 import collections.abc
-import copy
 
 
 class DualDict(collections.abc.MutableMapping):
@@ -49,6 +48,19 @@ class DualDict(collections.abc.MutableMapping):
             self._string = '|'.join(serialized) if serialized else '_'
         return self._string
 
+    def __reduce__(self):
+        return (self.__class__, (self.reduced_value(),))
+
+    def reduced_value(self):
+        """Return the string (or the dict if not serialized or with non-string values).
+
+        This is used for compact pickling and copying.
+        """
+        if self._string is None or any(value is not True and not isinstance(value, str)
+                                       for value in self._dict.values()):
+            return dict(self._dict)
+        return self._string
+
     def _deserialize_if_empty(self):
         if not self._dict and self._string is not None and self._string != '_':
             for raw_feature in self._string.split('|'):
@@ -96,8 +108,15 @@ class DualDict(collections.abc.MutableMapping):
         self._dict.clear()
 
     def copy(self):
-        """Return a deep copy of this instance."""
-        return copy.deepcopy(self)
+        """Return a copy of this instance.
+
+        The (immutable) string is shared and the dict is copied only if it was deserialized,
+        so copying e.g. feats which were not accessed as a dict is cheap.
+        """
+        new = self.__class__.__new__(self.__class__)
+        new._string = self._string
+        new._dict = dict(self._dict) if self._dict else {}
+        return new
 
     def set_mapping(self, value):
         """Set the mapping from a dict or string.
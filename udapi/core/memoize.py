@@ -0,0 +1,216 @@
+"""Memoization of block outputs in an on-disk cache keyed by the input content.
+
+Any block (except for readers and writers) can be memoized by adding the parameter
+`memoize=<cache file>` to the block in the scenario, e.g.::
+
+  udapy read.Conllu files=in.conllu \\
+    udpipe.Base model=cs memoize=nightly.cache \\
+    ud.Google2ud memoize=nightly.cache memoize_max_mb=4096 \\
+    write.Conllu files=out.conllu
+
+Each bundle is serialized into CoNLL-U and hashed together with the block name,
+its parameters, its (optional) `version` class attribute and a hash of its source file.
+If the hash is found in the cache, the block is not executed for the bundle
+and the cached output is loaded instead. The other bundles are processed by the block
+(together, so e.g. batching in `udpipe.Base` still works) and their outputs are stored.
+The cache is an SQLite file shared by all the memoized blocks, the least recently used
+entries are evicted when its size exceeds `memoize_max_mb` (default=1024).
+
+Memoization is correct only for blocks whose output for a bundle depends just on that
+bundle (not on the other bundles or on document-level metadata) and which do not create
+new bundles. Blocks which delete bundles are supported.
+"""
+import contextlib
+import hashlib
+import inspect
+import io
+import json
+import logging
+import sqlite3
+import time
+import zlib
+
+from udapi.core.basewriter import BaseWriter
+from udapi.core.block import Block
+from udapi.core.document import Document
+from udapi.block.write.conllu import Conllu as ConlluWriter
+
+# Cached value meaning that the block deleted the bundle (not a valid CoNLL-U).
+DELETED = '\0deleted'
+
+# pylint: disable=protected-access
+
+
+class Cache(object):
+    """An on-disk key-value store (SQLite) with size-bounded LRU eviction."""
+
+    def __init__(self, filename, max_mb=1024):
+        self.filename = filename
+        self.max_size = max_mb * 1024 * 1024
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY,'
+                                ' value BLOB NOT NULL, size INTEGER NOT NULL,'
+                                ' last_used REAL NOT NULL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS cache_last_used ON cache(last_used)')
+        self.size = self.connection.execute('SELECT SUM(size) FROM cache').fetchone()[0] or 0
+
+    def get(self, key):
+        """Return the value stored for the key or None."""
+        row = self.connection.execute('SELECT value FROM cache WHERE key=?', (key,)).fetchone()
+        if row is None:
+            return None
+        self.connection.execute('UPDATE cache SET last_used=? WHERE key=?', (time.time(), key))
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def put(self, key, value):
+        """Store the value (a string) for the key."""
+        data = zlib.compress(value.encode('utf-8'))
+        old = self.connection.execute('SELECT size FROM cache WHERE key=?', (key,)).fetchone()
+        if old is not None:
+            self.size -= old[0]
+        self.connection.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)',
+                                (key, data, len(data), time.time()))
+        self.size += len(data)
+
+    def commit(self):
+        """Evict the least recently used entries if needed and commit the changes."""
+        if self.size > self.max_size:
+            evicted = []
+            # Evict a bit more than needed, so that eviction does not happen after each put.
+            target = self.max_size * 0.9
+            for key, size in self.connection.execute(
+                    'SELECT key, size FROM cache ORDER BY last_used'):
+                if self.size <= target:
+                    break
+                evicted.append((key,))
+                self.size -= size
+            self.connection.executemany('DELETE FROM cache WHERE key=?', evicted)
+            logging.debug('Evicted %d entries from %s', len(evicted), self.filename)
+        self.connection.commit()
+
+    def close(self):
+        """Commit and close the cache file."""
+        self.commit()
+        self.connection.close()
+
+
+# Caches shared by all memoized blocks in this process, keyed by filename.
+_CACHES = {}
+
+
+def get_cache(filename, max_mb=1024):
+    """Return the (shared) cache stored in the given file."""
+    if filename not in _CACHES:
+        _CACHES[filename] = Cache(filename, max_mb)
+    return _CACHES[filename]
+
+
+def _source_hash(block):
+    try:
+        with open(inspect.getsourcefile(block.__class__), 'rb') as source:
+            return hashlib.sha1(source.read()).hexdigest()
+    except (TypeError, OSError):
+        return ''
+
+
+class Memoized(Block):
+    """A wrapper of a block which replays cached outputs for already seen bundles."""
+
+    def __init__(self, block, cache, name=None, params=None, max_mb=1024):
+        """Create the wrapper.
+
+        Args:
+        block: the block to be memoized
+        cache: filename of the cache (or a `Cache` instance)
+        name: block name used in the cache key (default=the class name with its module)
+        params: a dict of the block parameters used in the cache key
+        max_mb: maximum size of the cache in MiB
+        """
+        if hasattr(block, 'finished') or isinstance(block, BaseWriter):
+            raise ValueError('Readers and writers cannot be memoized: %s' % block)
+        super().__init__()
+        self.block = block
+        self.cache = get_cache(cache, max_mb) if isinstance(cache, str) else cache
+        if name is None:
+            name = block.__class__.__module__ + '.' + block.__class__.__name__
+        self.key_prefix = json.dumps([name, params or {}, getattr(block, 'version', None),
+                                      _source_hash(block)], sort_keys=True, default=str)
+        self._writer = ConlluWriter()
+        self.hits, self.misses = 0, 0
+
+    def serialize(self, bundle):
+        """Return the CoNLL-U serialization of all the trees in the bundle."""
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            for tree in bundle:
+                self._writer.process_tree(tree)
+        return output.getvalue()
+
+    @staticmethod
+    def replay(bundle, value):
+        """Replace the content of the bundle with the cached output."""
+        if value == DELETED:
+            bundle.remove()
+            return
+        cached = Document()
+        cached.from_conllu_string(value)
+        bundle.trees = []
+        for cached_bundle in cached.bundles:
+            for tree in cached_bundle.trees:
+                bundle.add_tree(tree)
+
+    def process_start(self):
+        self.block.process_start()
+
+    def get_state(self):
+        return self.block.get_state()
+
+    def set_state(self, state):
+        self.block.set_state(state)
+
+    def merge_state(self, state):
+        self.block.merge_state(state)
+
+    def process_end(self):
+        self.block.process_end()
+        self.cache.commit()
+        logging.info('Memoized %s: %d cached bundles, %d processed',
+                     self.block.__class__.__name__, self.hits, self.misses)
+
+    def process_document(self, document):
+        misses = []
+        for bundle in document.bundles:
+            key = hashlib.sha256((self.key_prefix + self.serialize(bundle)).encode('utf-8'))
+            key = key.hexdigest()
+            value = self.cache.get(key)
+            if value is None:
+                misses.append((bundle, key))
+            else:
+                self.hits += 1
+                self.replay(bundle, value)
+        self.misses += len(misses)
+
+        if misses:
+            # Process all the missed bundles at once (as a temporary document).
+            todo = Document()
+            todo.meta, todo.json = document.meta, document.json
+            todo.bundles = [bundle for bundle, _ in misses]
+            for bundle in todo.bundles:
+                bundle._document = todo
+            try:
+                self.block.apply_on_document(todo)
+            finally:
+                for bundle, _ in misses:
+                    bundle._document = document
+            remaining = set(todo.bundles)
+            if remaining - set(bundle for bundle, _ in misses):
+                raise ValueError('Block %s created new bundles, so it cannot be memoized'
+                                 % self.block.__class__.__name__)
+            for bundle, key in misses:
+                if bundle in remaining:
+                    self.cache.put(key, self.serialize(bundle))
+                else:
+                    self.cache.put(key, DELETED)
+                    bundle.remove()
+        self.cache.commit()
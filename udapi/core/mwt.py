@@ -14,6 +14,12 @@ class MWT(object):
         for word in self.words:
             word._mwt = self  # pylint: disable=W0212
 
+    def __reduce__(self):
+        """Pickle a multi-word token as a reference into its tree (see `Node.__reduce__`)."""
+        if self.root is not None:
+            return (_tree_mwt, (self.root, self.root.multiword_tokens.index(self)))
+        return (MWT, (self.words, self.form, self._misc))
+
     @property
     def misc(self):
         """Property for MISC attributes stored as a `DualDict` object.
@@ -40,6 +46,11 @@ class MWT(object):
         """Full (document-wide) id of the multi-word token."""
         return self.root.address + '#' + self.ord_range
 
+
+def _tree_mwt(root, index):
+    """Return the multi-word token with the given index in the (unpickled) tree."""
+    return root.multiword_tokens[index]
+
 # TODO: node.remove() should check if the node is not part of any MWT
 # TODO: mwt.words.append(node) and node.shift* should check if the MWT does not contain gaps
 #       and is still multi-word
@@ -3,7 +3,10 @@
 In addition to class `Node`, this module contains class `ListOfNodes`
 and function `find_minimal_common_treelet`.
 """
+import copyreg
+import hashlib
 import logging
+from operator import attrgetter
 
 from udapi.block.write.textmodetrees import TextModeTrees
 from udapi.core.dualdict import DualDict
@@ -20,6 +23,9 @@ from udapi.core.feats import Feats
 # The set of public attributes/properties and methods of Node was well-thought.
 # pylint: disable=too-many-instance-attributes,too-many-public-methods
 
+# Attributes used by `Node.fingerprint` by default (the topology is always included).
+FINGERPRINT_ATTRS = ('form', 'lemma', 'upos', 'feats', 'deprel')
+
 
 class Node(object):
     """Class for representing nodes in Universal Dependency trees.
@@ -78,6 +84,10 @@ class Node(object):
         '_mwt',       # Multi-word token in which this word participates.
     ]
 
+    # Incremented whenever enhanced dependencies of any node may change (incl. in-place changes
+    # of the list returned by `deps`), so that `Root.enh_children_map` is validated quickly.
+    _deps_changes = 0
+
     def __init__(self, form=None, lemma=None, upos=None,  # pylint: disable=too-many-arguments
                  xpos=None, feats=None, deprel=None, misc=None):
         """Create a new node and initialize its attributes using the keyword arguments."""
@@ -99,6 +109,49 @@ class Node(object):
         """Pretty print of the Node object."""
         return "node<%s, %s>" % (self.address(), self.form)
 
+    def __reduce__(self):
+        """Pickle (and copy) whole trees as flat arrays, not recursively via parent/children.
+
+        A node is pickled as a reference (index) into its tree, which is pickled as a whole
+        (only once per pickle). The tree (whose top is a technical root or a detached node)
+        is encoded by `__getstate__` as a list of heads and columns of attributes,
+        so deep trees do not hit the recursion limit and the pickles are compact.
+        Pickling a tree (root) does not include its bundle, see `Document.__getstate__`.
+        """
+        top = self.root
+        if top is not self:
+            return (_tree_node, (top, top._flat_index(self)))
+        return (copyreg.__newobj__, (type(self),), self.__getstate__())
+
+    def _flat_nodes(self):
+        """Return this node and its descendants in the order used by `__getstate__`."""
+        nodes, stack = [], [self]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(reversed(node._children))
+        return nodes
+
+    def _flat_index(self, node):
+        """Return the index of the descendant `node` in `self._flat_nodes()`."""
+        return self._flat_nodes().index(node)
+
+    def _flat_node(self, index):
+        """Return the descendant with the given `_flat_index`."""
+        return self._flat_nodes()[index]
+
+    def __getstate__(self):
+        """Return the subtree of this (top) node as a tuple of flat arrays."""
+        nodes = self._flat_nodes()
+        index = {node: i for i, node in enumerate(nodes)}
+        heads = [index[node._parent] for node in nodes[1:]]
+        return heads, [node.ord for node in nodes], _columns(nodes, {}, {})
+
+    def __setstate__(self, state):
+        heads, ords, columns = state
+        nodes = _set_columns([self] + [Node.__new__(Node) for _ in heads], columns, ords)
+        _set_heads(nodes, heads)
+
     @property
     def udeprel(self):
         """Return the universal part of dependency relation, e.g. `acl` instead of `acl:relcl`.
@@ -193,11 +246,9 @@ class Node(object):
         provide the serialization if they were deserialized already.
         """
         if self._deps is not None:
-            serialized_deps = []
-            for secondary_dependence in self._deps:
-                serialized_deps.append('%d:%s' % (secondary_dependence[
-                    'parent'].ord, secondary_dependence['deprel']))
-            self._raw_deps = '|'.join(serialized_deps)
+            # ord of empty nodes is a string, e.g. "8.1"
+            self._raw_deps = '|'.join('%s:%s' % (dep['parent'].ord, dep['deprel'])
+                                      for dep in self._deps) or '_'
         return self._raw_deps
 
     @raw_deps.setter
@@ -209,35 +260,41 @@ class Node(object):
         """
         self._raw_deps = str(value)
         self._deps = None
+        Node._deps_changes += 1
 
     @property
     def deps(self):
         """Return enhanced dependencies as a Python list of dicts.
 
-        After the first access to the enhanced dependencies,
-        provide the deserialization of the raw data and save deps to the list.
+        Each dict has keys `parent` (a node, possibly an empty node) and `deprel`.
+        After the first access to the enhanced dependencies of any node in a tree,
+        the raw data of all the nodes in the tree (incl. empty nodes) are deserialized
+        in one pass, see `udapi.core.root.Root.deserialize_deps`.
         """
         if self._deps is None:
-            # Obtain a list of all nodes in the dependency tree.
-            nodes = [self.root] + self.root.descendants()
-
-            # Create a list of secondary dependencies.
-            self._deps = list()
-
-            if self._raw_deps == '_':
-                return self._deps
-
-            for raw_dependency in self._raw_deps.split('|'):
-                head, deprel = raw_dependency.split(':')
-                parent = nodes[int(head)]
-                self._deps.append({'parent': parent, 'deprel': deprel})
-
+            root = self.root
+            if root.is_root():
+                root.deserialize_deps()
+            else:
+                self._deps = []
+                if self._raw_deps != '_':
+                    raise ValueError('Cannot deserialize deps of %s, it is not in a tree' % self)
+        Node._deps_changes += 1
         return self._deps
 
     @deps.setter
     def deps(self, value):
         """Set deserialized enhanced dependencies (the new value is a list of dicts)."""
         self._deps = value
+        Node._deps_changes += 1
+
+    @property
+    def enh_children(self):
+        """Return enhanced children as a list of dicts with keys `child` and `deprel`.
+
+        The map of enhanced children of the whole tree is cached, see `root.enh_children_map()`.
+        """
+        return list(self.root.enh_children_map().get(self, ()))
 
     @property
     def parent(self):
@@ -356,12 +413,20 @@ class Node(object):
         new_node.parent = self
         return new_node
 
-    def create_empty_child(self, **kwargs):
-        """Create and return a new empty node child of the current node."""
+    def create_empty_child(self, deprel=None, **kwargs):
+        """Create and return a new empty node child of the current node.
+
+        Empty nodes are not part of the basic tree: they are not included in `children`
+        nor `descendants` of any node. However, `empty.parent` points to the technical root,
+        so `empty.root` works as for other nodes.
+        If `deprel` is given, an enhanced dependency edge from the current node is created.
+        """
+        root = self.root
         new_node = Node(**kwargs)
-        self.root.empty_nodes.append(new_node)
-        # self.enh_children.append(new_node) TODO
-        # new_node.enh_parents.append(self) TODO
+        new_node._parent = root
+        root.empty_nodes.append(new_node)
+        if deprel is not None:
+            new_node.deps.append({'parent': self, 'deprel': deprel})
         return new_node
 
     # TODO: make private: _unordered_descendants
@@ -479,33 +544,8 @@ class Node(object):
         """Is this node a leaf, ie. a node without any children?"""
         return not self.children
 
-    def _get_attr(self, name):  # pylint: disable=too-many-return-statements
-        if name == 'dir':
-            if self.parent.is_root():
-                return 'root'
-            return 'left' if self.precedes(self.parent) else 'right'
-        if name == 'edge':
-            if self.parent.is_root():
-                return 0
-            return self.ord - self.parent.ord
-        if name == 'children':
-            return len(self.children)
-        if name == 'siblings':
-            return len(self.parent.children) - 1
-        if name == 'depth':
-            value = 0
-            tmp = self
-            while not tmp.is_root():
-                tmp = tmp.parent
-                value += 1
-            return value
-        if name == 'feats_split':
-            return str(self.feats).split('|')
-        if name.startswith('feats['):
-            return self.feats[name[6:-1]]
-        if name.startswith('misc['):
-            return self.misc[name[5:-1]]
-        return getattr(self, name)
+    def _get_attr(self, name):
+        return _compile_base_attr(name)[0](self)
 
     def get_attrs(self, attrs, undefs=None, stringify=True):
         """Return multiple attributes or pseudo-attributes, possibly substituting empty ones.
@@ -528,29 +568,76 @@ class Node(object):
         attrs: A list of attribute names, e.g. ``['form', 'lemma', 'p_upos']``.
         undefs: A value to be used instead of None for empty (undefined) values.
         stringify: Apply `str()` on each value (except for None)
+
+        If you need the same attributes of many nodes, use `Node.compile_attrs` instead.
         """
-        values = []
-        for name in attrs:
-            nodes = [self]
-            if name.startswith('p_'):
-                nodes, name = [self.parent], name[2:]
-            elif name.startswith('c_'):
-                nodes, name = self.children, name[2:]
-            elif name.startswith('l_'):
-                nodes, name = [self.prev_node], name[2:]
-            elif name.startswith('r_'):
-                nodes, name = [self.next_node], name[2:]
-            for node in (n for n in nodes if n is not None):
-                if name == 'feats_split':
-                    values.extend(node._get_attr(name))
-                else:
-                    values.append(node._get_attr(name))
+        return Node.compile_attrs(attrs, undefs, stringify)(self)
+
+    @staticmethod
+    def compile_attrs(attrs, undefs=None, stringify=True):
+        """Return a function equivalent to `lambda node: node.get_attrs(attrs, undefs, stringify)`.
 
-        if undefs is not None:
-            values = [x if x is not None else undefs for x in values]
-        if stringify:
-            values = [str(x) if x is not None else None for x in values]
-        return values
+        The attribute names are parsed just once (into a tuple of accessor functions),
+        so the returned function is much faster than `get_attrs` when applied on many nodes::
+
+          get_values = Node.compile_attrs(['form', 'p_upos', 'feats[Case]'], undefs='_')
+          for node in root.descendants:
+              print(' '.join(get_values(node)))
+        """
+        key = (tuple(attrs), undefs, stringify)
+        try:
+            return _COMPILED_ATTRS[key]
+        except KeyError:
+            pass
+        except TypeError:  # undefs is not hashable
+            return _compile_attrs(attrs, undefs, stringify)
+        if len(_COMPILED_ATTRS) >= _MAX_COMPILED_ATTRS:
+            _COMPILED_ATTRS.clear()
+        getter = _COMPILED_ATTRS[key] = _compile_attrs(attrs, undefs, stringify)
+        return getter
+
+    def fingerprints(self, attrs=FINGERPRINT_ATTRS):
+        """Return a dict {node: fingerprint} for this node and all its descendants.
+
+        The fingerprint (Merkle hash) of a node is computed bottom-up from the given
+        (pseudo-)attributes of the node (see `get_attrs`), the form of the multi-word token
+        starting with the node (if any) and the fingerprints of its children together
+        with their word-order offsets from the node (so the fingerprint covers the word order
+        of the whole subtree). So two subtrees have the same fingerprint iff they are identical
+        in the given attributes, topology and word order (up to hash collisions),
+        no matter where in the sentence they are.
+        All the subtree fingerprints are computed in one pass, so after editing a tree,
+        fingerprints of the changed subtrees can be compared with the old ones cheaply.
+        """
+        get_values = Node.compile_attrs(attrs, undefs='_')
+        stack, nodes = [self], []
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(node._children)
+        result = {}
+        for node in reversed(nodes):
+            hasher = hashlib.blake2b(digest_size=16)
+            if not node.is_root():
+                hasher.update('\t'.join(get_values(node)).encode('utf-8'))
+                mwt = node._mwt
+                if mwt is not None and mwt.words[0] is node:
+                    hasher.update(('\0%d\t%s' % (len(mwt.words), mwt.form)).encode('utf-8'))
+            for child in node._children:
+                hasher.update(b'\n%d\n' % (child.ord - node.ord))
+                hasher.update(result[child])
+            result[node] = hasher.digest()
+        return {node: digest.hex() for node, digest in result.items()}
+
+    def fingerprint(self, attrs=FINGERPRINT_ATTRS):
+        """Return a stable hash (hex string) of the subtree rooted in this node.
+
+        Args:
+        attrs: (pseudo-)attributes to be included, e.g. `('form',)` for fingerprints
+            of (sub)sentences, default=('form', 'lemma', 'upos', 'feats', 'deprel').
+            See `fingerprints` for details.
+        """
+        return self.fingerprints(attrs)[self]
 
     def compute_text(self, use_mwt=True):
         """Return a string representing this subtree's text (detokenized).
@@ -566,25 +653,28 @@ class Node(object):
         If called on non-root nodeA, nodeA's form is included in the string,
         i.e. internally descendants(add_self=True) is used.
         Note that if the subtree is non-projective, the resulting string may be misleading.
+        If called on root with use_mwt, the text of the cached `root.text_index()` is returned.
 
         Args:
         use_mwt: consider multi-word tokens? (default=True)
         """
-        string = ''
+        if use_mwt and self.is_root():
+            return self.text_index().text
+        parts = []
         last_mwt_id = 0
         for node in self.descendants(add_self=not self.is_root()):
             mwt = node.multiword_token
             if use_mwt and mwt:
                 if node.ord > last_mwt_id:
                     last_mwt_id = mwt.words[-1].ord
-                    string += mwt.form
+                    parts.append(mwt.form)
                     if mwt.misc['SpaceAfter'] != 'No':
-                        string += ' '
+                        parts.append(' ')
             else:
-                string += node.form
+                parts.append(node.form)
                 if node.misc['SpaceAfter'] != 'No':
-                    string += ' '
-        return string.rstrip()
+                    parts.append(' ')
+        return ''.join(parts).rstrip()
 
     def print_subtree(self, **kwargs):
         """Print ASCII visualization of the dependency structure of this subtree.
@@ -608,7 +698,7 @@ class Node(object):
         e.g. s123/en_udpipe#4. If zone is empty, the slash is excluded as well,
         e.g. s123#4.
         """
-        return '%s#%d' % (self.root.address() if self.root else '?', self.ord)
+        return '%s#%s' % (self.root.address() if self.root else '?', self.ord)
 
     @property
     def multiword_token(self):
@@ -792,3 +882,188 @@ def find_minimal_common_treelet(*args):
 
     # We return the root of the minimal common treelet plus all the newly added nodes.
     return (highest, new_nodes.values())
+
+
+# Precompiled accessors of (pseudo-)attributes used by `Node.compile_attrs` and `Node.get_attrs`.
+def _dir(node):
+    parent = node._parent
+    if parent.is_root():
+        return 'root'
+    return 'left' if node.ord < parent.ord else 'right'
+
+
+def _edge(node):
+    parent = node._parent
+    if parent.is_root():
+        return 0
+    return node.ord - parent.ord
+
+
+def _depth(node):
+    depth = 0
+    while not node.is_root():
+        node = node._parent
+        depth += 1
+    return depth
+
+
+_PSEUDO_ATTRS = {
+    'dir': _dir,
+    'edge': _edge,
+    'children': lambda node: len(node._children),
+    'siblings': lambda node: len(node._parent._children) - 1,
+    'depth': _depth,
+    'feats_split': lambda node: str(node.feats).split('|'),
+}
+
+_RELATIVES = {
+    'p_': lambda node: (node._parent,),
+    'c_': lambda node: node._children,
+    'l_': lambda node: (node.prev_node,),
+    'r_': lambda node: (node.next_node,),
+}
+
+_COMPILED_ATTRS = {}
+_MAX_COMPILED_ATTRS = 1000
+_BASE_ATTRS = {}
+
+
+def _compile_base_attr(name):
+    """Return a pair (accessor, multi) for a (pseudo-)attribute name without p_/c_/l_/r_ prefix.
+
+    `accessor(node)` returns the value of the attribute, or a list of values if `multi`.
+    """
+    compiled = _BASE_ATTRS.get(name)
+    if compiled is not None:
+        return compiled
+    if name in _PSEUDO_ATTRS:
+        compiled = _PSEUDO_ATTRS[name], name == 'feats_split'
+    elif name.startswith('feats['):
+        feat = name[6:-1]
+        compiled = (lambda node: node.feats[feat]), False
+    elif name.startswith('misc['):
+        feat = name[5:-1]
+        compiled = (lambda node: node.misc[feat]), False
+    elif '.' in name:  # attrgetter would follow the dots, unlike getattr
+        compiled = (lambda node: getattr(node, name)), False
+    else:
+        compiled = attrgetter(name), False
+    if len(_BASE_ATTRS) < _MAX_COMPILED_ATTRS:
+        _BASE_ATTRS[name] = compiled
+    return compiled
+
+
+def _compile_attr(name):
+    """Return a pair (accessor, multi) for a (pseudo-)attribute name, see `_compile_base_attr`."""
+    relatives = _RELATIVES.get(name[:2])
+    if relatives is None:
+        return _compile_base_attr(name)
+    accessor, multi = _compile_base_attr(name[2:])
+    if multi:
+        return (lambda node: [value for other in relatives(node) if other is not None
+                              for value in accessor(other)]), True
+    return (lambda node: [accessor(other) for other in relatives(node) if other is not None]), True
+
+
+def _compile_attrs(attrs, undefs, stringify):
+    """Return a function computing `node.get_attrs(attrs, undefs, stringify)`."""
+    # pylint: disable=too-many-return-statements
+    compiled = [_compile_attr(name) for name in attrs]
+    if not compiled:
+        return lambda node: []
+    if any(multi for _, multi in compiled):
+        accessors = tuple(compiled)
+
+        def get_values(node):
+            values = []
+            for accessor, multi in accessors:
+                if multi:
+                    values.extend(accessor(node))
+                else:
+                    values.append(accessor(node))
+            return values
+    elif all(isinstance(accessor, attrgetter) for accessor, _ in compiled):
+        # The most common case: plain attributes (e.g. form,upos) retrieved all at once.
+        get_values = attrgetter(*attrs)
+        if len(attrs) == 1:
+            get_value = get_values
+
+            def get_values(node):  # pylint: disable=function-redefined
+                return (get_value(node),)
+    else:
+        accessors = tuple(accessor for accessor, _ in compiled)
+
+        def get_values(node):  # pylint: disable=function-redefined
+            return [accessor(node) for accessor in accessors]
+
+    if stringify:
+        undef = None if undefs is None else str(undefs)
+        return lambda node: [undef if value is None else str(value) for value in get_values(node)]
+    if undefs is not None:
+        return lambda node: [undefs if value is None else value for value in get_values(node)]
+    return lambda node: list(get_values(node))
+
+
+def _tree_node(top, index):
+    """Return the node with the given index in the (unpickled) tree, see `Node.__reduce__`."""
+    return top._flat_node(index)
+
+
+def _dualdict_state(ddict, strings):
+    """Return `ddict.reduced_value()`, deduplicating strings."""
+    value = ddict.reduced_value()
+    return strings.setdefault(value, value) if isinstance(value, str) else value
+
+
+def _dualdict(cls, state):
+    """Create a DualDict (or Feats) from `_dualdict_state` without parsing it."""
+    ddict = cls.__new__(cls)
+    if isinstance(state, str):
+        ddict._string, ddict._dict = state, {}
+    else:
+        ddict._string, ddict._dict = None, state
+    return ddict
+
+
+def _columns(nodes, strings, shared):
+    """Return the attributes of the nodes as a tuple of lists (columns) for pickling.
+
+    Equal strings within the `strings` dict are deduplicated, so that pickle stores them once.
+    Values of the closed-class columns (upos, xpos, feats, deprel) are deduplicated within
+    the `shared` dict, which may be shared by all the trees of a pickled document
+    (see `udapi.core.document.Document.__getstate__`), so that pickle stores them once per document.
+    """
+    dedup, share = strings.setdefault, shared.setdefault
+    return ([dedup(node.form, node.form) for node in nodes],
+            [dedup(node.lemma, node.lemma) for node in nodes],
+            [share(node.upos, node.upos) for node in nodes],
+            [share(node.xpos, node.xpos) for node in nodes],
+            [_dualdict_state(node._feats, shared) for node in nodes],
+            [share(node.deprel, node.deprel) for node in nodes],
+            [dedup(node.raw_deps, node.raw_deps) for node in nodes],
+            [_dualdict_state(node._misc, strings) for node in nodes])
+
+
+def _set_columns(nodes, columns, ords):
+    """Set the attributes of the nodes (without any structure) from `_columns`."""
+    for node, form, lemma, upos, xpos, feats, deprel, raw_deps, misc in zip(nodes, *columns):
+        node.form, node.lemma, node.upos, node.xpos, node.deprel = form, lemma, upos, xpos, deprel
+        node._feats = _dualdict(Feats, feats)
+        node._misc = _dualdict(DualDict, misc)
+        node._raw_deps, node._deps = raw_deps, None
+        node._parent, node._children, node._mwt = None, [], None
+    if ords is None:
+        for new_ord, node in enumerate(nodes):
+            node.ord = new_ord
+    else:
+        for node, new_ord in zip(nodes, ords):
+            node.ord = new_ord
+    return nodes
+
+
+def _set_heads(nodes, heads):
+    """Attach `nodes[1:]` to their parents given as indices into `nodes`."""
+    for node, head in zip(nodes[1:], heads):
+        parent = nodes[head]
+        node._parent = parent
+        parent._children.append(node)
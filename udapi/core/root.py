@@ -1,8 +1,15 @@
 """Root class represents the technical root node in each tree."""
+import copy
 import logging
+from itertools import chain
+from operator import attrgetter, is_, itemgetter
 
-from udapi.core.node import Node, ListOfNodes
+from udapi.core.dualdict import DualDict
+from udapi.core.node import (Node, ListOfNodes, _columns, _dualdict, _dualdict_state,
+                             _set_columns, _set_heads)
 from udapi.core.mwt import MWT
+from udapi.core.textindex import TextIndex
+from udapi.core.columns import get_columns
 
 # 7 instance attributes is too low (CoNLL-U has 10 columns)
 # The set of public attributes/properties and methods of Root was well-thought.
@@ -12,7 +19,8 @@ from udapi.core.mwt import MWT
 class Root(Node):
     """Class for representing root nodes (technical roots) in UD trees."""
     __slots__ = ['_sent_id', '_zone', '_bundle', '_descendants', '_mwts',
-                 'empty_nodes', 'text', 'comment', 'newpar', 'newdoc', 'json']
+                 'empty_nodes', 'text', 'comment', 'newpar', 'newdoc', 'json', '_text_index',
+                 '_enh_children']
 
     # pylint: disable=too-many-arguments
     def __init__(self, zone=None, comment='', text=None, newpar=None, newdoc=None):
@@ -38,6 +46,87 @@ class Root(Node):
         self._descendants = []
         self._mwts = []
         self.empty_nodes = []  # TODO: private
+        self._text_index = None
+        self._enh_children = None
+
+    def _flat_index(self, node):
+        """Return the index of node in `[self] + self._descendants` or -1-index of empty nodes."""
+        if isinstance(node.ord, int) and 0 < node.ord <= len(self._descendants) \
+                and self._descendants[node.ord - 1] is node:
+            return node.ord
+        for i, empty in enumerate(self.empty_nodes):
+            if empty is node:
+                return -1 - i
+        return self._descendants.index(node) + 1
+
+    def _flat_node(self, index):
+        if index < 0:
+            return self.empty_nodes[-1 - index]
+        return self._descendants[index - 1] if index else self
+
+    def __getstate__(self):
+        """Return the tree as a tuple of flat arrays (heads, columns, MWT and empty nodes)."""
+        return self._flat_state({})
+
+    def _flat_state(self, shared):
+        """Return the state for pickling, deduplicating closed-class values within `shared`."""
+        nodes = [self] + self._descendants
+        index = {node: i for i, node in enumerate(nodes)}
+        heads = [index[node._parent] for node in self._descendants]
+        ords = None
+        if any(node.ord != i for i, node in enumerate(nodes)):
+            ords = [node.ord for node in nodes]
+        strings = {}
+        mwts = [([index[word] for word in mwt.words], mwt.form, _dualdict_state(mwt._misc, strings))
+                for mwt in self._mwts]
+        empty_nodes = None
+        if self.empty_nodes:
+            empty_nodes = ([node.ord for node in self.empty_nodes],
+                           _columns(self.empty_nodes, strings, shared))
+        sent_id = self.sent_id if self._bundle is not None else self._sent_id
+        return (heads, ords, _columns(nodes, strings, shared), mwts, empty_nodes, sent_id,
+                self._zone, self.text, self.comment, self.newpar, self.newdoc, self.json)
+
+    def __setstate__(self, state):
+        (heads, ords, columns, mwts, empty_nodes, self._sent_id, self._zone,
+         self.text, self.comment, self.newpar, self.newdoc, self.json) = state
+        nodes = _set_columns([self] + [Node.__new__(Node) for _ in heads], columns, ords)
+        _set_heads(nodes, heads)
+        self._bundle = None
+        self._text_index = None
+        self._enh_children = None
+        self._descendants = nodes[1:]
+        self._mwts = []
+        for words, form, misc in mwts:
+            mwt = MWT.__new__(MWT)
+            mwt.words, mwt.form, mwt.root = [nodes[i] for i in words], form, self
+            mwt._misc = _dualdict(DualDict, misc)
+            for word in mwt.words:
+                word._mwt = mwt
+            self._mwts.append(mwt)
+        self.empty_nodes = []
+        if empty_nodes is not None:
+            self.empty_nodes = _set_columns([Node.__new__(Node) for _ in empty_nodes[0]],
+                                            empty_nodes[1], empty_nodes[0])
+            for node in self.empty_nodes:
+                node._parent = self
+
+    def clone(self, zone=None):
+        """Return a copy of this tree (with new nodes), which is not attached to any bundle.
+
+        The tree is copied in one linear pass (see `__getstate__`), which is much faster
+        than `copy.deepcopy`. It can be added to a bundle with `bundle.add_tree(root.clone())`.
+        Args:
+        zone: zone of the new tree (default=the zone of this tree),
+            e.g. `bundle.add_tree(gold_tree.clone(zone='pred'))`
+        """
+        tree = self.__class__.__new__(self.__class__)
+        tree.__setstate__(self.__getstate__())
+        tree.json = copy.deepcopy(self.json)
+        tree._sent_id = self._sent_id
+        if zone is not None:
+            tree._zone, tree._sent_id = zone, None
+        return tree
 
     @property
     def sent_id(self):
@@ -136,7 +225,7 @@ class Root(Node):
         if children is not None and self.children:
             logging.warning('%s is being removed by remove(children=%s), '
                             ' but it has (unexpected) children', self, children)
-        self.bundle.trees = [root for root in self.bundle.trees if root != self]
+        self.bundle._remove_tree(self)  # pylint: disable=protected-access
 
     def shift(self, reference_node, after=0, move_subtree=0, reference_subtree=0):
         """Attempts at changing the word order of root result in Exception."""
@@ -235,39 +324,225 @@ class Root(Node):
                 result.append(node)
         return result
 
+    def text_index(self):
+        """Return an index of character offsets of the tokens in the (computed) text.
+
+        See `udapi.core.textindex.TextIndex`. The index is cached and rebuilt automatically
+        when the tree (its words, forms, MISC or multi-word tokens) has changed.
+        """
+        if self._text_index is None or not self._text_index.is_valid():
+            self._text_index = TextIndex(self)
+        return self._text_index
+
+    def get_columns(self, attrs, undefs=None, stringify=True):
+        """Return the (pseudo-)attributes of all nodes in this tree, column by column.
+
+        This is equivalent to `node.get_attrs([attr], undefs, stringify)` for each node and attr,
+        but much faster. See `udapi.core.columns.get_columns` for the format of the result.
+        """
+        return get_columns(self, attrs, undefs, stringify)
+
+    def deserialize_deps(self):
+        """Deserialize the enhanced dependencies of all nodes (incl. empty nodes) in one pass.
+
+        This is called automatically on the first access to `node.deps` of any node in the tree.
+        Nodes with already deserialized (or assigned) `deps` are kept untouched.
+        Heads like `8.1` are resolved to the empty nodes.
+        """
+        nodes = [self] + self._descendants
+        empty_nodes = {str(empty.ord): empty for empty in self.empty_nodes}
+        for node in self._descendants + self.empty_nodes:
+            if node._deps is not None:
+                continue
+            deps = []
+            if node._raw_deps != '_':
+                for raw_dependency in node._raw_deps.split('|'):
+                    head, deprel = raw_dependency.split(':', 1)
+                    if '.' in head:
+                        parent = empty_nodes[head]
+                    else:
+                        parent = nodes[int(head)]
+                    deps.append({'parent': parent, 'deprel': deprel})
+            node._deps = deps
+        if self._deps is None:
+            self._deps = []
+
+    def enh_children_map(self):
+        """Return a dict mapping nodes to their enhanced children.
+
+        The values are lists of dicts with keys `child` and `deprel`.
+        The whole enhanced graph (incl. empty nodes) is traversed in one pass.
+        The map is cached and rebuilt automatically when the enhanced graph has changed
+        (nodes were added or removed or `deps` of any node were changed, even in place),
+        so the returned dict and its lists must not be modified.
+        If no `deps` were accessed since the last call, the cached map is returned
+        in constant time, so `node.enh_children` of all nodes can be used in a loop.
+        Therefore, do not change in place a list of deps obtained before the last call,
+        access it again, e.g. `node.deps.append(...)`.
+        """
+        if self._enh_children is None or not self._enh_children.is_valid():
+            self._enh_children = _EnhChildren(self)
+        return self._enh_children.children
+
+    def set_heads(self, heads):
+        """Set new dependency parents (heads) of several nodes of this tree at once.
+
+        Args:
+        heads: a dict mapping nodes of this tree to their new parents (nodes of this tree or root)
+
+        This is equivalent to `node.parent = new_parent` for each node, but it takes linear time
+        (in the number of nodes in the tree): the whole tree is checked for cycles just once
+        and only the affected lists of children are rebuilt.
+        If the new parents would result in a cycle, ValueError is raised and the tree is unchanged.
+        """
+        # pylint: disable=protected-access
+        parent_of = {node: node._parent for node in self._descendants}
+        for node, parent in heads.items():
+            if node not in parent_of or (parent is not self and parent not in parent_of):
+                raise ValueError('Cannot move nodes between trees with set_heads (%s -> %s), '
+                                 'use new_root.steal_nodes(nodes_to_be_moved) instead'
+                                 % (node, parent))
+        parent_of.update(heads)
+
+        # Climb from each node to an already checked node (or the root),
+        # so each node is visited just once.
+        checked = {self}
+        for node in self._descendants:
+            path = set()
+            while node not in checked:
+                if node in path:
+                    raise ValueError('Setting the parent of %s to %s would lead to a cycle.'
+                                     % (node, parent_of[node]))
+                path.add(node)
+                node = parent_of[node]
+            checked |= path
+
+        affected = set()
+        for node, parent in heads.items():
+            if node._parent is not parent:
+                affected.add(node._parent)
+                affected.add(parent)
+                node._parent = parent
+        if affected:
+            for parent in affected:
+                parent._children = []
+            for node in self._descendants:
+                if node._parent in affected:
+                    node._parent._children.append(node)
+
     def steal_nodes(self, nodes):
-        """Move nodes from another tree to this tree (append)."""
+        """Move nodes from another tree to this tree (append).
+
+        Moved nodes whose parent is not moved are attached to this root,
+        children which are not moved are attached to the old root (and renumbered).
+        This takes time linear in the number of nodes of the old tree.
+        """
         old_root = nodes[0].root
-        for node in nodes[1:]:
-            if node.root != old_root:
-                raise ValueError("steal_nodes(nodes) was called with nodes from several trees")
-        nodes = sorted(nodes, key=lambda n: n.ord)
-        whole_tree = nodes == old_root.descendants
-        new_ord = len(self._descendants)
+        moved = set(nodes)
         # pylint: disable=protected-access
+        nodes = [node for node in old_root._descendants if node in moved]
+        if len(nodes) != len(moved):
+            raise ValueError("steal_nodes(nodes) was called with nodes from several trees")
+        new_ord = len(self._descendants)
         for node in nodes:
             new_ord += 1
             node.ord = new_ord
-            if not whole_tree:
-                for child in [n for n in node.children if n not in nodes]:
-                    child._parent = old_root
-                    old_root._children = sorted(old_root.children + [child], key=lambda n: n.ord)
-                node._children = [n for n in node.children if n in nodes]
-            if node.parent == old_root or (not whole_tree and node.parent not in nodes):
-                node.parent._children = [n for n in node.parent._children if n != node]
+        if len(nodes) == len(old_root._descendants):
+            for node in old_root._children:
                 node._parent = self
-                self._children.append(node)
-        if whole_tree:
-            old_root._descendants = []
-            self._mwts += old_root.multiword_tokens
-            old_root.multiword_tokens = []
+            self._children += old_root._children
+            old_root._children, old_root._descendants = [], []
+            for mwt in old_root._mwts:
+                mwt.root = self
+            self._mwts += old_root._mwts
+            old_root._mwts = []
         else:
-            old_root._descendants = [n for n in old_root._descendants if n not in nodes]
-            mwt = node.multiword_token
+            remaining = [node for node in old_root._descendants if node not in moved]
             for node in nodes:
-                if mwt:
-                    words = [w for w in mwt.words if w in nodes]
-                    mwt.remove()
+                if node._parent not in moved:
+                    node._parent = self
+                    self._children.append(node)
+                node._children = [child for child in node._children if child in moved]
+            for new_ord, node in enumerate(remaining, 1):
+                node.ord = new_ord
+                if node._parent in moved:
+                    node._parent = old_root
+                node._children = [child for child in node._children if child not in moved]
+            old_root._children = [node for node in remaining if node._parent is old_root]
+            old_root._descendants = remaining
+            kept_mwts = []
+            for mwt in old_root._mwts:
+                words = [word for word in mwt.words if word in moved]
+                if len(words) == len(mwt.words):
+                    mwt.root = self
+                    self._mwts.append(mwt)
+                elif words:
+                    for word in mwt.words:
+                        word._mwt = None
                     self.create_multiword_token(words=words, form=mwt.form, misc=mwt.misc)
+                else:
+                    kept_mwts.append(mwt)
+            old_root._mwts = kept_mwts
         self._descendants += nodes
         # pylint: enable=protected-access
+
+
+_DEPS = attrgetter('_deps')
+_PARENT = itemgetter('parent')
+_DEPREL = itemgetter('deprel')
+
+
+class _EnhChildren(object):
+    """Enhanced children of all nodes in a tree (cached by `Root.enh_children_map`)."""
+    # pylint: disable=protected-access
+    __slots__ = ['root', 'children', '_nodes', '_deps', '_lengths', '_flat', '_parents',
+                 '_deprels', '_words', '_empty_nodes', '_deps_changes']
+
+    def __init__(self, root):
+        self.root = root
+        self._nodes = root._descendants + root.empty_nodes
+        if any(node._deps is None for node in self._nodes):
+            root.deserialize_deps()
+        self._deps = list(map(_DEPS, self._nodes))
+        self.children = {}
+        for node, deps in zip(self._nodes, self._deps):
+            for dep in deps:
+                self.children.setdefault(dep['parent'], []).append(
+                    {'child': node, 'deprel': dep['deprel']})
+
+        # Store what the map depends on (to be checked by is_valid).
+        # The lists of deps may be changed in place, so also their items are stored.
+        self._lengths = list(map(len, self._deps))
+        self._flat = list(chain.from_iterable(self._deps))
+        self._parents = list(map(_PARENT, self._flat))
+        self._deprels = list(map(_DEPREL, self._flat))
+        self._words, self._empty_nodes = root._descendants, root.empty_nodes
+        self._deps_changes = Node._deps_changes
+
+    def is_valid(self):
+        """Is this map still valid, i.e. no nodes were added or removed and no deps changed?
+
+        If no deps of any node were accessed since the last check and the lists of nodes
+        were not replaced nor extended, this takes constant time. Otherwise, object identities
+        are compared like in `udapi.core.textindex.TextIndex.is_valid`.
+        """
+        root = self.root
+        if (Node._deps_changes == self._deps_changes and root._descendants is self._words
+                and root.empty_nodes is self._empty_nodes
+                and len(self._words) + len(self._empty_nodes) == len(self._nodes)):
+            return True
+        nodes = root._descendants + root.empty_nodes
+        if len(nodes) != len(self._nodes) or not all(map(is_, nodes, self._nodes)):
+            return False
+        # Assigning `raw_deps` resets the deserialized deps to None.
+        deps = list(map(_DEPS, nodes))
+        if not all(map(is_, deps, self._deps)) or list(map(len, deps)) != self._lengths:
+            return False
+        flat = list(chain.from_iterable(deps))
+        if (all(map(is_, flat, self._flat))
+                and all(map(is_, map(_PARENT, flat), self._parents))
+                and all(map(is_, map(_DEPREL, flat), self._deprels))):
+            self._words, self._empty_nodes = root._descendants, root.empty_nodes
+            self._deps_changes = Node._deps_changes
+            return True
+        return False
@@ -1,9 +1,18 @@
 """Class Run parses a scenario and executes it."""
+import json
 import logging
+import os
+import time
 
+from udapi.core.basereader import parse_shard
+from udapi.core.block import Block
 from udapi.core.document import Document
+from udapi.core.memoize import Memoized
+from udapi.core.watchdog import Guarded, Watchdog
 from udapi.block.read.conllu import Conllu
 
+BRACES = ('{', '}')
+
 
 def _parse_block_name(block_name):
     """
@@ -36,9 +45,15 @@ def _parse_command_line_arguments(scenario):
     block_args = []
 
     number_of_blocks = 0
+    previous_token = None
     for token in scenario:
         logging.debug("Token %s", token)
 
+        # Braces delimit branches of the scenario, see `_build_chain`.
+        if token in BRACES:
+            previous_token = token
+            continue
+
         # If there is no '=' character in the token, consider is as a block name.
         # Initialize the block arguments to an empty dict.
         if '=' not in token:
@@ -46,6 +61,7 @@ def _parse_command_line_arguments(scenario):
             block_names.append(token)
             block_args.append({})
             number_of_blocks += 1
+            previous_token = token
             continue
 
         # Otherwise consider the token to be a block argument in the form
@@ -55,7 +71,7 @@ def _parse_command_line_arguments(scenario):
         # The first '=' in the token separates name from value.
         # The value may contain other '=' characters (e.g. in util.Eval node='node.form = "_"').
         attribute_name, attribute_value = token.split('=', 1)
-        if number_of_blocks == 0:
+        if number_of_blocks == 0 or previous_token in BRACES:
             raise RuntimeError(
                 'Block attribute pair %r without a prior block name', token)
 
@@ -97,17 +113,242 @@ def _import_blocks(block_names, block_args):
             raise
 
         # Run the imported module.
-        kwargs = block_args[block_id]  # pylint: disable=unused-variable
+        kwargs = dict(block_args[block_id])
+        memoize = kwargs.pop('memoize', None)
+        memoize_max_mb = int(kwargs.pop('memoize_max_mb', 1024))
         command = "b%s(**kwargs)" % block_id
         logging.debug("Trying to evaluate this: %s", command)
         new_block_instance = eval(command)  # pylint: disable=eval-used
+        if memoize:
+            new_block_instance = Memoized(new_block_instance, memoize, name=block_name,
+                                          params=kwargs, max_mb=memoize_max_mb)
         blocks.append(new_block_instance)
 
     return blocks
 
 
+class _FusedBlocks(Block):
+    """Several fusible blocks executed in a single traversal of each tree.
+
+    For each node, `process_node` of all the blocks is called in turn.
+    """
+
+    def __init__(self, blocks):
+        super().__init__()
+        self.blocks = blocks
+
+    def process_start(self):
+        for block in self.blocks:
+            block.process_start()
+
+    def process_end(self):
+        for block in self.blocks:
+            block.process_end()
+
+    def before_process_document(self, document):
+        for block in self.blocks:
+            block.before_process_document(document)
+
+    def after_process_document(self, document):
+        for block in self.blocks:
+            block.after_process_document(document)
+
+    def process_bundle(self, bundle):
+        for tree in bundle:
+            methods = [b.process_node for b in self.blocks if b._should_process_tree(tree)]
+            if len(methods) == 1:
+                for node in tree.descendants:
+                    methods[0](node)
+            elif methods:
+                for node in tree.descendants:
+                    for method in methods:
+                        method(node)
+
+
+def _is_fusible(block):
+    """Does the block declare `fusible` and implement just `process_node`?"""
+    if not block.fusible:
+        return False
+    block_class = block.__class__
+    return all(getattr(block_class, name) is getattr(Block, name) for name in
+               ('apply_on_document', 'process_document', 'process_bundle', 'process_tree'))
+
+
+def _fuse_blocks(blocks):
+    """Replace each run of consecutive fusible blocks with one `_FusedBlocks` instance."""
+    result, run = [], []
+    for block in blocks + [None]:
+        if block is not None and _is_fusible(block):
+            run.append(block)
+            continue
+        if len(run) > 1:
+            logging.debug('Fusing blocks %s', ' '.join(b.__class__.__name__ for b in run))
+            result.append(_FusedBlocks(run))
+        else:
+            result.extend(run)
+        run = []
+        if block is not None:
+            result.append(block)
+    return result
+
+
+class _Branches(Block):
+    """Branches ``{ ... } { ... }`` of a scenario, each applied on its own copy of the document.
+
+    `branches` is a list of chains of blocks. If `in_place` is set (no blocks follow
+    the branches in the scenario), the last branch is applied on the original document,
+    so e.g. a single branch at the end of the scenario costs nothing.
+    Branches consisting only of `read_only` blocks (e.g. writers) are applied on the original
+    document as well. Other branches get a full copy (`document.clone()`), which takes
+    time and memory linear in the size of the document.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.branches = []
+        self.in_place = False
+
+    def process_start(self):
+        for branch in self.branches:
+            for block in branch:
+                block.process_start()
+
+    def process_end(self):
+        for branch in self.branches:
+            for block in branch:
+                block.process_end()
+
+    def apply_on_document(self, document):
+        for number, branch in enumerate(self.branches, 1):
+            if (self.in_place and number == len(self.branches)) or _is_read_only(branch):
+                branch_document = document
+            else:
+                branch_document = document.clone()
+            for block in branch:
+                block.apply_on_document(branch_document)
+
+
+def _is_read_only(branch):
+    """Are all the blocks of the branch `read_only` (and do not delete empty trees)?"""
+    return all(block.read_only and block.if_empty_tree != 'delete' for block in branch)
+
+
+def _build_chain(scenario, blocks):
+    """Return the blocks to be applied on each document.
+
+    The blocks in branches ``{ ... } { ... }`` of the scenario are grouped into `_Branches`
+    (branches can be nested) and the fusible blocks are fused within each chain.
+
+    Args:
+    scenario: the list of tokens (block names, parameters and braces), as in `Run`
+    blocks: the blocks of the scenario (created by `_import_blocks`)
+    """
+    blocks = iter(blocks)
+    chains = [[]]
+    previous_token = None
+    for token in scenario:
+        if token == '{':
+            if previous_token != '}':
+                chains[-1].append(_Branches())
+            chains[-1][-1].branches.append([])
+            chains.append(chains[-1][-1].branches[-1])
+        elif token == '}':
+            if len(chains) == 1:
+                raise ValueError('Unmatched "}" in the scenario')
+            chains.pop()
+        elif '=' not in token:
+            block = next(blocks)
+            if len(chains) > 1 and hasattr(block, 'finished'):
+                raise ValueError('Reader %s cannot be used in a branch of the scenario'
+                                 % block.__class__.__name__)
+            chains[-1].append(block)
+        previous_token = token
+    if len(chains) > 1:
+        raise ValueError('Unmatched "{" in the scenario')
+    return _fuse_chain(chains[0])
+
+
+def _fuse_chain(chain):
+    """Fuse the blocks in the chain and (recursively) in its branches."""
+    for block in chain:
+        if isinstance(block, _Branches):
+            block.in_place = block is chain[-1]
+            block.branches = [_fuse_chain(branch) for branch in block.branches]
+    return _fuse_blocks(chain)
+
+
+def _block_description(block):
+    """Return the name of the block (or the blocks it consists of) for logging."""
+    if isinstance(block, _FusedBlocks):
+        return 'fused blocks ' + ' '.join(b.__class__.__name__ for b in block.blocks)
+    if isinstance(block, Guarded):
+        return 'guarded ' + _block_description(block.block)
+    if isinstance(block, _Branches):
+        return 'branches ' + ' '.join('{ %s }' % ' '.join(map(_block_description, branch))
+                                      for branch in block.branches)
+    return 'block ' + block.__class__.__name__
+
+
+def load_checkpoint(filename):
+    """Load a checkpoint saved by `Run.execute` (a dict with the scenario and block states)."""
+    with open(filename, encoding='utf-8') as checkpoint_file:
+        return json.load(checkpoint_file)
+
+
+def save_checkpoint(filename, checkpoint):
+    """Save the checkpoint atomically (a crash while saving keeps the previous checkpoint)."""
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w', encoding='utf-8') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(tmp_filename, filename)
+
+
+def merge_states(filenames):
+    """Merge the block states from checkpoints of a sharded run and print the statistics.
+
+    For example, after `udapy --shard i/N --checkpoint ck.i.json ... util.See eval.Conll18`
+    for i=1..N, `merge_states(['ck.1.json',...])` calls `merge_state` of each block
+    which supports merging (e.g. `util.See` and `eval.Conll18`) and then its `process_end`,
+    so the printed statistics are the same as after an unsharded run.
+    """
+    checkpoints = [load_checkpoint(filename) for filename in filenames]
+    scenario = checkpoints[0]['scenario']
+    if any(checkpoint['scenario'] != scenario for checkpoint in checkpoints):
+        raise ValueError('The checkpoints to be merged have different scenarios')
+    blocks = _import_blocks(*_parse_command_line_arguments(scenario))
+    for checkpoint in checkpoints:
+        states = checkpoint['states']
+        # The first state may belong to the default reader (added by Run if none specified).
+        if len(states) == len(blocks) + 1:
+            checkpoint['states'] = states[1:]
+    mergeable = [(i, block) for i, block in enumerate(blocks)
+                 if type(block).merge_state is not Block.merge_state]
+    for i, block in mergeable:
+        block.process_start()
+        for checkpoint in checkpoints:
+            block.merge_state(checkpoint['states'][i])
+        block.process_end()
+
+
 class Run(object):
-    """Processing unit that processes UD data; typically a sequence of blocks."""
+    """Processing unit that processes UD data; typically a sequence of blocks.
+
+    If `args.checkpoint` (or `args.resume`) is a filename, a checkpoint is saved there
+    after a document is processed (at most once per `args.checkpoint_interval` seconds).
+    It contains the scenario, the number of processed documents and the states of all blocks
+    (see `Block.get_state`), i.e. the position in the input files, the size of the output
+    and accumulated statistics. With `args.resume`, the scenario is taken from the checkpoint
+    (if not specified) and the processing continues after the last checkpointed document.
+
+    The scenario may contain branches, e.g.
+    ``read.Conllu files=in.conllu { ud.MarkBugs write.TextModeTreesHtml files=bugs.html }
+    { util.See node=... } write.Conllu files=out.conllu``. The input is read (and parsed) once
+    and each branch is applied on its own copy of each document (see `Document.clone`),
+    so the changes made in one branch are not seen in the other branches nor after them.
+
+    If `args.tree_timeout` or `args.max_tree_size` is set, the blocks are guarded
+    by a `udapi.core.watchdog.Watchdog` (see `args.on_violation` and `args.quarantine`).
+    """
 
     def __init__(self, args):
         """Initialization of the runner object.
@@ -116,6 +357,17 @@ class Run(object):
 
         """
         self.args = args
+        self.checkpoint = None
+        self.checkpoint_filename = getattr(args, 'checkpoint', None)
+        if getattr(args, 'resume', None):
+            self.checkpoint = load_checkpoint(args.resume)
+            if not args.scenario:
+                args.scenario = self.checkpoint['scenario']
+            elif args.scenario != self.checkpoint['scenario']:
+                raise ValueError('The scenario differs from the one in checkpoint %s'
+                                 % args.resume)
+            if self.checkpoint_filename is None:
+                self.checkpoint_filename = args.resume
         if not isinstance(args.scenario, list):
             raise TypeError(
                 'Expected scenario as list, obtained a %r', args.scenario)
@@ -143,19 +395,54 @@ class Run(object):
                 readers.append(block)
             except AttributeError:
                 pass
+        default_readers = []
         if not readers:
             logging.info('No reader specified, using read.Conllu')
             conllu_reader = Conllu()
-            readers = [conllu_reader]
+            readers = default_readers = [conllu_reader]
             blocks = readers + blocks
 
+        shard = getattr(self.args, 'shard', None)
+        if shard is None and self.checkpoint is not None:
+            shard = self.checkpoint.get('shard')
+        if shard is not None:
+            for reader in readers:
+                reader.shard = parse_shard(shard)
+
+        documents = 0
+        if self.checkpoint is not None:
+            documents = self.checkpoint['documents']
+            for block, state in zip(blocks, self.checkpoint['states']):
+                if state is not None:
+                    block.set_state(state)
+            logging.info('Resuming after %d documents', documents)
+
+        # The states are saved for the original blocks (in the order of the scenario).
+        all_blocks = list(blocks)
+        checkpoint_interval = getattr(self.args, 'checkpoint_interval', 0) or 0
+        last_checkpoint = time.time()
+
+        # Group the blocks in branches and execute consecutive fusible node-level blocks
+        # in one traversal of each tree.
+        blocks = default_readers + _build_chain(self.args.scenario,
+                                                blocks[len(default_readers):])
+
+        watchdog = None
+        if getattr(self.args, 'tree_timeout', None) or getattr(self.args, 'max_tree_size', None):
+            watchdog = Watchdog(self.args.tree_timeout, self.args.max_tree_size,
+                                getattr(self.args, 'on_violation', 'skip'),
+                                getattr(self.args, 'quarantine', 'quarantine.conllu'))
+            blocks = watchdog.guard(blocks)
+
         # Apply blocks on the data.
-        finished = False
+        finished = all(reader.finished for reader in readers)
         while not finished:
             document = Document()
             logging.info(" ---- ROUND ----")
+            if watchdog is not None:
+                watchdog.new_document()
             for block in blocks:
-                logging.info("Executing block " + block.__class__.__name__)
+                logging.info("Executing " + _block_description(block))
                 block.apply_on_document(document)
 
             finished = True
@@ -163,9 +450,20 @@ class Run(object):
             for reader in readers:
                 finished = finished and reader.finished
 
+            documents += 1
+            if self.checkpoint_filename is not None and (
+                    finished or time.time() - last_checkpoint >= checkpoint_interval):
+                save_checkpoint(self.checkpoint_filename, {
+                    'scenario': self.args.scenario, 'documents': documents, 'shard': shard,
+                    'states': [block.get_state() for block in all_blocks]})
+                last_checkpoint = time.time()
+                logging.info('Checkpoint saved after %d documents', documents)
+
         # 6. close blocks (process_end)
         for block in blocks:
             block.process_end()
+        if watchdog is not None:
+            watchdog.close()
 
     # TODO: better implementation, included Scen
     def scenario_string(self):
@@ -0,0 +1,340 @@
+"""Server keeps a scenario loaded and processes documents sent by clients.
+
+Starting `udapy` for each short input is expensive: Python must start, all the blocks
+must be imported and e.g. ``udpipe.Base`` loads a (multi-second) UDPipe model.
+`udapy --serve ADDRESS scenario` creates the blocks just once and then processes
+documents sent over a UNIX socket, a TCP socket or the stdin/stdout pair::
+
+  udapy --serve unix:/tmp/udapi.sock udpipe.En &
+  udapy --connect unix:/tmp/udapi.sock --input_format=text < in.txt > out.conllu
+  udapy --connect unix:/tmp/udapi.sock --status
+
+Supported addresses are ``unix:/path/to/socket``, ``tcp:host:port`` (or just ``host:port``)
+and ``-`` (stdin/stdout framing, i.e. the same protocol as over sockets).
+
+Protocol: each request starts with a header line, followed by a payload of the given length
+(in bytes, UTF-8 encoded). The response has the same structure::
+
+  PROCESS <input_format> <output_format> <length>\\n<payload>
+  STATUS\\n
+  OK <length>\\n<payload>
+  ERROR <length>\\n<message>
+
+Supported formats are ``conllu`` and ``text`` (one sentence per line).
+Reader and writer blocks must not be included in the scenario, the server reads and writes
+the documents itself. With ``workers=N`` (N > 1), the documents are processed in a pool
+of N worker processes forked from the server process after the scenario (incl. models)
+was loaded, so the models are shared copy-on-write. Each worker calls `process_end`
+of its blocks when it exits (after `Server.close`).
+"""
+import collections
+import concurrent.futures
+import io
+import json
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from udapi.core.basewriter import BaseWriter
+from udapi.core.document import Document
+from udapi.core.run import _parse_command_line_arguments, _import_blocks, _build_chain
+from udapi.block.read.sentences import Sentences as SentencesReader
+from udapi.block.write.sentences import Sentences as SentencesWriter
+
+FORMATS = ('conllu', 'text')
+
+
+def parse_address(address):
+    """Return a tuple (socket family, address) for the given address string.
+
+    >>> parse_address('unix:/tmp/udapi.sock')
+    (<AddressFamily.AF_UNIX: 1>, '/tmp/udapi.sock')
+    >>> parse_address('tcp:localhost:8080')
+    (<AddressFamily.AF_INET: 2>, ('localhost', 8080))
+    """
+    if address.startswith('unix:'):
+        return socket.AF_UNIX, address[5:]
+    if address.startswith('tcp:'):
+        address = address[4:]
+    host, sep, port = address.rpartition(':')
+    if not sep or not port.isdigit():
+        raise ValueError('Cannot parse address %r, expected unix:/path or tcp:host:port' % address)
+    return socket.AF_INET, (host or 'localhost', int(port))
+
+
+def read_message(rfile):
+    """Read one framed message from a binary file object.
+
+    Return a tuple (header fields, payload string) or None at the end of the stream.
+    """
+    header = rfile.readline()
+    if not header:
+        return None
+    fields = header.decode('utf-8').split()
+    if not fields:
+        raise ValueError('Empty header line')
+    payload = ''
+    if fields[0] in ('PROCESS', 'OK', 'ERROR'):
+        length = int(fields[-1])
+        data = rfile.read(length)
+        if len(data) != length:
+            raise IOError('Truncated message: expected %d bytes, got %d' % (length, len(data)))
+        payload = data.decode('utf-8')
+        fields = fields[:-1]
+    return fields, payload
+
+
+def write_message(wfile, fields, payload=None):
+    """Write one framed message to a binary file object."""
+    if payload is None:
+        wfile.write((' '.join(fields) + '\n').encode('utf-8'))
+    else:
+        data = payload.encode('utf-8')
+        wfile.write((' '.join(fields + [str(len(data))]) + '\n').encode('utf-8'))
+        wfile.write(data)
+    wfile.flush()
+
+
+class Scenario(object):
+    """A sequence of (already initialized) blocks applied on in-memory documents."""
+
+    def __init__(self, scenario):
+        """Import the blocks and call their `process_start`.
+
+        Args:
+        scenario: a list of block names and their parameters, as in `Run`.
+        """
+        block_names, block_args = _parse_command_line_arguments(scenario)
+        self.blocks = _import_blocks(block_names, block_args)
+        for block in self.blocks:
+            if hasattr(block, 'finished') or isinstance(block, BaseWriter):
+                raise ValueError('%s %s cannot be used in a server scenario'
+                                 % ('Reader' if hasattr(block, 'finished') else 'Writer',
+                                    block.__class__.__name__))
+        for block in self.blocks:
+            block.process_start()
+        self.blocks = _build_chain(scenario, self.blocks)
+
+    def process(self, data, input_format='conllu', output_format='conllu'):
+        """Process the input string `data` and return the output string."""
+        if input_format not in FORMATS or output_format not in FORMATS:
+            raise ValueError('Unsupported format %s->%s, use one of %s'
+                             % (input_format, output_format, FORMATS))
+        document = Document()
+        if input_format == 'conllu':
+            document.from_conllu_string(data)
+        else:
+            SentencesReader(filehandle=io.StringIO(data)).apply_on_document(document)
+
+        for block in self.blocks:
+            block.apply_on_document(document)
+
+        if output_format == 'conllu':
+            return document.to_conllu_string()
+        filehandle = io.StringIO()
+        SentencesWriter(filehandle=filehandle).apply_on_document(document)
+        return filehandle.getvalue()
+
+    def close(self):
+        """Call `process_end` of all the blocks."""
+        for block in self.blocks:
+            block.process_end()
+
+
+# The scenario of the current worker process (see `Server` with workers > 1).
+_WORKER_SCENARIO = None
+
+
+def _load_worker_scenario(scenario):
+    global _WORKER_SCENARIO  # pylint: disable=global-statement
+    # Forked workers inherit the scenario (incl. loaded models) created in the server process.
+    if _WORKER_SCENARIO is None:
+        _WORKER_SCENARIO = Scenario(scenario)
+
+
+def _init_worker(scenario):
+    _load_worker_scenario(scenario)
+    # Finalizers with an exitpriority are run when the worker process exits normally.
+    multiprocessing.util.Finalize(None, _WORKER_SCENARIO.close, exitpriority=10)
+
+
+def _process_in_worker(data, input_format, output_format):
+    return _WORKER_SCENARIO.process(data, input_format, output_format)
+
+
+class Server(object):
+    """Process documents sent by clients with one scenario loaded just once."""
+
+    def __init__(self, scenario, workers=1, max_latencies=10000):
+        """Create the scenario (or the pool of worker processes).
+
+        Args:
+        scenario: a list of block names and their parameters, as in `Run`.
+        workers: number of worker processes. Default=1 means processing in the server
+            process itself, one document at a time.
+        max_latencies: number of the most recent latencies used for computing percentiles.
+        """
+        self.workers = workers
+        self._scenario = None
+        self._pool = None
+        # The scenario lock serializes processing in the server process, the stats lock
+        # guards the counters, so that `status` does not wait for a running document.
+        self._scenario_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        if workers > 1:
+            # Create the scenario before forking, so its models are shared copy-on-write.
+            context = None
+            if 'fork' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('fork')
+                _load_worker_scenario(scenario)
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, mp_context=context,
+                initializer=_init_worker, initargs=(scenario,))
+        else:
+            self._scenario = Scenario(scenario)
+        self._latencies = collections.deque(maxlen=max_latencies)
+        self.requests, self.errors = 0, 0
+        self.start_time = time.time()
+
+    def process(self, data, input_format='conllu', output_format='conllu'):
+        """Process one document (string) and return the output string."""
+        start = time.time()
+        try:
+            if self._pool is not None:
+                future = self._pool.submit(_process_in_worker, data, input_format, output_format)
+                result = future.result()
+            else:
+                # Blocks are not thread-safe, so the documents must be processed one by one.
+                with self._scenario_lock:
+                    result = self._scenario.process(data, input_format, output_format)
+        except Exception:
+            with self._stats_lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._stats_lock:
+                self.requests += 1
+                self._latencies.append(time.time() - start)
+        return result
+
+    def status(self):
+        """Return a dict with the number of requests and latency percentiles (in seconds)."""
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            status = {'requests': self.requests, 'errors': self.errors,
+                      'workers': self.workers, 'uptime': time.time() - self.start_time}
+        for percentile in (50, 90, 99):
+            key = 'p%d' % percentile
+            if latencies:
+                status[key] = latencies[min(len(latencies) - 1,
+                                            len(latencies) * percentile // 100)]
+            else:
+                status[key] = None
+        return status
+
+    def handle(self, rfile, wfile):
+        """Serve all requests from a binary stream pair until the end of the input."""
+        while True:
+            try:
+                message = read_message(rfile)
+            except (ValueError, IOError) as exc:
+                write_message(wfile, ['ERROR'], str(exc))
+                return
+            if message is None:
+                return
+            fields, payload = message
+            if fields[0] == 'STATUS':
+                write_message(wfile, ['OK'], json.dumps(self.status(), sort_keys=True))
+            elif fields[0] == 'PROCESS' and len(fields) == 3:
+                try:
+                    result = self.process(payload, fields[1], fields[2])
+                except Exception as exc:  # pylint: disable=broad-except
+                    logging.exception('Error when processing a request')
+                    write_message(wfile, ['ERROR'], '%s: %s' % (exc.__class__.__name__, exc))
+                else:
+                    write_message(wfile, ['OK'], result)
+            else:
+                write_message(wfile, ['ERROR'], 'Unknown request %r' % ' '.join(fields))
+
+    def serve_forever(self, address):
+        """Serve requests on the given address (see `parse_address`) or `-` for stdin/stdout."""
+        if address == '-':
+            # Logging goes to stderr, but make sure no block prints to our stdout channel.
+            wfile = sys.stdout.buffer
+            sys.stdout = sys.stderr
+            try:
+                self.handle(sys.stdin.buffer, wfile)
+            finally:
+                sys.stdout = sys.__stdout__
+            return
+
+        family, sock_address = parse_address(address)
+        server = self
+
+        class _Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server.handle(self.rfile, self.wfile)
+
+        if family == socket.AF_UNIX:
+            if os.path.exists(sock_address):
+                os.unlink(sock_address)
+            socket_server = socketserver.ThreadingUnixStreamServer(sock_address, _Handler)
+        else:
+            socketserver.ThreadingTCPServer.allow_reuse_address = True
+            socket_server = socketserver.ThreadingTCPServer(sock_address, _Handler)
+        socket_server.daemon_threads = True
+        logging.info('Udapi server listening on %s', address)
+        try:
+            socket_server.serve_forever()
+        finally:
+            socket_server.server_close()
+            if family == socket.AF_UNIX and os.path.exists(sock_address):
+                os.unlink(sock_address)
+
+    def close(self):
+        """Shut down the worker processes or call `process_end` of the blocks."""
+        if self._pool is not None:
+            self._pool.shutdown()
+        else:
+            self._scenario.close()
+
+
+class Client(object):
+    """A thin client for `Server`, e.g. `Client('unix:/tmp/udapi.sock').process(text)`."""
+
+    def __init__(self, address):
+        family, sock_address = parse_address(address)
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.connect(sock_address)
+        self.rfile = self.socket.makefile('rb')
+        self.wfile = self.socket.makefile('wb')
+
+    def _request(self, fields, payload=None):
+        write_message(self.wfile, fields, payload)
+        message = read_message(self.rfile)
+        if message is None:
+            raise IOError('The server closed the connection')
+        fields, payload = message
+        if fields[0] != 'OK':
+            raise RuntimeError('Udapi server error: ' + payload)
+        return payload
+
+    def process(self, data, input_format='conllu', output_format='conllu'):
+        """Send a document (string) to the server and return the processed output string."""
+        return self._request(['PROCESS', input_format, output_format], data)
+
+    def status(self):
+        """Return the server status (number of requests, latency percentiles) as a dict."""
+        return json.loads(self._request(['STATUS']))
+
+    def close(self):
+        """Close the connection."""
+        self.rfile.close()
+        self.wfile.close()
+        self.socket.close()
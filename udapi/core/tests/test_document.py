@@ -1,5 +1,8 @@
 #!/usr/bin/env python3
 
+import copy
+import os
+import pickle
 import unittest
 from udapi.core.document import Document
 
@@ -15,6 +18,75 @@ class TestDocument(unittest.TestCase):
         for bundle in doc:
             print(bundle)
 
+    def test_remove(self):
+        doc = Document()
+        bundles = [doc.create_bundle() for _ in range(6)]
+        for bundle in bundles:
+            bundle.create_tree('a')
+            bundle.create_tree('b')
+        for bundle in doc.bundles:
+            if bundle.number % 2:
+                bundle.remove()
+            else:
+                bundle.trees[0].remove()
+        self.assertEqual(doc.bundles, bundles[1::2])
+        self.assertEqual([t.zone for b in doc for t in b], ['b', 'b', 'b'])
+        doc.bundles[0].trees[0].remove()
+        doc.bundles[0].create_tree('b')
+        self.assertEqual([t.zone for t in doc.bundles[0]], ['b'])
+
+    def test_pickle(self):
+        doc = Document()
+        doc.load_conllu(os.path.join(os.path.dirname(__file__), 'data', 'enh_deps.conllu'))
+        root = doc.create_bundle().create_tree()
+        node = root
+        for i in range(5000):  # deeper than the recursion limit
+            node = node.create_child(form='w%d' % i, deprel='dep')
+        root.descendants[0].misc['Len'] = 2
+        expected = doc.to_conllu_string()
+        for doc_copy in (pickle.loads(pickle.dumps(doc)), copy.deepcopy(doc)):
+            self.assertEqual(doc_copy.to_conllu_string(), expected)
+            self.assertIs(doc_copy.bundles[0].document(), doc_copy)
+            self.assertIs(doc_copy.bundles[-1].get_tree().descendants[-1].root.bundle,
+                          doc_copy.bundles[-1])
+            self.assertEqual(doc_copy.bundles[-1].get_tree().descendants[0].misc['Len'], 2)
+
+        # Closed-class values are stored once per document (so they are shared after unpickling).
+        doc = Document()
+        doc.load_conllu(os.path.join(os.path.dirname(__file__), 'data', 'UD_Czech_sample.conllu'))
+        doc_copy = pickle.loads(pickle.dumps(doc))
+        nouns = [node for bundle in doc_copy.bundles for node in bundle.get_tree().descendants
+                 if node.upos == 'NOUN']
+        self.assertNotEqual(nouns[0].root, nouns[-1].root)
+        self.assertIs(nouns[0].upos, nouns[-1].upos)
+        self.assertEqual(doc_copy.to_conllu_string(), doc.to_conllu_string())
+
+        tree = doc.bundles[0].get_tree()
+        tree_copy, node_copy = pickle.loads(pickle.dumps((tree, tree.descendants[2])))
+        self.assertIs(node_copy.root, tree_copy)
+        self.assertEqual(node_copy.ord, 3)
+        self.assertEqual(tree_copy.sent_id, tree.sent_id)
+
+    def test_clone(self):
+        doc = Document()
+        doc.load_conllu(os.path.join(os.path.dirname(__file__), 'data', 'enh_deps.conllu'))
+        doc.json['title'] = 'Test'
+        doc_copy = doc.clone()
+        self.assertEqual(doc_copy.to_conllu_string(), doc.to_conllu_string())
+        self.assertIs(doc_copy.bundles[0].document(), doc_copy)
+
+        bundle = doc.bundles[0]
+        gold = bundle.get_tree()
+        pred = bundle.add_tree(gold.clone(zone='pred'))
+        self.assertEqual(pred.sent_id, bundle.bundle_id + '/pred')
+        self.assertIs(pred.descendants[-1].root, pred)
+        pred.descendants[0].feats['Case'] = 'Voc'
+        pred.descendants[0].misc['Copy'] = 'Yes'
+        self.assertNotEqual(gold.descendants[0].feats['Case'], 'Voc')
+        self.assertEqual(gold.descendants[0].misc['Copy'], '')
+        doc_copy.json['title'] = 'Changed'
+        self.assertEqual(doc.json['title'], 'Test')
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Unit tests for udapi.core.memoize."""
+import os
+import tempfile
+import unittest
+
+from udapi.core.block import Block
+from udapi.core.document import Document
+from udapi.core.memoize import Memoized, Cache
+
+
+class CountingBlock(Block):
+    """Mark nodes with their form length, delete trees with the word "se"."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.trees = 0
+
+    def process_tree(self, tree):
+        self.trees += 1
+        for node in tree.descendants:
+            if node.form == 'se':
+                tree.bundle.remove()
+                return
+            node.misc['Len'] = len(node.form)
+
+
+class TestMemoize(unittest.TestCase):
+    """Unit tests for udapi.core.memoize."""
+
+    def test_memoized(self):
+        """Test that the cached outputs are replayed instead of processing the trees."""
+        data_filename = os.path.join(os.path.dirname(__file__), 'data', 'UD_Czech_sample.conllu')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = Cache(os.path.join(tmp_dir, 'test.cache'))
+            outputs = []
+            for _ in range(2):
+                doc = Document()
+                doc.load_conllu(data_filename)
+                block = CountingBlock()
+                memoized = Memoized(block, cache, params={'test': 1})
+                memoized.process_start()
+                memoized.apply_on_document(doc)
+                memoized.process_end()
+                outputs.append(doc.to_conllu_string())
+                trees = block.trees
+            cache.close()
+        self.assertEqual(trees, 0)
+        self.assertEqual(memoized.hits, 16)
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn('Len=', outputs[1])
+        self.assertLess(outputs[1].count('# sent_id'), 16)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,10 +10,21 @@ from udapi.core.root import Root
 from udapi.core.node import Node, find_minimal_common_treelet
 from udapi.core.document import Document
 from udapi.block.read.conllu import Conllu
+from udapi.block.util.dedup import Dedup
 
 logging.basicConfig(
     format='%(asctime)-15s [%(levelname)7s] %(funcName)s - %(message)s', level=logging.DEBUG)
 
+# "X A a B" and "X A B a" with `a` attached to `A` (i.e. the same topology, different word order)
+WORD_ORDER_PAIR = ('1\tX\tX\tNOUN\t_\t_\t0\troot\t_\t_\n'
+                   '2\tA\tA\tNOUN\t_\t_\t1\tnmod\t_\t_\n'
+                   '3\ta\ta\tADJ\t_\t_\t2\tamod\t_\t_\n'
+                   '4\tB\tB\tNOUN\t_\t_\t1\tnmod\t_\t_\n\n'
+                   '1\tX\tX\tNOUN\t_\t_\t0\troot\t_\t_\n'
+                   '2\tA\tA\tNOUN\t_\t_\t1\tnmod\t_\t_\n'
+                   '3\tB\tB\tNOUN\t_\t_\t1\tnmod\t_\t_\n'
+                   '4\ta\ta\tADJ\t_\t_\t2\tamod\t_\t_\n\n')
+
 
 class TestDocument(unittest.TestCase):
     """Unit tests for udapi.core.node."""
@@ -109,6 +120,23 @@ class TestDocument(unittest.TestCase):
             capture.truncate()
             root3.print_subtree(color=False, attributes='form', print_sent_id=0, print_text=0)
             self.assertEqual(capture.getvalue(), expected3)
+            capture.seek(0)
+            capture.truncate()
+            root4 = node = Root()
+            for _ in range(5000):  # deeper than the recursion limit
+                node = node.create_child(form='x')
+            root4.print_subtree(color=False, attributes='form', print_sent_id=0, print_text=0)
+            self.assertEqual(len(capture.getvalue().splitlines()), 5002)
+            capture.seek(0)
+            capture.truncate()
+            nodes[2].misc['Mark'] = 1
+            nodes[3].misc['Foo'] = 'Bar'
+            for mark, printed in (('^Mark', True), ('^Foo', True), ('^Bar', False)):
+                root3.print_subtree(color=False, attributes='form', print_sent_id=0,
+                                    print_text=0, marked_only=1, mark=mark)
+                self.assertEqual(bool(capture.getvalue()), printed, mark)
+                capture.seek(0)
+                capture.truncate()
         finally:
             sys.stdout = sys.__stdout__  # pylint: disable=redefined-variable-type
 
@@ -182,5 +210,210 @@ class TestDocument(unittest.TestCase):
 
         self.assertEqual(nodes[0].raw_deps, '2:test')
 
+    def test_empty_nodes_deps(self):
+        """Test enhanced dependencies with empty nodes and reverse (children) edges."""
+        doc = Document()
+        doc.from_conllu_string('1\tI\t_\t_\t_\t_\t2\tnsubj\t2:nsubj|2.1:nsubj\t_\n'
+                               '2\tlike\t_\t_\t_\t_\t0\troot\t0:root\t_\n'
+                               '2.1\tlike\t_\t_\t_\t_\t_\t_\t2:conj:and\t_\n'
+                               '3\ttea\t_\t_\t_\t_\t2\tobj\t2:obj\t_\n\n')
+        root = doc.bundles[0].get_tree()
+        nodes = root.descendants
+        empty = root.empty_nodes[0]
+        self.assertIs(nodes[0].deps[1]['parent'], empty)
+        self.assertIs(empty.deps[0]['parent'], nodes[1])
+        self.assertEqual(empty.deps[0]['deprel'], 'conj:and')
+        self.assertEqual(nodes[0].raw_deps, '2:nsubj|2.1:nsubj')
+        self.assertEqual(empty.raw_deps, '2:conj:and')
+        self.assertEqual([(e['child'].form, e['deprel']) for e in nodes[1].enh_children],
+                         [('I', 'nsubj'), ('tea', 'obj'), ('like', 'conj:and')])
+        self.assertEqual(root.enh_children_map()[empty][0]['child'], nodes[0])
+
+        # The map is cached, but changes of deps (even in place) are reflected.
+        self.assertIs(root.enh_children_map(), root.enh_children_map())
+        nodes[2].deps.append({'parent': nodes[0], 'deprel': 'dep'})
+        self.assertEqual([e['child'] for e in nodes[0].enh_children], [nodes[2]])
+        nodes[2].deps[-1]['deprel'] = 'acl'
+        self.assertEqual(nodes[0].enh_children[0]['deprel'], 'acl')
+        nodes[2].raw_deps = '2:obj'
+        self.assertEqual(nodes[0].enh_children, [])
+        self.assertEqual(nodes[2].deps[0]['parent'], nodes[1])
+        new_node = nodes[0].create_child(form='new', deprel='dep')
+        new_node.deps = [{'parent': nodes[0], 'deprel': 'dep'}]
+        self.assertEqual(nodes[0].enh_children, [{'child': new_node, 'deprel': 'dep'}])
+        new_node.remove()
+        self.assertEqual(nodes[0].enh_children, [])
+
+        new_empty = nodes[2].create_empty_child(form='x', deprel='dep')
+        new_empty.ord = '3.1'
+        self.assertEqual(new_empty.raw_deps, '3:dep')
+        self.assertIs(new_empty.root, root)
+        self.assertNotIn(new_empty, root.children)
+
+    def test_compile_attrs(self):
+        """Test precompiled (pseudo-)attribute accessors and get_attrs."""
+        doc = Document()
+        doc.load_conllu(os.path.join(os.path.dirname(__file__), 'data', 'enh_deps.conllu'))
+        root = doc.bundles[0].get_tree()
+        nodes = root.descendants
+        get_values = Node.compile_attrs(['form', 'p_upos', 'feats[Case]', 'misc[LId]', 'depth',
+                                         'dir', 'edge', 'c_form', 'l_form', 'r_form'], undefs='_')
+        self.assertEqual(get_values(nodes[3]),
+                         ['pro', 'NOUN', 'Acc', 'pro-1', '2', 'right', '2', 'i', 'proti', ':', 'i'])
+        self.assertEqual(get_values(nodes[0]),
+                         ['Slovenská', 'NOUN', 'Nom', '', '2', 'left', '-1', '<ROOT>', 'ústava'])
+        self.assertEqual(nodes[5].get_attrs(['form', 'r_form', 'children', 'siblings']),
+                         ['proti', '0', '1'])
+        self.assertEqual(nodes[2].get_attrs(['feats_split', 'p_feats_split', 'xpos']),
+                         ['_', 'Case=Nom', 'Gender=Fem', 'Negative=Pos', 'Number=Sing',
+                          'Z:-------------'])
+        self.assertEqual(nodes[4].get_attrs(['children', 'deps', 'lemma'], stringify=False)[0], 0)
+        nodes[4].lemma = None
+        self.assertEqual(nodes[4].get_attrs(['form', 'lemma']), ['i', None])
+        self.assertEqual(nodes[4].get_attrs(['form', 'lemma'], undefs=0), ['i', '0'])
+        self.assertEqual(nodes[4].get_attrs(['lemma'], undefs=0, stringify=False), [0])
+        self.assertIs(Node.compile_attrs(['form', 'p_upos']),
+                      Node.compile_attrs(('form', 'p_upos')))
+        with self.assertRaises(AttributeError):
+            nodes[0].get_attrs(['nonexistent'])
+
+    def test_fingerprint(self):
+        """Test subtree fingerprints."""
+        doc = Document()
+        doc.from_conllu_string('1\tJohn\tJohn\tPROPN\t_\t_\t2\tnsubj\t_\t_\n'
+                               '2\tsleeps\tsleep\tVERB\t_\t_\t0\troot\t_\t_\n\n'
+                               '1\tJohn\tJohn\tPROPN\t_\t_\t0\troot\t_\t_\n'
+                               '2\tsleeps\tsleep\tVERB\t_\t_\t1\tnsubj\t_\t_\n\n'
+                               '1\tYes\tyes\tINTJ\t_\t_\t3\tdiscourse\t_\t_\n'
+                               '2\tJohn\tJohn\tPROPN\t_\t_\t3\tnsubj\t_\t_\n'
+                               '3\tsleeps\tsleep\tVERB\t_\t_\t0\troot\t_\t_\n\n')
+        root1, root2, root3 = [bundle.get_tree() for bundle in doc]
+        self.assertEqual(len(root1.fingerprint()), 32)
+        self.assertNotEqual(root1.fingerprint(), root2.fingerprint())
+        self.assertNotEqual(root1.fingerprint(['form']), root2.fingerprint(['form']))
+
+        # The same subtree has the same fingerprint, no matter where in the sentence it is.
+        sleeps1, sleeps3 = root1.descendants[1], root3.descendants[2]
+        self.assertNotEqual(sleeps1.fingerprint(), sleeps3.fingerprint())
+        root3.descendants[0].remove()
+        self.assertEqual(sleeps1.fingerprint(), sleeps3.fingerprint())
+        self.assertEqual(root1.fingerprint(), root3.fingerprint())
+
+        old = root1.fingerprints()
+        root1.descendants[0].lemma = 'Johnny'
+        new = root1.fingerprints()
+        self.assertNotEqual(old[root1], new[root1])
+        self.assertEqual(root1.fingerprint(['form', 'upos']), root3.fingerprint(['form', 'upos']))
+
+        # The same topology with a different word order is not a duplicate.
+        doc = Document()
+        doc.from_conllu_string(WORD_ORDER_PAIR)
+        root1, root2 = [bundle.get_tree() for bundle in doc]
+        self.assertNotEqual(root1.fingerprint(), root2.fingerprint())
+        self.assertNotEqual(root1.descendants[1].fingerprint(), root2.descendants[1].fingerprint())
+        Dedup().apply_on_document(doc)
+        self.assertEqual(len(doc.bundles), 2)
+        doc = Document()
+        doc.from_conllu_string(WORD_ORDER_PAIR + WORD_ORDER_PAIR)
+        Dedup().apply_on_document(doc)
+        self.assertEqual(len(doc.bundles), 2)
+        root1 = doc.bundles[0].get_tree()
+
+        # Multi-word tokens are included in the fingerprint.
+        fingerprint = root1.fingerprint()
+        root1.create_multiword_token(root1.descendants[2:4], form='aB')
+        self.assertNotEqual(root1.fingerprint(), fingerprint)
+
+    def test_text_index(self):
+        """Test character offsets of tokens in root.text_index()."""
+        doc = Document()
+        doc.from_conllu_string('1-2\tdel\t_\t_\t_\t_\t_\t_\t_\t_\n'
+                               '1\tde\tde\tADP\t_\t_\t3\tcase\t_\t_\n'
+                               '2\tel\tel\tDET\t_\t_\t3\tdet\t_\t_\n'
+                               '3\tmundo\tmundo\tNOUN\t_\t_\t0\troot\t_\tSpaceAfter=No\n'
+                               '4\t.\t.\tPUNCT\t_\t_\t3\tpunct\t_\t_\n\n')
+        root = doc.bundles[0].get_tree()
+        nodes, mwt = root.descendants, root.multiword_tokens[0]
+        index = root.text_index()
+        self.assertEqual(index.text, 'del mundo.')
+        self.assertEqual(index.text, root.compute_text())
+        self.assertEqual(index.span(nodes[1]), (0, 3))
+        self.assertEqual(index.span(nodes[2]), (4, 9))
+        self.assertIs(index.token_at(1), mwt)
+        self.assertIs(index.token_at(9), nodes[3])
+        self.assertIsNone(index.token_at(3))
+        self.assertIs(root.text_index(), index)
+
+        # Any change of forms, SpaceAfter or the nodes themselves invalidates the index.
+        mwt.misc['SpaceAfter'] = 'No'
+        self.assertEqual(root.compute_text(), 'delmundo.')
+        del mwt.misc['SpaceAfter']
+        del nodes[2].misc['SpaceAfter']
+        nodes[3].form = '!'
+        self.assertEqual(root.text_index().text, 'del mundo !')
+        mwt.form = 'dell'
+        self.assertEqual(root.compute_text(), 'dell mundo !')
+        nodes[3].remove()
+        self.assertEqual(root.compute_text(), 'dell mundo')
+        self.assertEqual(root.text_index().span(nodes[2]), (5, 10))
+
+    def test_set_heads_and_steal_nodes(self):
+        """Test the bulk topology-editing methods root.set_heads() and root.steal_nodes()."""
+        doc = Document()
+        doc.from_conllu_string('1\tA\t_\t_\t_\t_\t2\tdep\t_\t_\n'
+                               '2\tB\t_\t_\t_\t_\t0\troot\t_\t_\n'
+                               '3-4\tCD\t_\t_\t_\t_\t_\t_\t_\t_\n'
+                               '3\tC\t_\t_\t_\t_\t2\tdep\t_\t_\n'
+                               '4\tD\t_\t_\t_\t_\t3\tdep\t_\t_\n'
+                               '5\tE\t_\t_\t_\t_\t4\tdep\t_\t_\n\n')
+        root = doc.bundles[0].get_tree()
+        a, b, c, d, e = root.descendants
+        root.set_heads({a: c, e: b, b: root})
+        self.assertEqual([n.parent for n in root.descendants], [c, root, b, c, b])
+        self.assertEqual(b.children, [c, e])
+        self.assertEqual(c.children, [a, d])
+        self.assertEqual(d.children, [])
+
+        with self.assertRaises(ValueError):
+            root.set_heads({b: d, e: a})
+        self.assertEqual([n.parent for n in root.descendants], [c, root, b, c, b])
+        with self.assertRaises(ValueError):
+            root.set_heads({a: Root()})
+
+        new_root = Root()
+        new_root.create_child(form='X')
+        new_root.steal_nodes([d, c, e])
+        self.assertEqual([n.form for n in new_root.descendants], ['X', 'C', 'D', 'E'])
+        self.assertEqual([n.ord for n in new_root.descendants], [1, 2, 3, 4])
+        self.assertEqual(new_root.children[1:], [c, e])
+        self.assertEqual(c.children, [d])
+        self.assertEqual(new_root.multiword_tokens[0].words, [c, d])
+        self.assertEqual(root.multiword_tokens, [])
+        self.assertEqual(root.descendants, [a, b])
+        self.assertEqual([a.ord, b.ord, a.parent], [1, 2, root])
+        self.assertEqual(root.children, [a, b])
+        self.assertEqual(b.children, [])
+
+        new_root.steal_nodes(root.descendants)
+        self.assertEqual(root.descendants, [])
+        self.assertEqual(new_root.compute_text(), 'X CD E A B')
+
+    def test_get_columns(self):
+        """Test root.get_columns(), which must be equivalent to node.get_attrs() for each node."""
+        doc = Document()
+        doc.load_conllu(os.path.join(os.path.dirname(__file__), 'data', 'UD_Czech_sample.conllu'))
+        attrs = ['form', 'dir', 'edge', 'depth', 'children', 'siblings', 'feats_split',
+                 'feats[Case]', 'misc[SpaceAfter]', 'p_lemma', 'p_depth', 'p_feats_split',
+                 'c_upos', 'c_feats_split', 'l_form', 'r_deprel', 'r_feats_split']
+        for root in [bundle.get_tree() for bundle in doc]:
+            nodes = root.descendants
+            for attr, (values, owners) in zip(attrs, root.get_columns(attrs, undefs='')):
+                if owners is None:
+                    owners = range(len(nodes))
+                expected = [(i, value) for i, node in enumerate(nodes)
+                            for value in node.get_attrs([attr], undefs='')]
+                self.assertEqual(list(zip(owners, values)), expected)
+
+
 if __name__ == "__main__":
     unittest.main()
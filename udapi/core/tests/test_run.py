@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""Unit tests for udapi.core.run."""
+import os
+import tempfile
+import unittest
+
+from udapi.core.document import Document
+from udapi.core.run import _fuse_blocks, _FusedBlocks, _build_chain, _Branches, _import_blocks, \
+    _parse_command_line_arguments
+from udapi.block.util.mark import Mark
+from udapi.block.util.eval import Eval
+from udapi.block.read.conllu import Conllu as ConlluReader
+from udapi.block.read.mergeshards import MergeShards
+from udapi.block.util.wc import Wc
+from udapi.block.util.resegmentgold import ResegmentGold
+from udapi.block.eval.conll18 import Conll18
+from udapi.block.ud.he.fixneg import FixNeg as HeFixNeg
+from udapi.block.ud.ro.fixneg import FixNeg as RoFixNeg
+
+
+class FusibleMark(Mark):
+    """util.Mark with conditions which read only the processed node, so it can be fused."""
+
+    fusible = True
+
+
+class Recorder(Wc):
+    """util.Wc which also records the processed documents."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.documents = []
+
+    def process_document(self, document):
+        self.documents.append(document)
+        super().process_document(document)
+
+
+class TestRun(unittest.TestCase):
+    """Unit tests for udapi.core.run."""
+
+    def test_fuse_blocks(self):
+        """Test that consecutive fusible blocks are executed in one traversal."""
+        blocks = [FusibleMark(node='node.upos == "NOUN"', mark='noun'),
+                  FusibleMark(node='node.upos == "ADP"', mark='adp', zones='en'),
+                  FusibleMark(node='node.upos == "X"', mark='x'),
+                  Eval(node='node.misc["Ord"] = node.ord'),
+                  FusibleMark(node='node.ord == 1', mark='first')]
+        fused = _fuse_blocks(blocks)
+        self.assertEqual(len(fused), 3)
+        self.assertIsInstance(fused[0], _FusedBlocks)
+        self.assertEqual(fused[0].blocks, blocks[:3])
+        self.assertIs(fused[2], blocks[4])
+
+        doc = Document()
+        data_filename = os.path.join(os.path.dirname(__file__), 'data', 'enh_deps.conllu')
+        doc.load_conllu(data_filename)
+        for block in fused:
+            block.apply_on_document(doc)
+        nodes = doc.bundles[0].get_tree().descendants
+        self.assertEqual([n.misc['Mark'] for n in nodes], ['first', 'noun', '', '', '', ''])
+        self.assertEqual(nodes[5].misc['Ord'], 6)
+
+        # util.Mark may read other nodes (e.g. marks set by the previous block on the parent),
+        # so it is not fusible.
+        doc = Document()
+        doc.load_conllu(os.path.join(os.path.dirname(__file__), 'data', 'UD_Czech_sample.conllu'))
+        blocks = [Mark(node='node.upos == "NOUN"', mark='noun'),
+                  Mark(node='node.parent.misc["Mark"] == "noun"', mark='kid')]
+        self.assertEqual(_fuse_blocks(blocks), blocks)
+        for block in _fuse_blocks(blocks):
+            block.apply_on_document(doc)
+        self.assertEqual(doc.bundles[0].get_tree().descendants[0].misc['Mark'], 'kid')
+
+    def test_fusible_blocks(self):
+        """Test that the shipped fusible blocks give the same output when fused."""
+        def load():
+            doc = Document()
+            root = doc.create_bundle().create_tree()
+            for form, upos, feats in (('ne', 'PRON', 'Case=Acc'), ('nu', 'PART', ''),
+                                      ('אינם', 'VERB', 'VerbType=Cop'), ('lo', 'ADV', '')):
+                root.create_child(form=form, upos=upos, feats=feats, deprel='neg', misc='ToDo=neg')
+            return doc
+
+        for block_class in (RoFixNeg, HeFixNeg):
+            blocks = [block_class(), FusibleMark(node='node.deprel == "advmod"', mark='adv')]
+            fused = _fuse_blocks(blocks)
+            self.assertEqual(len(fused), 1)
+            expected, doc = load(), load()
+            with self.assertLogs(level='WARNING'):
+                for block in blocks:
+                    block.apply_on_document(expected)
+                fused[0].apply_on_document(doc)
+            self.assertEqual(doc.to_conllu_string(), expected.to_conllu_string())
+
+    def test_reader_state(self):
+        """Test that a reader continues after the checkpointed position."""
+        data_filename = os.path.join(os.path.dirname(__file__), 'data', 'UD_Czech_sample.conllu')
+        reader = ConlluReader(files=data_filename, bundles_per_doc=5)
+        documents = []
+        while not reader.finished:
+            documents.append(Document())
+            reader.apply_on_document(documents[-1])
+            if len(documents) == 2:
+                state = reader.get_state()
+
+        resumed = ConlluReader(files=data_filename, bundles_per_doc=5)
+        resumed.set_state(state)
+        document = Document()
+        resumed.apply_on_document(document)
+        self.assertEqual(document.to_conllu_string(), documents[2].to_conllu_string())
+
+    def test_reader_budgets(self):
+        """Test splitting the input into documents by tokens_per_doc and max_doc_mb."""
+        data_filename = os.path.join(os.path.dirname(__file__), 'data', 'UD_Czech_sample.conllu')
+        for budget in ({'tokens_per_doc': 50}, {'max_doc_mb': 0.05}):
+            reader = ConlluReader(files=data_filename, **budget)
+            other_zone = ConlluReader(files=data_filename, zone='b', ignore_sent_id=True, **budget)
+            documents = []
+            while not reader.finished:
+                documents.append(Document())
+                reader.apply_on_document(documents[-1])
+                other_zone.apply_on_document(documents[-1])
+                for bundle in documents[-1].bundles:
+                    self.assertEqual(bundle.get_tree('b').compute_text(),
+                                     bundle.get_tree().compute_text())
+            self.assertTrue(other_zone.finished)
+            self.assertEqual(sum(len(doc.bundles) for doc in documents), 16)
+            self.assertGreater(len(documents), 3)
+            for doc in documents[:-1]:
+                trees = [bundle.get_tree() for bundle in doc.bundles]
+                tokens = [len(tree.descendants) for tree in trees]
+                self.assertTrue(reader.budget_reached(len(trees), sum(tokens)))
+                self.assertFalse(reader.budget_reached(len(trees) - 1, sum(tokens[:-1])))
+
+    def test_shards(self):
+        """Test sharding of the input, merging of the outputs and of the statistics."""
+        data_filename = os.path.join(os.path.dirname(__file__), 'data', 'UD_Czech_sample.conllu')
+        full = Document()
+        full.load_conllu(data_filename)
+        wc_states = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filenames = []
+            for shard in range(1, 4):
+                doc = Document()
+                ConlluReader(files=data_filename, shard='%d/3' % shard).apply_on_document(doc)
+                self.assertTrue(0 < len(doc.bundles) < len(full.bundles))
+                wc_block = Wc()
+                wc_block.apply_on_document(doc)
+                wc_states.append(wc_block.get_state())
+                filenames.append(os.path.join(tmp_dir, '%d.conllu' % shard))
+                with open(filenames[-1], 'w', encoding='utf-8') as shard_file:
+                    shard_file.write(doc.to_conllu_string())
+            merged = Document()
+            MergeShards(files=','.join(filenames)).apply_on_document(merged)
+        self.assertEqual(merged.to_conllu_string(), full.to_conllu_string())
+
+        wc_block = Wc()
+        for state in wc_states:
+            wc_block.merge_state(state)
+        self.assertEqual(wc_block.trees, len(full.bundles))
+
+    def test_multizone_eval(self):
+        """Test that evaluating more pred zones at once gives the same results as one by one."""
+        data_filename = os.path.join(os.path.dirname(__file__), 'data', 'UD_Czech_sample.conllu')
+
+        def evaluate(zones):
+            doc = Document()
+            ConlluReader(files=data_filename, zone='gold').apply_on_document(doc)
+            for zone in zones:
+                ConlluReader(files=data_filename, zone=zone, ignore_sent_id=True) \
+                    .apply_on_document(doc)
+                trees = [bundle.get_tree(zone) for bundle in doc.bundles]
+                if zone == 'pred_a':
+                    trees[0].steal_nodes(trees[1].descendants)
+                    trees[1].remove()
+                else:
+                    for tree in trees:
+                        tree.descendants[0].deprel = 'dep'
+            ResegmentGold().apply_on_document(doc)
+            block = Conll18(print_results=False)
+            block.apply_on_document(doc)
+            return block.zone_counts
+
+        both = evaluate(['pred_a', 'pred_b'])
+        self.assertEqual(list(both), ['pred_a', 'pred_b'])
+        self.assertEqual(both['pred_a'], evaluate(['pred_a'])['pred_a'])
+        self.assertEqual(both['pred_b'], evaluate(['pred_b'])['pred_b'])
+        self.assertLess(both['pred_b']['LAS'], both['pred_b']['Words'])
+
+    def test_branches(self):
+        """Test that each branch of a scenario processes its own copy of the document."""
+        scenario = ['util.Eval', 'node=node.misc["A"] = 1',
+                    '{', 'util.Eval', 'node=node.form = "x"', 'util.Wc', '}',
+                    '{', 'util.Mark', 'node=node.ord == 1', '{', 'util.Wc', '}', '}']
+        blocks = _import_blocks(*_parse_command_line_arguments(scenario))
+        self.assertEqual(len(blocks), 5)
+        chain = _build_chain(scenario, blocks)
+        self.assertEqual(len(chain), 2)
+        branches = chain[1]
+        self.assertIsInstance(branches, _Branches)
+        self.assertTrue(branches.in_place)
+        self.assertEqual(len(branches.branches), 2)
+        self.assertIsInstance(branches.branches[1][1], _Branches)
+
+        doc = Document()
+        doc.load_conllu(os.path.join(os.path.dirname(__file__), 'data', 'enh_deps.conllu'))
+        forms = [n.form for n in doc.bundles[0].get_tree().descendants]
+        for block in chain:
+            block.apply_on_document(doc)
+        nodes = doc.bundles[0].get_tree().descendants
+        self.assertEqual([n.form for n in nodes], forms)
+        self.assertEqual(nodes[0].misc['Mark'], 1)
+        self.assertEqual(nodes[0].misc['A'], 1)
+        self.assertEqual(blocks[2].words, blocks[4].words)
+
+        wc_blocks = [Wc(), Wc()]
+        with self.assertRaises(ValueError):
+            _build_chain(['{', 'util.Wc', 'util.Wc'], wc_blocks)
+        with self.assertRaises(ValueError):
+            _build_chain(['util.Wc', '}', 'util.Wc'], wc_blocks)
+        self.assertFalse(_build_chain(['{', 'util.Wc', '}', 'util.Wc'], wc_blocks)[0].in_place)
+
+        # Only the branches which may change the document get its copy.
+        blocks = [Recorder(), Eval(node='node.form = "x"'), Recorder(), Recorder()]
+        chain = _build_chain(['{', 'util.Wc', '}', '{', 'util.Eval', 'util.Wc', '}',
+                              'util.Wc'], blocks)
+        doc = Document()
+        doc.load_conllu(os.path.join(os.path.dirname(__file__), 'data', 'enh_deps.conllu'))
+        for block in chain:
+            block.apply_on_document(doc)
+        self.assertIs(blocks[0].documents[0], doc)
+        self.assertIsNot(blocks[2].documents[0], doc)
+        self.assertIs(blocks[3].documents[0], doc)
+        self.assertEqual(blocks[0].words, blocks[2].words)
+        self.assertNotEqual(doc.bundles[0].get_tree().descendants[0].form, 'x')
+
+
+if __name__ == "__main__":
+    unittest.main()
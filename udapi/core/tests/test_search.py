@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Unit tests for the util.Search and util.SearchIndex blocks."""
+import os
+import re
+import tempfile
+import unittest
+
+from udapi.core.document import Document
+from udapi.block.util.search import Search, compile_query
+from udapi.block.util.searchindex import SearchIndex
+
+DATA_FILENAME = os.path.join(os.path.dirname(__file__), 'data', 'UD_Czech_sample.conllu')
+
+
+def _load():
+    doc = Document()
+    doc.load_conllu(DATA_FILENAME)
+    return doc
+
+
+class RecordingSearch(Search):
+    """util.Search which records all the matches as lists of (sent_id, ord) pairs."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.found = []
+
+    def find(self, tree):
+        for match in super().find(tree):
+            self.found.append([(tree.address(), node.ord) for node in match])
+            yield match
+
+
+def _matches(query, doc=None, **kwargs):
+    """Return the matches of the query in the document (searched by `RecordingSearch`)."""
+    if doc is None:
+        doc = _load()
+    search = RecordingSearch(query=query, **kwargs)
+    search.process_start()
+    for bundle in doc.bundles:
+        search.process_tree(bundle.get_tree())
+    search.process_end()
+    return search.found
+
+
+def _brute_force(doc, condition):
+    """Return the pairs of nodes (as in `_matches`) satisfying condition(node, other)."""
+    result = []
+    for bundle in doc.bundles:
+        tree = bundle.get_tree()
+        for node in tree.descendants:
+            for other in tree.descendants:
+                if node is not other and condition(node, other):
+                    result.append([(tree.address(), node.ord), (tree.address(), other.ord)])
+    return result
+
+
+class TestSearch(unittest.TestCase):
+    """Unit tests for util.Search and util.SearchIndex."""
+
+    def test_compile_query(self):
+        """Test the query parser and its error messages."""
+        specs, relations = compile_query('[upos=VERB, lemma!~^b] >> [form="a, [b]" feats[Case]=Nom]'
+                                         ' < [deprel!=root]')
+        self.assertEqual(relations, ['>>', '<'])
+        self.assertEqual([[str(c) for c in spec.constraints] for spec in specs],
+                         [['upos=VERB', 'lemma!~^b'], ['form=a, [b]', 'feats[Case]=Nom'],
+                          ['deprel!=root']])
+        self.assertEqual(len(compile_query('[]')[0][0].constraints), 0)
+
+        for query, message in (('upos=VERB', 'Expected "["'),
+                                ('[upos=VERB', 'Missing "]"'),
+                                ('[upos]', 'Cannot parse constraint'),
+                                ('[upos=VERB] [upos=NOUN]', 'Expected a relation'),
+                                ('[upos=VERB] >', 'Expected "["')):
+            with self.assertRaisesRegex(ValueError, re.escape(message)):
+                compile_query(query)
+
+    def test_relations(self):
+        """Test each relation and negated constraints against a brute-force search."""
+        doc = _load()
+        for query, condition in (
+                ('[upos=NOUN] > [upos=ADJ]',
+                 lambda n, o: n.upos == 'NOUN' and o.upos == 'ADJ' and o.parent is n),
+                ('[upos=ADJ] < [upos=NOUN]',
+                 lambda n, o: n.upos == 'ADJ' and o.upos == 'NOUN' and n.parent is o),
+                ('[upos=VERB] >> [upos=ADP]',
+                 lambda n, o: n.upos == 'VERB' and o.upos == 'ADP' and o in n.descendants),
+                ('[upos=ADP] << [upos=VERB]',
+                 lambda n, o: n.upos == 'ADP' and o.upos == 'VERB' and n in o.descendants),
+                ('[upos!=NOUN deprel~^nmod] > [upos!~^(ADP|NOUN)$]',
+                 lambda n, o: n.upos != 'NOUN' and n.deprel.startswith('nmod')
+                 and o.upos not in ('ADP', 'NOUN') and o.parent is n)):
+            expected = _brute_force(doc, condition)
+            self.assertTrue(expected, query)
+            self.assertEqual(sorted(_matches(query, doc)), sorted(expected), query)
+
+        # The matches do not depend on the direction of the relations
+        # nor on the node specification the matching starts from.
+        chain = _matches('[upos=VERB] > [upos=NOUN] > [upos=ADJ]', doc)
+        self.assertTrue(chain)
+        self.assertEqual(sorted([list(reversed(m)) for m in chain]),
+                         sorted(_matches('[upos=ADJ] < [upos=NOUN] < [upos=VERB]', doc)))
+        self.assertEqual(Search(query='[upos=VERB] > [upos=NOUN] > [form!~^x]').anchor, 0)
+        self.assertEqual(Search(query='[upos=VERB] > [upos=NOUN feats[Case]=Gen] > [upos=ADJ]')
+                         .anchor, 1)
+        nodes = {(b.get_tree().address(), n.ord): n for b in doc.bundles
+                 for n in b.get_tree().descendants}
+        self.assertEqual([m for m in chain if nodes[m[1]].feats['Case'] == 'Gen'],
+                         _matches('[upos=VERB] > [upos=NOUN feats[Case]=Gen] > [upos=ADJ]', doc))
+
+    def test_index(self):
+        """Test that the index gives the same results and that a stale index is detected."""
+        queries = ('[upos=NOUN feats[Case]=Gen] > [upos=ADJ]', '[lemma=být] >> [upos=PUNCT]',
+                   '[upos=VERB] > [deprel!=punct]', '[form~"^[A-Z]"]')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index = os.path.join(tmp_dir, 'index.json')
+            indexer = SearchIndex(index=index)
+            indexer.apply_on_document(_load())
+            indexer.process_end()
+            for query in queries:
+                self.assertEqual(_matches(query, index=index), _matches(query), query)
+            pruned = Search(query=queries[0], index=index)
+            self.assertLess(len(pruned.candidate_trees), len(_load().bundles))
+            self.assertIsNone(Search(query=queries[-1], index=index).candidate_trees)
+
+            # Missing values are indexed as empty strings, just like util.Search sees them.
+            doc = _load()
+            doc.bundles[2].get_tree().descendants[1].lemma = None
+            indexer = SearchIndex(index=index)
+            indexer.apply_on_document(doc)
+            indexer.process_end()
+            self.assertEqual(len(_matches('[lemma=""]', doc)), 1)
+            self.assertEqual(_matches('[lemma=""]', doc, index=index), _matches('[lemma=""]', doc))
+
+            # Change the input: delete an indexed tree and add a new matching tree.
+            query = queries[0]
+            doc = _load()
+            doc.bundles[0].remove()
+            new_bundle = doc.create_bundle()
+            new_tree = new_bundle.create_tree()
+            new_tree.sent_id = 'new'
+            noun = new_tree.create_child(form='hory', lemma='hora', upos='NOUN', feats='Case=Gen')
+            noun.create_child(form='vysoké', lemma='vysoký', upos='ADJ')
+            with self.assertLogs(level='WARNING') as logs:
+                stale = _matches(query, doc, index=index)
+            self.assertIn('stale', logs.output[0])
+            self.assertEqual(stale, _matches(query, doc))
+            self.assertIn([('new', 1), ('new', 2)], stale)
+
+
+if __name__ == "__main__":
+    unittest.main()
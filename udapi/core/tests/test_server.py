@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""Unit tests for udapi.core.server."""
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from udapi.core.server import Scenario, Server, parse_address, read_message, write_message
+
+
+class TestServer(unittest.TestCase):
+    """Unit tests for udapi.core.server."""
+
+    def test_parse_address(self):
+        """Test parsing of unix and tcp addresses."""
+        self.assertEqual(parse_address('unix:/tmp/x.sock')[1], '/tmp/x.sock')
+        self.assertEqual(parse_address('tcp:localhost:8080')[1], ('localhost', 8080))
+        self.assertEqual(parse_address(':8080')[1], ('localhost', 8080))
+        with self.assertRaises(ValueError):
+            parse_address('localhost')
+
+    def test_handle(self):
+        """Test processing of framed requests including the status request."""
+        server = Server(['util.Eval', 'node=node.form = node.form.upper()'])
+        requests = io.BytesIO()
+        conllu = '1\tab\t_\t_\t_\t_\t0\troot\t_\t_\n\n'
+        write_message(requests, ['PROCESS', 'conllu', 'conllu'], conllu)
+        write_message(requests, ['PROCESS', 'xml', 'conllu'], conllu)
+        write_message(requests, ['STATUS'])
+        requests.seek(0)
+        responses = io.BytesIO()
+        server.handle(requests, responses)
+        server.close()
+
+        responses.seek(0)
+        fields, payload = read_message(responses)
+        self.assertEqual(fields, ['OK'])
+        self.assertIn('1\tAB\t_', payload)
+        fields, payload = read_message(responses)
+        self.assertEqual(fields, ['ERROR'])
+        fields, payload = read_message(responses)
+        status = json.loads(payload)
+        self.assertEqual((status['requests'], status['errors']), (2, 1))
+        self.assertIsNotNone(status['p50'])
+        self.assertIsNone(read_message(responses))
+
+    def test_scenario_blocks(self):
+        """Test that readers and writers are rejected."""
+        with self.assertRaisesRegex(ValueError, 'Reader'):
+            Scenario(['read.Conllu', 'util.Eval'])
+        with self.assertRaisesRegex(ValueError, 'Writer'):
+            Scenario(['util.Eval', 'write.Conllu'])
+
+    def test_status_while_processing(self):
+        """Test that the status does not wait for a document being processed."""
+        server = Server(['util.Eval', 'node=node.form = node.form.upper()'])
+        with server._scenario_lock:  # pylint: disable=protected-access
+            self.assertEqual(server.status()['requests'], 0)
+        server.close()
+
+    def test_workers_process_end(self):
+        """Test that each worker process calls process_end of its blocks on exit."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, 'ends.txt')
+            server = Server(['util.Eval', 'end=open(%r, "a").write("end\\n")' % filename],
+                            workers=2)
+            conllu = '1\tab\t_\t_\t_\t_\t0\troot\t_\t_\n\n'
+            for _ in range(4):
+                self.assertIn('1\tab\t', server.process(conllu))
+            server.close()
+            with open(filename) as ends:
+                self.assertEqual(ends.read(), 'end\n' * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
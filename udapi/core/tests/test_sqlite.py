@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Unit tests for read.Sqlite and write.Sqlite."""
+import os
+import tempfile
+import unittest
+
+from udapi.core.document import Document
+from udapi.block.read.sqlite import Sqlite as SqliteReader
+from udapi.block.write.sqlite import Sqlite as SqliteWriter
+
+
+class TestSqlite(unittest.TestCase):
+    """Unit tests for the SQLite corpus store."""
+
+    def test_partial_update(self):
+        """Test loading selected trees and rewriting only the changed ones."""
+        data_filename = os.path.join(os.path.dirname(__file__), 'data', 'UD_Czech_sample.conllu')
+        doc = Document()
+        doc.load_conllu(data_filename)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_filename = os.path.join(tmp_dir, 'corpus.db')
+            writer = SqliteWriter(files=db_filename)
+            writer.process_start()
+            writer.apply_on_document(doc)
+            writer.process_end()
+            self.assertEqual(writer.stats['inserted'], len(doc.bundles))
+
+            partial = Document()
+            reader = SqliteReader(files=db_filename, where="lemma='být' AND deprel='cop'")
+            reader.apply_on_document(partial)
+            self.assertTrue(0 < len(partial.bundles) < len(doc.bundles))
+            sent_id = partial.bundles[0].get_tree().sent_id
+            partial.bundles[0].get_tree().descendants[0].misc['Fixed'] = 'Yes'
+            writer = SqliteWriter(files=db_filename)
+            writer.process_start()
+            writer.apply_on_document(partial)
+            writer.process_end()
+            self.assertEqual(writer.stats['updated'], 1)
+            self.assertEqual(writer.stats['unchanged'], len(partial.bundles) - 1)
+
+            full = Document()
+            SqliteReader(files=db_filename).apply_on_document(full)
+            doc.bundles[[b.bundle_id for b in doc.bundles].index(sent_id)].get_tree() \
+                .descendants[0].misc['Fixed'] = 'Yes'
+            self.assertEqual(full.to_conllu_string(), doc.to_conllu_string())
+
+            selected = Document()
+            SqliteReader(files=db_filename, sent_id=sent_id).apply_on_document(selected)
+            self.assertEqual([b.bundle_id for b in selected.bundles], [sent_id])
+
+    def test_deletions(self):
+        """Test that removed trees and bundles are deleted and that zones keep their order."""
+        doc = Document()
+        for bundle_id in ('s1', 's2', 's3'):
+            bundle = doc.create_bundle()
+            bundle.bundle_id = bundle_id
+            for zone in ('en', 'cs', 'de'):
+                bundle.create_tree(zone).create_child(form=bundle_id + zone)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_filename = os.path.join(tmp_dir, 'corpus.db')
+
+            def write(document):
+                writer = SqliteWriter(files=db_filename)
+                writer.process_start()
+                writer.apply_on_document(document)
+                writer.process_end()
+                return writer.stats
+
+            def read(**kwargs):
+                document = Document()
+                SqliteReader(files=db_filename, **kwargs).apply_on_document(document)
+                return document
+
+            write(doc)
+            self.assertEqual(read().to_conllu_string(), doc.to_conllu_string())
+
+            # Rewriting the whole document deletes the trees and bundles not written.
+            doc.bundles[1].remove()
+            doc.bundles[0].get_tree('cs').remove()
+            self.assertEqual(write(doc)['deleted'], 4)
+            self.assertEqual(read().to_conllu_string(), doc.to_conllu_string())
+
+            # After a partial load, only the loaded trees may be deleted.
+            partial = read(sent_id='s3/en,s3/de')
+            partial.bundles[0].get_tree('en').remove()
+            self.assertEqual(write(partial)['deleted'], 1)
+            doc.bundles[1].get_tree('en').remove()
+            self.assertEqual(read().to_conllu_string(), doc.to_conllu_string())
+
+    def test_documents(self):
+        """Test that deleting a loaded tree does not affect other documents."""
+        data_filename = os.path.join(os.path.dirname(__file__), 'data', 'UD_Czech_sample.conllu')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_filename = os.path.join(tmp_dir, 'corpus.db')
+            for name in ('a', 'b'):
+                doc = Document()
+                doc.load_conllu(data_filename)
+                writer = SqliteWriter(files=db_filename, document=name)
+                writer.process_start()
+                writer.apply_on_document(doc)
+                writer.process_end()
+
+            # Numeric parameters are converted to ints by the scenario parser.
+            partial = Document()
+            SqliteReader(files=db_filename, document='a', sent_id=1).apply_on_document(partial)
+            self.assertEqual([b.bundle_id for b in partial.bundles], ['1'])
+            partial.bundles[0].remove()
+            writer = SqliteWriter(files=db_filename, document='a')
+            writer.process_start()
+            writer.apply_on_document(partial)
+            writer.process_end()
+            self.assertEqual(writer.stats['deleted'], 1)
+
+            for name, trees in (('a', len(doc.bundles) - 1), ('b', len(doc.bundles))):
+                selected = Document()
+                SqliteReader(files=db_filename, document=name).apply_on_document(selected)
+                self.assertEqual(len(selected.bundles), trees)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Unit tests for udapi.core.treediff and the util.Diff and util.Patch blocks."""
+import io
+import os
+import tempfile
+import time
+import unittest
+
+from udapi.core.document import Document
+from udapi.core.treediff import apply_edits, tree_edits
+from udapi.block.read.conllu import Conllu as ConlluReader
+from udapi.block.util.diff import Diff
+from udapi.block.util.patch import Patch
+
+DATA_FILENAME = os.path.join(os.path.dirname(__file__), 'data', 'UD_Czech_sample.conllu')
+
+
+def _load():
+    doc = Document()
+    doc.load_conllu(DATA_FILENAME)
+    return doc
+
+
+def _edit(doc):
+    """Make various changes in the trees of the document."""
+    trees = [bundle.get_tree() for bundle in doc.bundles]
+    nodes = trees[0].descendants
+    nodes[0].lemma = 'changed'
+    nodes[1].feats['Foo'] = 'Bar'
+    nodes[2].parent = trees[0].children[0]
+    nodes = trees[1].descendants
+    nodes[3].remove(children='rehang')
+    new_node = nodes[-1].create_child(form='new', upos='X', deprel='dep', misc='New=Yes')
+    new_node.shift_before_node(nodes[1])
+    trees[1].create_multiword_token(trees[1].descendants[-3:-1], form='mwt')
+    trees[2].text = 'A changed text.'
+    trees[2].descendants[0].raw_deps = '0:root'
+    trees[2].descendants[1].create_empty_child(deprel='nsubj', form='empty', lemma='empty',
+                                               upos='X', xpos='_').ord = '2.1'
+    doc.bundles[3].remove()
+
+
+class TestTreeDiff(unittest.TestCase):
+    """Unit tests for udapi.core.treediff."""
+
+    def test_tree_edits(self):
+        """Test that applying the edits on the base trees results in the new trees."""
+        base, new = _load(), _load()
+        _edit(new)
+        new_trees = [bundle.get_tree() for bundle in new.bundles]
+        base_trees = [bundle.get_tree() for bundle in base.bundles]
+        del base_trees[3]
+        self.assertEqual(tree_edits(base_trees[4], new_trees[4]), [])
+        self.assertEqual(tree_edits(base_trees[0], new_trees[0])[:2],
+                         ['~1\tlemma=changed', '~2\tfeats=Case=Nom|Foo=Bar|Gender=Fem|'
+                          'Negative=Pos|Number=Sing'])
+        for base_tree, new_tree in zip(base_trees, new_trees):
+            apply_edits(base_tree, tree_edits(base_tree, new_tree))
+            self.assertEqual(tree_edits(base_tree, new_tree), [])
+            self.assertEqual([n.parent.ord for n in base_tree.descendants],
+                             [n.parent.ord for n in new_tree.descendants])
+        base.bundles[3].remove()
+        self.assertEqual(base.to_conllu_string(), new.to_conllu_string())
+
+    def test_diff_patch(self):
+        """Test util.Diff and util.Patch including deleted and inserted trees."""
+        new = _load()
+        _edit(new)
+        new.bundles.insert(0, new.bundles.pop(2))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            new_filename = os.path.join(tmp_dir, 'new.conllu')
+            patch_filename = os.path.join(tmp_dir, 'new.patch')
+            with open(new_filename, 'w', encoding='utf-8') as new_file:
+                new_file.write(new.to_conllu_string())
+            doc = Document()
+            ConlluReader(files=DATA_FILENAME, zone='old').apply_on_document(doc)
+            ConlluReader(files=new_filename, zone='new').apply_on_document(doc)
+            patch = io.StringIO()
+            Diff(base_zone='old', filehandle=patch).apply_on_document(doc)
+            with open(patch_filename, 'w', encoding='utf-8') as patch_file:
+                patch_file.write(patch.getvalue())
+            self.assertEqual(patch.getvalue().count('\n@'), 4)
+
+            patched = _load()
+            Patch(patch=patch_filename).apply_on_document(patched)
+            self.assertEqual(patched.to_conllu_string(), _load_string(new_filename))
+
+    def test_diff_alignment(self):
+        """Test that trees with changed sentences are aligned, so the patch stays small."""
+        new = _load()
+        for bundle in new.bundles:
+            tree = bundle.get_tree()
+            tree.descendants[0].create_child(form='extra', lemma='extra', upos='X', xpos='X',
+                                             deprel='dep')
+        new.bundles[4].remove()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            new_filename = os.path.join(tmp_dir, 'new.conllu')
+            patch_filename = os.path.join(tmp_dir, 'new.patch')
+            with open(new_filename, 'w', encoding='utf-8') as new_file:
+                new_file.write(new.to_conllu_string())
+            # Without sent_ids, the trees are aligned by the similarity of their forms.
+            for ignore_sent_id in (False, True):
+                doc = Document()
+                ConlluReader(files=DATA_FILENAME, zone='old').apply_on_document(doc)
+                ConlluReader(files=new_filename, zone='new',
+                             ignore_sent_id=ignore_sent_id).apply_on_document(doc)
+                patch = io.StringIO()
+                Diff(base_zone='old', filehandle=patch).apply_on_document(doc)
+                with open(patch_filename, 'w', encoding='utf-8') as patch_file:
+                    patch_file.write(patch.getvalue())
+                hunks = patch.getvalue().split('\n\n')[:-1]
+                self.assertEqual(len(hunks), len(new.bundles) + 1)
+                self.assertNotIn('+', ''.join(hunk.split('\t')[0] for hunk in hunks))
+                self.assertLess(len(patch.getvalue()), os.path.getsize(DATA_FILENAME) / 4)
+
+                patched = _load()
+                Patch(patch=patch_filename).apply_on_document(patched)
+                self.assertEqual(patched.to_conllu_string(), _load_string(new_filename))
+
+    def test_diff_size(self):
+        """Test that aligning many changed trees without sent_ids takes linear time."""
+        sample = _load()
+        doc = Document()
+        for _ in range(250):
+            for sample_bundle in sample.bundles:
+                doc.create_bundle().add_tree(sample_bundle.get_tree().clone(zone='old'))
+        new_trees = []
+        for bundle in doc.bundles:
+            new_tree = bundle.add_tree(bundle.get_tree('old').clone(zone='new'))
+            new_tree.descendants[0].form += 'x'
+            new_trees.append(new_tree)
+        new_trees[100].remove()
+        new_trees[2000].remove()
+        start = time.time()
+        patch = io.StringIO()
+        Diff(base_zone='old', filehandle=patch).apply_on_document(doc)
+        self.assertLess(time.time() - start, 20)
+        headers = [line for line in patch.getvalue().split('\n') if line.startswith('@')]
+        self.assertEqual(len(headers), len(doc.bundles))
+        self.assertEqual([h for h in headers if h.endswith('-') or '-\t' in h],
+                         ['@101-\t101', '@2001-\t2001'])
+
+
+def _load_string(filename):
+    doc = Document()
+    doc.load_conllu(filename)
+    return doc.to_conllu_string()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Unit tests for udapi.tool.udpipe (with a stand-in model, no real UDPipe model needed)."""
+import os
+import tempfile
+import unittest
+
+try:
+    from udapi.tool.udpipe import UDPipe, ModelRegistry
+except ImportError:
+    UDPipe = None
+from udapi.core.document import Document
+
+
+class FakeTokenizer(object):
+    """Whitespace tokenizer with the interface of UDPipe tokenizers."""
+
+    def __init__(self):
+        self.words = []
+
+    def setText(self, text):  # pylint: disable=invalid-name
+        self.words = text.split()
+
+    def nextSentence(self, sentence):  # pylint: disable=invalid-name
+        if not self.words:
+            return False
+        for word in self.words:
+            sentence.addWord(word)
+        self.words = []
+        return True
+
+
+class FakeModel(object):
+    """Stand-in for ufal.udpipe.Model: lowercasing "tagger" and left-chain "parser"."""
+
+    def __init__(self):
+        self.calls = 0
+
+    @staticmethod
+    def newTokenizer(_):  # pylint: disable=invalid-name
+        return FakeTokenizer()
+
+    def tag(self, sentence, _options, _error):
+        self.calls += 1
+        for i in range(1, sentence.words.size()):
+            word = sentence.words[i]
+            word.lemma, word.upostag, word.xpostag = word.form.lower(), 'X', 'x'
+            word.feats = 'Fake=Yes'
+
+    def parse(self, sentence, _options, _error):
+        for i in range(1, sentence.words.size()):
+            word = sentence.words[i]
+            word.head, word.deprel = i - 1, 'root' if i == 1 else 'dep'
+
+
+@unittest.skipIf(UDPipe is None, 'ufal.udpipe is not installed')
+class TestUDPipe(unittest.TestCase):
+    """Unit tests for udapi.tool.udpipe."""
+
+    def test_tag_parse_trees(self):
+        """Test batched tagging and parsing of already tokenized trees."""
+        doc = Document()
+        doc.from_conllu_string('1\tA\t_\t_\t_\t_\t0\troot\t_\t_\n'
+                               '2\tB\t_\t_\t_\t_\t1\tdep\t_\t_\n'
+                               '3\tC\t_\t_\t_\t_\t1\tdep\t_\t_\n\n'
+                               '1\tD\t_\t_\t_\t_\t0\troot\t_\t_\n\n')
+        model = FakeModel()
+        tool = UDPipe(model='fake', tool=model)
+        roots = [bundle.get_tree() for bundle in doc]
+        tool.tag_parse_trees(roots)
+        self.assertEqual(model.calls, 2)
+        nodes = roots[0].descendants
+        self.assertEqual([n.lemma for n in nodes], ['a', 'b', 'c'])
+        self.assertEqual([n.parent.ord for n in nodes], [0, 1, 2])
+        self.assertEqual(nodes[2].deprel, 'dep')
+        self.assertEqual(nodes[1].children, [nodes[2]])
+        self.assertEqual(str(roots[1].descendants[0].feats), 'Fake=Yes')
+
+    def test_tokenize_tag_parse_trees(self):
+        """Test batched tokenization, tagging and parsing."""
+        doc = Document()
+        roots = []
+        for text in ('Hello world !', 'Hi'):
+            root = doc.create_bundle().create_tree()
+            root.text = text
+            roots.append(root)
+        tool = UDPipe(model='fake', tool=FakeModel())
+        tool.tokenize_tag_parse_trees(roots, parse=False)
+        self.assertEqual([n.form for n in roots[0].descendants], ['Hello', 'world', '!'])
+        self.assertEqual([n.ord for n in roots[0].descendants], [1, 2, 3])
+        self.assertEqual(len(roots[0].children), 3)
+        self.assertEqual(roots[1].descendants[0].lemma, 'hi')
+
+    def test_model_registry(self):
+        """Test sharing of loaded models and freeing unused ones."""
+        loaded = []
+
+        def loader(path):
+            loaded.append(path)
+            return FakeModel()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = []
+            for name in ('a', 'b'):
+                paths.append(os.path.join(tmp_dir, name + '.udpipe'))
+                with open(paths[-1], 'wb') as model_file:
+                    model_file.write(b'x' * 100)
+            registry = ModelRegistry(max_memory=150, loader=loader)
+            user1, user2 = UDPipe('a', FakeModel()), UDPipe('a', FakeModel())
+            model_a = registry.get(paths[0], user=user1)
+            self.assertIs(registry.get(paths[0], user=user2), model_a)
+            self.assertEqual(len(loaded), 1)
+
+            # Model "a" is still used, so it cannot be freed.
+            registry.get(paths[1])
+            self.assertEqual(registry.memory, 200)
+            del user1, user2
+            registry.get(paths[1])
+            self.assertEqual(registry.memory, 100)
+            registry.get(paths[0])
+            self.assertEqual(len(loaded), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Unit tests for udapi.core.watchdog."""
+import os
+import tempfile
+import unittest
+
+from udapi.core.block import Block
+from udapi.core.document import Document
+from udapi.core.watchdog import Guarded, Watchdog
+from udapi.block.util.wc import Wc
+from udapi.block.write.conllu import Conllu as ConlluWriter
+
+DATA_FILENAME = os.path.join(os.path.dirname(__file__), 'data', 'UD_Czech_sample.conllu')
+
+
+class SlowBlock(Block):
+    """Change all lemmas and get stuck in an infinite loop in the tree with sent_id=5."""
+
+    def process_tree(self, tree):
+        for node in tree.descendants:
+            node.lemma = 'changed'
+        while tree.sent_id == '5':
+            pass
+
+
+class TestWatchdog(unittest.TestCase):
+    """Unit tests for udapi.core.watchdog."""
+
+    def run_guarded(self, on_violation, quarantine=None):
+        doc = Document()
+        doc.load_conllu(DATA_FILENAME)
+        watchdog = Watchdog(tree_timeout=0.1, max_tree_size=40, on_violation=on_violation,
+                            quarantine=quarantine)
+        blocks = watchdog.guard([SlowBlock(), Wc(), ConlluWriter()])
+        self.assertIsInstance(blocks[0], Guarded)
+        self.assertIs(blocks[2].__class__, ConlluWriter)
+        watchdog.new_document()
+        with self.assertLogs(level='WARNING'):
+            for block in blocks[:2]:
+                block.apply_on_document(doc)
+            watchdog.close()
+        self.assertEqual(watchdog.violations, 3)
+        return doc
+
+    def test_watchdog(self):
+        """Test skipping, passing and quarantining of too big or too slow trees."""
+        doc = self.run_guarded('skip')
+        self.assertEqual(len(doc.bundles), 13)
+        self.assertFalse({'5', '7', '12'} & {b.bundle_id for b in doc.bundles})
+
+        doc = self.run_guarded('pass')
+        self.assertEqual(len(doc.bundles), 16)
+        lemmas = {b.bundle_id: {n.lemma for n in b.get_tree().descendants} for b in doc.bundles}
+        self.assertNotIn('changed', lemmas['5'] | lemmas['7'] | lemmas['12'])
+        self.assertEqual(lemmas['1'], {'changed'})
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            quarantine = os.path.join(tmp_dir, 'quarantine.conllu')
+            doc = self.run_guarded('quarantine', quarantine)
+            self.assertEqual(len(doc.bundles), 13)
+            quarantined = Document()
+            quarantined.load_conllu(quarantine)
+            self.assertEqual([b.bundle_id for b in quarantined.bundles], ['5', '7', '12'])
+            self.assertNotIn('changed', [n.lemma for b in quarantined.bundles
+                                         for n in b.get_tree().descendants])
+
+
+if __name__ == "__main__":
+    unittest.main()
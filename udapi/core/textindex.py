@@ -0,0 +1,127 @@
+"""TextIndex class maps characters of the (computed) text of a tree to its tokens."""
+
+# TextIndex is a "friend" class of Root and Node, so accessing their underlined attributes is OK.
+# pylint: disable=protected-access
+from operator import add, attrgetter, is_
+
+_FORM = attrgetter('form')
+_MISC = attrgetter('_misc')
+_MISC_STRING = attrgetter('_misc._string')
+_MWT = attrgetter('_mwt')
+
+
+class TextIndex(object):
+    """Character offsets of tokens in the text of a tree.
+
+    The text is computed from the forms of tokens (multi-word tokens and words which are not
+    part of any MWT) and their `SpaceAfter=No`, so `index.text == root.compute_text()`.
+    Use `root.text_index()` to get a cached instance, e.g.::
+
+      index = root.text_index()
+      start, end = index.span(node)  # node can be a word of a MWT, then the MWT's span is used
+      assert index.text[start:end] == node.form  # unless node is part of a MWT
+      token = index.token_at(start)  # a Node or MWT instance or None for spaces
+
+    Both queries take constant time.
+    """
+    __slots__ = ['root', 'text', 'tokens', '_forms_spaces', '_starts', '_ends', '_token_number',
+                 '_token_of_char', '_words', '_forms', '_miscs', '_word_mwts', '_mwts',
+                 '_mwt_forms', '_mwt_miscs']
+
+    def __init__(self, root):
+        self.root = root
+        self.tokens = root.token_descendants
+        forms = [token.form or '' for token in self.tokens]
+        spaces = ['' if token.misc['SpaceAfter'] == 'No' else ' ' for token in self.tokens]
+        self.text = ''.join(map(add, forms, spaces)).rstrip()
+        # The offsets are computed lazily, compute_text() needs just the text.
+        self._forms_spaces = (forms, spaces)
+        self._starts, self._ends, self._token_number, self._token_of_char = None, None, None, None
+
+        # Store what the index depends on (to be checked by is_valid).
+        # The forms and serialized MISCs are compared by identity (str() serializes the MISC,
+        # which is cached until the MISC is changed).
+        self._words = list(root._descendants)
+        self._forms = list(map(_FORM, self._words))
+        self._miscs = list(map(str, map(_MISC, self._words)))
+        self._word_mwts = list(map(_MWT, self._words))
+        self._mwts = list(root._mwts)
+        self._mwt_forms = list(map(_FORM, self._mwts))
+        self._mwt_miscs = list(map(str, map(_MISC, self._mwts)))
+
+    def is_valid(self):
+        """Is this index still valid, i.e. no words, forms, MISC or MWTs were changed?
+
+        The check is done by comparing object identities, so it is much faster than
+        building a new index.
+        """
+        root = self.root
+        words, mwts = root._descendants, root._mwts
+        if len(words) != len(self._words) or len(mwts) != len(self._mwts):
+            return False
+        return (all(map(is_, words, self._words))
+                and all(map(is_, map(_FORM, words), self._forms))
+                and all(map(is_, map(_MISC_STRING, words), self._miscs))
+                and all(map(is_, map(_MWT, words), self._word_mwts))
+                and all(map(is_, mwts, self._mwts))
+                and all(map(is_, map(_FORM, mwts), self._mwt_forms))
+                and all(map(is_, map(_MISC_STRING, mwts), self._mwt_miscs)))
+
+    def _compute_offsets(self):
+        forms, spaces = self._forms_spaces
+        starts, ends, offset = [], [], 0
+        for form, space in zip(forms, spaces):
+            starts.append(offset)
+            offset += len(form)
+            ends.append(offset)
+            offset += len(space)
+        self._starts, self._ends = starts, ends
+
+    @property
+    def starts(self):
+        """List of start character offsets of the tokens (`index.tokens`)."""
+        if self._starts is None:
+            self._compute_offsets()
+        return self._starts
+
+    @property
+    def ends(self):
+        """List of end character offsets (exclusive) of the tokens (`index.tokens`)."""
+        if self._ends is None:
+            self._compute_offsets()
+        return self._ends
+
+    def span(self, node):
+        """Return (start, end) character offsets of the token (or word of a MWT) in the text.
+
+        For words which are part of a multi-word token, the span of the whole MWT is returned.
+        """
+        if self._token_number is None:
+            self._token_number = dict(zip(self.tokens, range(len(self.tokens))))
+            for mwt in self.root._mwts:
+                for word in mwt.words:
+                    self._token_number[word] = self._token_number.get(mwt)
+        number = self._token_number[node]
+        return self.starts[number], self.ends[number]
+
+    def token_at(self, offset):
+        """Return the token (`Node` or `MWT`) covering the character at the given offset.
+
+        None is returned for spaces between tokens.
+        """
+        if self._token_of_char is None:
+            token_of_char = []
+            for token, start, end in zip(self.tokens, self.starts, self.ends):
+                token_of_char.extend([None] * (start - len(token_of_char)))
+                token_of_char.extend([token] * (end - start))
+            del token_of_char[len(self.text):]
+            self._token_of_char = token_of_char
+        return self._token_of_char[offset]
+
+    def char_tokens(self):
+        """Return a list with a token for each character where the token starts, else None."""
+        char_tokens = [None] * len(self.text)
+        for token, start in zip(self.tokens, self.starts):
+            if start < len(char_tokens):
+                char_tokens[start] = token
+        return char_tokens
@@ -0,0 +1,246 @@
+"""Compact line-oriented edit scripts (patches) between two versions of a tree.
+
+`tree_edits(base, new)` returns a list of lines which transform the `base` tree into the `new`
+tree when applied with `apply_edits(base, lines)`. Unchanged trees result in an empty list.
+The lines are similar to CoNLL-U lines (with tab-separated fields) prefixed with an operation::
+
+  #text "The new sentence."  # change a tree attribute (the value is JSON-encoded)
+  -5                         # delete the word with (base) ord 5
+  +4 form lemma upos xpos feats head deprel deps misc  # insert a word with (new) ord 4
+  ~7 head=4 deprel=obj       # change attributes of the word with (new) ord 7
+  -2-3                       # delete the multi-word token with (base) range 2-3
+  +2-3 form _ _ _ _ _ _ _ misc  # add a multi-word token with (new) range 2-3
+  -8.1                       # delete the empty node 8.1 of the base tree
+  +8.1 form lemma upos xpos feats _ _ deps misc  # add an empty node
+
+The words of the two trees are aligned by their forms (words with a changed form are aligned
+if they are in a replaced block of the same length), so e.g. changing a lemma results in one line.
+Heads are always given as ords in the new tree, enhanced deps as strings (as in CoNLL-U).
+"""
+import difflib
+import json
+
+from udapi.core.node import Node
+
+# Root and Node are "friend" classes of this module, so accessing their underlined attributes is OK.
+# pylint: disable=protected-access
+
+TREE_ATTRS = ('sent_id', 'text', 'comment', 'newpar', 'newdoc', 'json')
+COLUMNS = ('form', 'lemma', 'upos', 'xpos', 'feats', 'head', 'deprel', 'deps', 'misc')
+HEAD = COLUMNS.index('head')
+_NODE_VALUES = Node.compile_attrs(['form', 'lemma', 'upos', 'xpos', 'feats', 'deprel',
+                                   'raw_deps', 'misc'], undefs='_')
+
+
+def tree_attr(tree, name):
+    """Return the tree attribute `name` as compared in the edit scripts.
+
+    `sent_id` is returned without the "/zone" suffix, so trees in different zones can be compared.
+    A missing `text` is computed from the word forms (as it would be printed by `write.Conllu`).
+    """
+    if name == 'sent_id':
+        # Trees loaded with ignore_sent_id=1 get the sent_id of their bundle plus "/zone".
+        sent_id = tree.sent_id
+        if tree.zone and sent_id.endswith('/' + tree.zone):
+            sent_id = sent_id[:-len(tree.zone) - 1]
+        return sent_id
+    if name == 'text':
+        return tree.get_sentence()
+    return getattr(tree, name)
+
+
+def has_own_sent_id(tree):
+    """Was the sent_id of the tree loaded or set (not just computed from its bundle ID)?"""
+    if tree.bundle is None:
+        return tree._sent_id is not None
+    return tree.sent_id != tree.bundle.address() + ('/' + tree.zone if tree.zone else '')
+
+
+def _node_values(node, head):
+    """Return the CoNLL-U values (columns 2-10) of a node with the given head."""
+    values = _NODE_VALUES(node)
+    values.insert(HEAD, str(head))
+    return values
+
+
+def _empty_lines(tree):
+    """Return the CoNLL-U lines of the empty nodes (which have no head and deprel)."""
+    lines = []
+    for empty in tree.empty_nodes:
+        values = _node_values(empty, '_')
+        values[HEAD + 1] = '_'
+        lines.append('%s\t%s' % (empty.ord, '\t'.join(values)))
+    return lines
+
+
+def tree_edits(base, new):
+    """Return a list of lines (edit script) which transform the `base` tree into `new`."""
+    # pylint: disable=too-many-locals,too-many-branches
+    edits = []
+    for name in TREE_ATTRS:
+        if name == 'sent_id' and not has_own_sent_id(new):
+            continue
+        value = tree_attr(new, name)
+        if tree_attr(base, name) != value:
+            edits.append('#%s\t%s' % (name, json.dumps(value, ensure_ascii=False,
+                                                        sort_keys=True)))
+
+    base_nodes, new_nodes = base._descendants, new._descendants
+    pairs, deleted, inserted = [], [], []
+    base_forms, new_forms = [n.form for n in base_nodes], [n.form for n in new_nodes]
+    if base_forms == new_forms:
+        pairs = list(zip(base_nodes, new_nodes))
+    else:
+        matcher = difflib.SequenceMatcher(None, base_forms, new_forms, autojunk=False)
+        for tag, base_lo, base_hi, new_lo, new_hi in matcher.get_opcodes():
+            if tag == 'equal' or (tag == 'replace' and base_hi - base_lo == new_hi - new_lo):
+                pairs.extend(zip(base_nodes[base_lo:base_hi], new_nodes[new_lo:new_hi]))
+            else:
+                deleted.extend(base_nodes[base_lo:base_hi])
+                inserted.extend(new_nodes[new_lo:new_hi])
+    new_ord = {base: 0}
+    for base_node, new_node in pairs:
+        new_ord[base_node] = new_node.ord
+
+    base_mwts = {(tuple(new_ord.get(w) for w in mwt.words), mwt.form, str(mwt.misc)): mwt
+                 for mwt in base._mwts}
+    new_mwts = {(tuple(w.ord for w in mwt.words), mwt.form, str(mwt.misc)): mwt
+                for mwt in new._mwts}
+    for key, mwt in base_mwts.items():
+        if key not in new_mwts:
+            edits.append('-' + mwt.ord_range())
+    base_empty, new_empty = _empty_lines(base), _empty_lines(new)
+    if base_empty != new_empty:
+        edits.extend('-' + line.split('\t', 1)[0] for line in base_empty)
+    edits.extend('-%d' % node.ord for node in deleted)
+    edits.extend('+%d\t%s' % (node.ord, '\t'.join(_node_values(node, node._parent.ord)))
+                 for node in inserted)
+
+    for base_node, new_node in pairs:
+        base_values = _node_values(base_node, new_ord.get(base_node._parent))
+        new_values = _node_values(new_node, new_node._parent.ord)
+        if base_values != new_values:
+            edits.append('~%d\t%s' % (new_node.ord, '\t'.join(
+                '%s=%s' % (column, value) for column, base_value, value
+                in zip(COLUMNS, base_values, new_values) if base_value != value)))
+
+    for key, mwt in new_mwts.items():
+        if key not in base_mwts:
+            edits.append('+%s\t%s\t_\t_\t_\t_\t_\t_\t_\t%s'
+                         % (mwt.ord_range(), '_' if mwt.form is None else mwt.form, mwt.misc))
+    if base_empty != new_empty:
+        edits.extend('+' + line for line in new_empty)
+    return edits
+
+
+def apply_edits(root, edits):
+    """Apply the edit script (a list of lines returned by `tree_edits`) on the tree."""
+    # pylint: disable=too-many-locals,too-many-branches,too-many-statements
+    deleted, inserted, changes = set(), {}, {}
+    deleted_mwts, added_mwts, deleted_empty, added_empty = set(), [], set(), []
+    for line in edits:
+        operation, rest = line[0], line[1:]
+        if operation == '#':
+            name, value = rest.split('\t', 1)
+            if name not in TREE_ATTRS:
+                raise ValueError('Unknown tree attribute in patch line %r' % line)
+            setattr(root, name, json.loads(value))
+            continue
+        fields = rest.split('\t')
+        ident = fields[0]
+        if operation == '-':
+            if '-' in ident:
+                deleted_mwts.add(ident)
+            elif '.' in ident:
+                deleted_empty.add(ident)
+            else:
+                deleted.add(int(ident))
+        elif operation == '+':
+            if len(fields) != len(COLUMNS) + 1:
+                raise ValueError('Wrong number of columns in patch line %r' % line)
+            if '-' in ident:
+                added_mwts.append(fields)
+            elif '.' in ident:
+                added_empty.append(fields)
+            else:
+                inserted[int(ident)] = fields
+        elif operation == '~':
+            changes[int(ident)] = dict(field.split('=', 1) for field in fields[1:])
+        else:
+            raise ValueError('Unknown operation in patch line %r' % line)
+
+    if deleted_mwts:
+        mwts = [mwt for mwt in root._mwts if mwt.ord_range() in deleted_mwts]
+        if len(mwts) != len(deleted_mwts):
+            raise ValueError('%s: multi-word tokens to be deleted not found: %s'
+                             % (root.address(), sorted(deleted_mwts)))
+        for mwt in mwts:
+            mwt.remove()
+    if deleted_empty:
+        root.empty_nodes = [e for e in root.empty_nodes if str(e.ord) not in deleted_empty]
+
+    heads = {}
+    nodes = root._descendants
+    if deleted or inserted:
+        if any(ord_ < 1 or ord_ > len(nodes) for ord_ in deleted):
+            raise ValueError('%s: words to be deleted not found: %s'
+                             % (root.address(), sorted(deleted)))
+        # The enhanced deps refer to ords, which are going to change,
+        # so make sure the deps of the kept nodes are stored as strings (with the old ords).
+        for node in nodes + root.empty_nodes:
+            if node._deps is not None:
+                node.raw_deps = node.raw_deps
+        deleted_nodes = {node for node in nodes if node.ord in deleted}
+        kept = iter([node for node in nodes if node not in deleted_nodes])
+        new_nodes = []
+        for ord_ in range(1, len(nodes) - len(deleted) + len(inserted) + 1):
+            fields = inserted.get(ord_)
+            if fields is None:
+                node = next(kept, None)
+                if node is None:
+                    raise ValueError('%s: inserted words are not contiguous' % root.address())
+                if node._parent in deleted_nodes:
+                    if 'head' not in changes.get(ord_, {}):
+                        raise ValueError('%s: the parent of %s is deleted' % (root.address(), node))
+                else:
+                    heads[node] = node._parent
+            else:
+                node = Node(form=fields[1], lemma=fields[2], upos=fields[3], xpos=fields[4],
+                            feats=fields[5], deprel=fields[7], misc=fields[9])
+                node.raw_deps = fields[8]
+                changes.setdefault(ord_, {})['head'] = fields[6]
+            node.ord = ord_
+            new_nodes.append(node)
+        # Start with a flat tree (all nodes attached to the root), set_heads rebuilds the rest.
+        for node in nodes:
+            node._children = []
+        for node in new_nodes:
+            node._parent, node._children = root, []
+        root._children, root._descendants = list(new_nodes), new_nodes
+        nodes = new_nodes
+
+    for ord_, columns in changes.items():
+        node = nodes[ord_ - 1]
+        for column, value in columns.items():
+            if column == 'head':
+                heads[node] = nodes[int(value) - 1] if value != '0' else root
+            elif column == 'deps':
+                node.raw_deps = value
+            elif column in COLUMNS:
+                setattr(node, column, value)
+            else:
+                raise ValueError('Unknown column %s in patch of %s' % (column, node))
+    if heads:
+        root.set_heads(heads)
+
+    for fields in added_mwts:
+        range_start, range_end = fields[0].split('-')
+        root.create_multiword_token(nodes[int(range_start) - 1:int(range_end)],
+                                    form=fields[1], misc=fields[-1])
+    if added_mwts:
+        root._mwts.sort(key=lambda mwt: mwt.words[0].ord)
+    for fields in added_empty:
+        empty = root.create_empty_child(form=fields[1], lemma=fields[2], upos=fields[3],
+                                        xpos=fields[4], feats=fields[5], misc=fields[9])
+        empty.ord = fields[0]
+        empty.raw_deps = fields[8]
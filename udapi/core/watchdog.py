@@ -0,0 +1,211 @@
+"""Watchdog guarding a scenario against pathological trees (too big or too slow to process).
+
+A single pathological input (e.g. a 5000-word "sentence" from a badly segmented web page)
+can keep some blocks busy for hours. With ``udapy --tree_timeout SECONDS`` and/or
+``--max_tree_size N``, each block (except for readers, writers and blocks which process
+whole documents at once) processes the bundles one by one and if a bundle contains a tree
+with more than N words (incl. empty nodes) or a block spends more than SECONDS on it,
+the bundle violates the limits. Its sent_ids are logged and depending on ``--on_violation``:
+
+* ``skip`` (default): the bundle is deleted, so it is not processed nor written at all.
+* ``pass``: the bundle is restored to the state before the first guarded block
+  and passed to the writers without any further processing.
+* ``quarantine``: the bundle (in the state before the first guarded block) is saved
+  to a side file given by ``--quarantine`` (default=quarantine.conllu) and deleted,
+  so the side file contains minimal examples for debugging, similarly to `util.FindBug`.
+
+With ``--tree_timeout`` and ``pass`` or ``quarantine``, each bundle is copied before
+the first guarded block processes it, which makes the processing somewhat slower.
+
+For example::
+
+  udapy --tree_timeout 5 --max_tree_size 500 --on_violation quarantine -s \\
+    ud.FixPunct transform.Proj < in.conllu > out.conllu
+
+The timeout interrupts the block (with SIGALRM), so it works only on platforms with
+`signal.setitimer` when running in the main thread. Otherwise, the time is checked
+only after the block finishes processing the bundle. Code which does not return
+to the Python interpreter (e.g. a long call of a C extension) cannot be interrupted.
+"""
+import contextlib
+import logging
+import signal
+import threading
+import time
+
+from udapi.core.basewriter import BaseWriter
+from udapi.core.block import Block
+from udapi.block.write.conllu import Conllu as ConlluWriter
+
+ON_VIOLATION = ('skip', 'pass', 'quarantine')
+
+# pylint: disable=protected-access
+
+
+class TreeTimeout(BaseException):
+    """Raised when a block processes one bundle for too long.
+
+    It is not derived from `Exception`, so it is not caught by ``except Exception`` in blocks.
+    """
+
+
+def _alarm(signum, frame):  # pylint: disable=unused-argument
+    raise TreeTimeout()
+
+
+def _is_bundle_level(block):
+    """Does the block process the documents bundle by bundle (using `Block.process_document`)?"""
+    block_class = block.__class__
+    return all(getattr(block_class, name) is getattr(Block, name)
+               for name in ('apply_on_document', 'process_document'))
+
+
+class Watchdog(object):
+    """Limits of the tree size and processing time shared by all the guarded blocks of a scenario.
+
+    Args:
+    tree_timeout: maximum time (in seconds) a block may spend on one bundle
+    max_tree_size: maximum number of words (incl. empty nodes) in each tree
+    on_violation: what to do with the violating bundles: skip, pass or quarantine
+    quarantine: a file where the violating bundles are saved (with on_violation=quarantine)
+    """
+
+    def __init__(self, tree_timeout=None, max_tree_size=None, on_violation='skip',
+                 quarantine='quarantine.conllu'):
+        if on_violation not in ON_VIOLATION:
+            raise ValueError('on_violation=%s is not valid, use one of %s'
+                             % (on_violation, ON_VIOLATION))
+        self.tree_timeout = tree_timeout
+        self.max_tree_size = max_tree_size
+        self.on_violation = on_violation
+        self.violations = 0
+        self._snapshots = {}
+        self._passed = set()
+        self._quarantine = None
+        if on_violation == 'quarantine':
+            self._quarantine = open(quarantine, 'w', encoding='utf-8')
+        self._writer = ConlluWriter()
+        self._interrupt = bool(tree_timeout) and hasattr(signal, 'setitimer') \
+            and threading.current_thread() is threading.main_thread()
+        if self._interrupt:
+            self._old_handler = signal.signal(signal.SIGALRM, _alarm)
+
+    def guard(self, blocks):
+        """Return the blocks (e.g. a scenario) with the guarded blocks wrapped in `Guarded`."""
+        result = []
+        for block in blocks:
+            branches = getattr(block, 'branches', None)
+            if branches is not None:
+                block.branches = [self.guard(branch) for branch in branches]
+            elif not hasattr(block, 'finished') and not isinstance(block, BaseWriter) \
+                    and _is_bundle_level(block):
+                block = Guarded(block, self)
+            result.append(block)
+        return result
+
+    def new_document(self):
+        """Forget the snapshots and passed bundles of the previous document."""
+        self._snapshots, self._passed = {}, set()
+
+    def too_big(self, bundle):
+        """Return the size of the biggest tree in the bundle if it exceeds `max_tree_size`."""
+        if not self.max_tree_size:
+            return None
+        size = max([len(tree._descendants) + len(tree.empty_nodes) for tree in bundle.trees]
+                   or [0])
+        return size if size > self.max_tree_size else None
+
+    def snapshot(self, bundle):
+        """Save a copy of the bundle before it is processed by the first guarded block."""
+        if self.on_violation != 'skip' and self.tree_timeout \
+                and bundle.bundle_id not in self._snapshots:
+            self._snapshots[bundle.bundle_id] = bundle.clone()
+
+    def is_passed(self, bundle):
+        """Was the bundle passed through (so that it should not be processed anymore)?"""
+        return bundle.bundle_id in self._passed
+
+    def violation(self, bundle, block, reason):
+        """Log the violating bundle and skip, pass or quarantine it."""
+        self.violations += 1
+        logging.warning('Watchdog: %s in %s (sent_id=%s), %s', reason,
+                        block.__class__.__name__, ','.join(t.sent_id for t in bundle.trees),
+                        self.on_violation)
+        snapshot = self._snapshots.get(bundle.bundle_id)
+        if snapshot is not None:
+            bundle.trees = []
+            for tree in snapshot.trees:
+                bundle.add_tree(tree)
+        if self.on_violation == 'pass':
+            self._passed.add(bundle.bundle_id)
+            return
+        if self.on_violation == 'quarantine':
+            with contextlib.redirect_stdout(self._quarantine):
+                for tree in bundle.trees:
+                    self._writer.process_tree(tree)
+        bundle.remove()
+
+    def close(self):
+        """Close the quarantine file, restore the signal handler and log the violations."""
+        if self._quarantine is not None:
+            self._quarantine.close()
+        if self._interrupt:
+            signal.signal(signal.SIGALRM, self._old_handler)
+        if self.violations:
+            logging.warning('Watchdog: %d bundles violated the limits', self.violations)
+
+
+class Guarded(Block):
+    """A wrapper of a block which processes the bundles one by one within the watchdog limits."""
+
+    def __init__(self, block, watchdog):
+        super().__init__()
+        self.block = block
+        self.watchdog = watchdog
+
+    def process_start(self):
+        self.block.process_start()
+
+    def process_end(self):
+        self.block.process_end()
+
+    def get_state(self):
+        return self.block.get_state()
+
+    def set_state(self, state):
+        self.block.set_state(state)
+
+    def merge_state(self, state):
+        self.block.merge_state(state)
+
+    def before_process_document(self, document):
+        self.block.before_process_document(document)
+
+    def after_process_document(self, document):
+        self.block.after_process_document(document)
+
+    def process_document(self, document):
+        watchdog, block = self.watchdog, self.block
+        timeout = watchdog.tree_timeout
+        interrupt = watchdog._interrupt
+        for bundle in list(document.bundles):
+            if watchdog.is_passed(bundle):
+                continue
+            size = watchdog.too_big(bundle)
+            if size is not None:
+                watchdog.violation(bundle, block, '%d words' % size)
+                continue
+            watchdog.snapshot(bundle)
+            start = time.time()
+            try:
+                if interrupt:
+                    signal.setitimer(signal.ITIMER_REAL, timeout)
+                block.process_bundle(bundle)
+            except TreeTimeout:
+                watchdog.violation(bundle, block, 'timeout %gs' % timeout)
+                continue
+            finally:
+                if interrupt:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+            if timeout and time.time() - start > timeout:
+                watchdog.violation(bundle, block, 'timeout %gs' % timeout)
@@ -1,57 +1,187 @@
 """Wrapper for UDPipe (more pythonic than ufal.udpipe)."""
-import io
+import collections
+import logging
+import os
+import threading
+import weakref
 
-from ufal.udpipe import Model, Pipeline, ProcessingError, Sentence  # pylint: disable=no-name-in-module
+from ufal.udpipe import Model, ProcessingError, Sentence  # pylint: disable=no-name-in-module
 from udapi.core.resource import require_file
-from udapi.block.read.conllu import Conllu as ConlluReader
+from udapi.core.node import Node
+
+# Root and Node are "friend" classes of this wrapper, which fills trees in bulk
+# (without the per-node cycle checks of the parent setter).
+# pylint: disable=protected-access
+
+
+class ModelRegistry(object):
+    """Process-wide registry of loaded UDPipe models, shared by all `UDPipe` instances.
+
+    Models are keyed by their (absolute) path, so e.g. two blocks `udpipe.En` use one model.
+    Models loaded before forking (e.g. in `process_start`) are shared by the child processes
+    copy-on-write. If `max_memory` (in bytes, estimated from the model file sizes) is exceeded,
+    the least recently used models which are not used by any `UDPipe` instance are freed.
+    The default `max_memory` is taken from the environment variable UDAPI_MODEL_MEMORY
+    (in MB), 0 or missing means no limit.
+    """
+
+    def __init__(self, max_memory=None, loader=None):
+        if max_memory is None:
+            max_memory = int(os.environ.get('UDAPI_MODEL_MEMORY', 0)) * 1024 * 1024
+        self.max_memory = max_memory
+        self._loader = loader if loader is not None else Model.load
+        self._paths = {}
+        self._models = collections.OrderedDict()
+        self._users = {}
+        self._lock = threading.RLock()
+
+    @property
+    def memory(self):
+        """Estimated memory (in bytes) occupied by the loaded models."""
+        return sum(size for _, size in self._models.values())
+
+    def resolve(self, model):
+        """Return the absolute path of the given model (downloading it if needed)."""
+        path = self._paths.get(model)
+        if path is None:
+            path = require_file(model)
+            self._paths[model] = path
+        return path
+
+    def get(self, model, user=None):
+        """Return the loaded model, load it only if not loaded yet.
+
+        Args:
+        model: path to the model (see `udapi.core.resource.require_file`)
+        user: the object which will use the model (it is referenced weakly),
+            models with no live users can be freed when `max_memory` is exceeded.
+        """
+        with self._lock:
+            path = self.resolve(model)
+            if path in self._models:
+                self._models.move_to_end(path)
+            else:
+                tool = self._loader(path)
+                if not tool:
+                    raise IOError("Cannot load model from file '%s'" % path)
+                self._models[path] = (tool, os.path.getsize(path))
+                self._users[path] = weakref.WeakSet()
+            if user is not None:
+                self._users[path].add(user)
+            self.release_unused(keep=path)
+            return self._models[path][0]
+
+    def preload(self, models):
+        """Load the given models, e.g. before forking worker processes."""
+        for model in models:
+            self.get(model)
+
+    def release_unused(self, keep=None):
+        """Free the least recently used models with no users until `max_memory` is met."""
+        with self._lock:
+            if not self.max_memory:
+                return
+            for path in list(self._models):
+                if self.memory <= self.max_memory:
+                    break
+                if path != keep and not self._users[path]:
+                    logging.info('Freeing UDPipe model %s', path)
+                    del self._models[path]
+                    del self._users[path]
+
+
+MODELS = ModelRegistry()
 
 
 class UDPipe:
     """Wrapper for UDPipe (more pythonic than ufal.udpipe)."""
 
-    def __init__(self, model):
-        """Create the UDPipe tool object."""
+    def __init__(self, model, tool=None):
+        """Create the UDPipe tool object.
+
+        Args:
+        model: path to the model (see `udapi.core.resource.require_file`)
+        tool: an already loaded model to be used instead of loading `model`,
+            i.e. an object with the interface of `ufal.udpipe.Model`
+            (methods `tag`, `parse` and `newTokenizer`).
+            By default, the model is taken from (or loaded into) the shared registry `MODELS`.
+        """
         self.model = model
-        path = require_file(model)
-        self.tool = Model.load(path)
-        if not self.tool:
-            raise IOError("Cannot load model from file '%s'" % path)
+        if tool is None:
+            tool = MODELS.get(model, user=self)
+        self.tool = tool
         self.error = ProcessingError()
-        self.conllu_reader = ConlluReader()
-        self.tokenizer = self.tool.newTokenizer(Model.DEFAULT)
+        self._tokenizer = None
 
-    def tag_parse_tree(self, root):
-        """Tag (+lemmatize, fill FEATS) and parse a tree (already tokenized)."""
-        descendants = root.descendants
-        if not descendants:
-            return
-        pipeline = Pipeline(self.tool, 'horizontal', Pipeline.DEFAULT, Pipeline.DEFAULT, 'conllu')
-        in_data = " ".join([n.form for n in descendants])
-        out_data = pipeline.process(in_data, self.error)
+    @property
+    def tokenizer(self):
+        """Return the UDPipe tokenizer, created lazily."""
+        if self._tokenizer is None:
+            self._tokenizer = self.tool.newTokenizer(Model.DEFAULT)
+        return self._tokenizer
+
+    def _check_error(self):
         if self.error.occurred():
             raise IOError("UDPipe error " + self.error.message)
-        self.conllu_reader.files.filehandle = io.StringIO(out_data)
-        parsed_root = self.conllu_reader.read_tree()
-        nodes = [root] + descendants
-        for parsed_node in parsed_root.descendants:
-            node = nodes[parsed_node.ord]
-            node.parent = nodes[parsed_node.parent.ord]
-            for attr in 'upos xpos lemma feats'.split():
-                setattr(node, attr, getattr(parsed_node, attr))
-
-        # TODO: benchmark which solution is the fastest one. E.g. we could also do
-        # for node, parsed_node in zip(root.descendants, parsed_root.descendants):
-        #    parsed_node.misc = node.misc
-        # pylint: disable=protected-access
-        #root._children, root._descendants = parsed_root._children, parsed_root._descendants
 
-    def tokenize_tag_parse_tree(self, root):
-        """Tokenize, tag (+lemmatize, fill FEATS) and parse the text stored in `root.text`."""
-        if root.children:
-            raise ValueError('Tree already contained nodes before tokenization')
+    def _tag_parse_sentences(self, u_sentences, tag, parse):
+        for u_sentence in u_sentences:
+            if tag:
+                self.tool.tag(u_sentence, Model.DEFAULT, self.error)
+                self._check_error()
+            if parse:
+                self.tool.parse(u_sentence, Model.DEFAULT, self.error)
+                self._check_error()
+
+    def tag_parse_tree(self, root):
+        """Tag (+lemmatize, fill FEATS) and parse a tree (already tokenized)."""
+        self.tag_parse_trees([root])
+
+    def tag_parse_trees(self, roots, tag=True, parse=True):
+        """Tag (+lemmatize, fill FEATS) and/or parse a batch of trees (already tokenized).
 
-        # tokenization (I cannot turn off segmenter, so I need to join the segments)
-        self.tokenizer.setText(root.text)
+        UDPipe native `Sentence` objects are filled directly from the nodes
+        (if `tag` is False, the existing lemma, upos, xpos and feats are used for parsing)
+        and the results are mapped back to the nodes, with no CoNLL-U serialization.
+        """
+        batch, u_sentences = [], []
+        for root in roots:
+            descendants = root._descendants
+            if not descendants:
+                continue
+            u_sentence = Sentence()
+            for node in descendants:
+                u_w = u_sentence.addWord(node.form)
+                if not tag:
+                    u_w.lemma, u_w.upostag, u_w.xpostag = node.lemma, node.upos, node.xpos
+                    u_w.feats = str(node.feats)
+            batch.append(root)
+            u_sentences.append(u_sentence)
+
+        self._tag_parse_sentences(u_sentences, tag, parse)
+
+        for root, u_sentence in zip(batch, u_sentences):
+            u_words = u_sentence.words
+            nodes = [root] + root._descendants
+            if tag:
+                for node in root._descendants:
+                    u_w = u_words[node.ord]
+                    node.lemma, node.upos, node.xpos = u_w.lemma, u_w.upostag, u_w.xpostag
+                    node.feats = u_w.feats
+            if parse:
+                for node in nodes:
+                    node._children = []
+                # Nodes are visited in the word order, so the lists of children stay sorted.
+                for node in root._descendants:
+                    u_w = u_words[node.ord]
+                    node.deprel = u_w.deprel
+                    parent = nodes[u_w.head]
+                    node._parent = parent
+                    parent._children.append(node)
+
+    def _tokenize(self, text):
+        # I cannot turn off segmenter, so I need to join the segments.
+        self.tokenizer.setText(text)
         u_sentence = Sentence()
         is_another = self.tokenizer.nextSentence(u_sentence)
         u_words = u_sentence.words
@@ -65,22 +195,40 @@ class UDPipe:
                     n_words += 1
                     u_w.id = n_words
                     u_words.append(u_w)
+        return u_sentence
+
+    def tokenize_tag_parse_tree(self, root):
+        """Tokenize, tag (+lemmatize, fill FEATS) and parse the text stored in `root.text`."""
+        self.tokenize_tag_parse_trees([root])
+
+    def tokenize_tag_parse_trees(self, roots, tag=True, parse=True):
+        """Tokenize and optionally tag and parse a batch of trees (with text in `root.text`).
 
-        # tagging and parsing
-        self.tool.tag(u_sentence, Model.DEFAULT)
-        self.tool.parse(u_sentence, Model.DEFAULT)
+        If `parse` is False, all the new nodes are attached to the technical root.
+        """
+        for root in roots:
+            if root.children:
+                raise ValueError('Tree %s already contained nodes before tokenization' % root)
+        u_sentences = [self._tokenize(root.text) for root in roots]
+        self._tag_parse_sentences(u_sentences, tag, parse)
 
         # converting UDPipe nodes to Udapi nodes
-        heads, nodes = [], [root]
-        for i in range(1, u_words.size()):
-            u_w = u_words[i]
-            node = root.create_child(
-                form=u_w.form, lemma=u_w.lemma, upos=u_w.upostag,
-                xpos=u_w.xpostag, feats=u_w.feats, deprel=u_w.deprel,
-            )
-            node.misc = u_w.misc
-            heads.append(u_w.head)
-            nodes.append(node)
-        for node in nodes[1:]:
-            head = heads.pop(0)
-            node.parent = nodes[head]
+        for root, u_sentence in zip(roots, u_sentences):
+            u_words = u_sentence.words
+            nodes = [root]
+            for i in range(1, u_words.size()):
+                u_w = u_words[i]
+                node = Node(form=u_w.form, misc=u_w.misc)
+                if tag:
+                    node.lemma, node.upos, node.xpos = u_w.lemma, u_w.upostag, u_w.xpostag
+                    node.feats = u_w.feats
+                node.ord = i
+                nodes.append(node)
+            for i in range(1, len(nodes)):
+                node = nodes[i]
+                parent = nodes[u_words[i].head] if parse else root
+                if parse:
+                    node.deprel = u_words[i].deprel
+                node._parent = parent
+                parent._children.append(node)
+            root._descendants = nodes[1:]